@@ -1,24 +1,35 @@
+import datetime
+import json
 import logging
-from dataclasses import dataclass, field
-from typing import Optional, Dict, Union
+import os
+import time
+from functools import lru_cache
+from typing import Optional, Union, Tuple
 
 from telebot import TeleBot
 from telebot.apihelper import ApiTelegramException
-from telebot.types import ReplyKeyboardRemove, ReplyKeyboardMarkup, Message
+from telebot.types import ReplyKeyboardRemove, ReplyKeyboardMarkup, InputMediaPhoto
 
+import config
 import fsm
-from bot_calendar import Calendar, CallbackData, RUSSIAN_LANGUAGE
+from bot_calendar import Calendar, RUSSIAN_LANGUAGE, calendar_codec
+from chat_actions import TypingIndicator
 from executor_commands import CmdSortByPriceAndDist, CmdSortByPrice
-from forms_questions import form_check_entered_data, form_set_def_value, form_choice_city, form_entered_date
+from forms_questions import (BACK_CAPTION, form_check_entered_data, form_set_def_value, form_choice_city,
+                             form_entered_date)
+from metrics import CMD_PAGES, CMD_SECONDS, PHOTO_SEND_FAILURES, PHOTO_SEND_SECONDS
+from outbound import bulk_delivery
+from photo_cache import PhotoCache, get_file_id
+from photo_checker import PhotoUrlChecker
+from session_storage import SessionStorage, MemorySessionStorage
+from slo import slo
+from tracing import tracer
 
 
 logger = logging.getLogger('main.bot_controller')
 
-cmd_desc = {'/help': 'показать это сообщение',
-            '/lowprice': 'самые дешёвые отели в городе',
-            '/highprice': 'самые дорогие отели в городе',
-            '/bestdeal': 'наиболее подходящие по цене и расположению от центра'
-            }
+cmd_desc = {'/help': 'показать это сообщение'}
+cmd_desc.update({command.name: command.description for command in fsm.machine.commands})
 
 
 def generate_html_hotel_info(hotel_info: dict) -> str:
@@ -36,39 +47,150 @@ def generate_html_hotel_info(hotel_info: dict) -> str:
     return text
 
 
+#  максимальное кол-во фото в одном альбоме (ограничение телеграма)
+MEDIA_GROUP_SIZE = 10
+
+#  фото отеля, отправляемое если фото по url недоступно
+PLACEHOLDER_PHOTO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'debug_data', 'hotel.png')
+
+
+@lru_cache(maxsize=None)
+def get_placeholder_photo() -> bytes:
+    with open(PLACEHOLDER_PHOTO_PATH, 'rb') as photo_hotel:
+        return photo_hotel.read()
+
+
 #  классы обработчиков выполнения команд
 handlers_cmd = {'/lowprice': CmdSortByPrice,
                 '/highprice': CmdSortByPrice,
                 '/bestdeal': CmdSortByPriceAndDist
                 }
 
-#  CallbackData для календаря по вводу даты въезда/выезда
-calendar_callback = CallbackData("calendar", "action", "year", "month", "day")
+#  календарь по вводу даты въезда/выезда (без состояния, общий для всех пользователей) и кодек данных его кнопок
+calendar = Calendar(language=RUSSIAN_LANGUAGE)
+calendar_callback = calendar_codec('cal')
+
+
+class SlotsParams:
+    """
+    Базовый класс набора именованных параметров фиксированного состава (хранятся в слотах объекта).
+    Незаданные параметры не занимают места и не попадают в словарь параметров.
+    """
+
+    __slots__ = ()
+
+    def update(self, data: dict) -> None:
+        for name, value in data.items():
+            setattr(self, name, value)
+
+    def to_dict(self) -> dict:
+        params = {}
+        for name in self.__slots__:
+            value = getattr(self, name, None)
+            if value is not None:
+                params[name] = value
+        return params
+
+    def to_list(self) -> list:
+        return [getattr(self, name, None) for name in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values: list) -> 'SlotsParams':
+        params = cls()
+        for name, value in zip(cls.__slots__, values):
+            if value is not None:
+                setattr(params, name, value)
+        return params
+
+
+class ApiParams(SlotsParams):
+    """ Параметры api запроса списка отелей, заданные пользователем. """
+
+    __slots__ = ('sortOrder', 'destinationId', 'adults1', 'checkIn', 'checkOut', 'priceMin', 'priceMax')
+
+
+class CmdOptions(SlotsParams):
+    """ Дополнительные параметры команды (размер вывода, диапазон расстояний). """
+
+    __slots__ = ('size_result', 'range_dist')
+
+    @classmethod
+    def from_list(cls, values: list) -> 'CmdOptions':
+        options = super().from_list(values)
+        if getattr(options, 'range_dist', None) is not None:
+            options.range_dist = tuple(options.range_dist)
+        return options
 
 
-@dataclass
 class UserData:
     """
     Класс для хранения атрибутов активной команды пользователя.
 
     :param active_cmd (str): имя запущенной команды.
     :param state_cmd (int): состояние запущенной команды
-    :param api_params (dict): формирование данных для api запроса
-    :param cmd_options (dict): дополнительная информация по команде (размер вывода, диапазон расстояний)
+    :param api_params (ApiParams): формирование данных для api запроса
+    :param cmd_options (CmdOptions): дополнительная информация по команде (размер вывода, диапазон расстояний)
     :param form_confirm (dict): формирование данных для вывода в форму подтверждения
     :param locations_info (dict): сохранение данных по найденным локациям
-    :param obj_message_cur_state (Message): объект последнего отправленного телеграм сообщения пользователю
-    :param calendar (Calendar): объект календаря для выбора дат въезда/выезда
+    :param msg_id_cur_state (int): id последнего отправленного пользователю сообщения с вопросом
+    :param msg_text_cur_state (str): текст последнего отправленного сообщения с вопросом
+    :param msg_markup_cur_state (str): клавиатура последнего отправленного сообщения с вопросом (json)
+    :param trace (str): трасса выполнения команды (None - команда не трассируется)
     """
 
-    active_cmd: str
-    state_cmd: int = field(init=False, default=None)
-    api_params: dict = field(init=False, default_factory=dict)
-    cmd_options: dict = field(init=False, default_factory=dict)
-    form_confirm: dict = field(init=False, default_factory=dict)
-    locations_info: dict = field(init=False, default_factory=dict)
-    obj_message_cur_state: Message = field(init=False)
-    calendar: Calendar = field(init=False, default=None)
+    __slots__ = ('active_cmd', 'state_cmd', 'api_params', 'cmd_options', 'form_confirm', 'locations_info',
+                 'msg_id_cur_state', 'msg_text_cur_state', 'msg_markup_cur_state', 'trace')
+
+    def __init__(self, active_cmd: str):
+        self.active_cmd = active_cmd
+        self.state_cmd = None
+        self.api_params = ApiParams()
+        self.cmd_options = CmdOptions()
+        self.form_confirm = {}
+        self.locations_info = {}
+        self.msg_id_cur_state = None
+        self.msg_text_cur_state = None
+        self.msg_markup_cur_state = None
+        self.trace = None
+
+    def to_list(self) -> list:
+        """ Атрибуты команды списком значений без имен полей (порядок полей - формат сессии). """
+
+        return [self.active_cmd, self.state_cmd, self.api_params.to_list(), self.cmd_options.to_list(),
+                self.form_confirm, self.locations_info,
+                self.msg_id_cur_state, self.msg_text_cur_state, self.msg_markup_cur_state, self.trace]
+
+    @classmethod
+    def from_list(cls, values: list) -> 'UserData':
+        """ Восстановление атрибутов команды из списка значений, полученного методом to_list(). """
+
+        (active_cmd, state_cmd, api_params, cmd_options, form_confirm, locations_info,
+         msg_id, msg_text, msg_markup, trace) = values
+        user_data = cls(active_cmd=active_cmd)
+        user_data.state_cmd = state_cmd
+        user_data.api_params = ApiParams.from_list(api_params)
+        user_data.cmd_options = CmdOptions.from_list(cmd_options)
+        user_data.form_confirm = form_confirm
+        user_data.locations_info = locations_info
+        user_data.msg_id_cur_state = msg_id
+        user_data.msg_text_cur_state = msg_text
+        user_data.msg_markup_cur_state = msg_markup
+        user_data.trace = trace
+        return user_data
+
+    def dumps(self) -> str:
+        """
+        Компактная сериализация атрибутов команды в json строку (список значений без имен полей),
+        для хранения сессии во внешнем хранилище.
+        """
+
+        return json.dumps(self.to_list(), ensure_ascii=False, separators=(',', ':'))
+
+    @classmethod
+    def loads(cls, raw: str) -> 'UserData':
+        """ Восстановление атрибутов команды из json строки, полученной методом dumps(). """
+
+        return cls.from_list(json.loads(raw))
 
 
 class BotController:
@@ -77,46 +199,93 @@ class BotController:
     и текущее состояние команды (FSM). Имеет методы записи/извлечения полученной информации,
     перевод команды в следующее FSM. Запуск команды на исполнение и вывод результатов пользователю.
 
-    :param users (dict): хранит информация по атрибутам команд пользователей.
+    :param users (SessionStorage): хранилище атрибутов команд пользователей.
+    :param photo_cache (PhotoCache): кэш file_id отправленных фото отелей.
+    :param photo_checker (PhotoUrlChecker): (optional) проверка доступности фото отелей перед отправкой.
+    :param typing (TypingIndicator): индикатор «набора текста» для длительных операций.
     """
 
-    users: Dict[int, UserData] = {}
-
-    def __init__(self, tg_bot: TeleBot, debug_mode: bool):
+    def __init__(self, tg_bot: TeleBot, debug_mode: bool, storage: SessionStorage = None,
+                 photo_cache: PhotoCache = None, photo_checker: PhotoUrlChecker = None,
+                 typing: TypingIndicator = None):
         self.bot = tg_bot
         self.debug_mode = debug_mode
+        self.users = storage if storage is not None else MemorySessionStorage()
+        self.photo_cache = photo_cache if photo_cache is not None else PhotoCache()
+        self.photo_checker = photo_checker
+        self.typing = typing if typing is not None else TypingIndicator(tg_bot)
 
     def set_command(self, user_id: int, cmd_name: str) -> None:
-        self.users[user_id] = UserData(active_cmd=cmd_name)
+        user_data = UserData(active_cmd=cmd_name)
+        user_data.api_params.update(fsm.machine.command(cmd_name).api_params)
+        slo.start_command(cmd_name, fsm.state_names[fsm.START])
+        user_data.trace = tracer.new_trace()
+        #  дальнейшие участки текущего шага относятся к трассе новой команды
+        tracer.activate(user_data.trace)
+        self.users.save(user_id, user_data)
 
     def add_api_params(self, user_id: int, **data) -> None:
-        self.users[user_id].api_params.update(data)
+        self.users.update(user_id, lambda user_data: user_data.api_params.update(data))
 
     def add_cmd_options(self, user_id: int, **data) -> None:
-        self.users[user_id].cmd_options.update(data)
+        self.users.update(user_id, lambda user_data: user_data.cmd_options.update(data))
 
     def cancel_cmd(self, user_id: int) -> None:
-        if user_id in self.users:
-            self.users.pop(user_id)
+        """ Завершение команды (отмена или выполнение): удаление атрибутов команды и запись трассы команды. """
+
+        if tracer.enabled:
+            user_data = self.users.get(user_id)
+            if user_data and user_data.trace:
+                tracer.finish_trace(user_data.trace, f'command {user_data.active_cmd}', user=user_id,
+                                    state=user_data.state_cmd)
+        self.users.delete(user_id)
 
     def get_active_cmd(self, user_id: int) -> Optional[str]:
-        if user_id in self.users:
-            return self.users[user_id].active_cmd
+        user_data = self.users.get(user_id)
+        if user_data:
+            return user_data.active_cmd
 
     def get_state_cmd(self, user_id: int) -> Optional[int]:
-        if user_id in self.users:
-            return self.users[user_id].state_cmd
+        user_data = self.users.get(user_id)
+        if user_data:
+            return user_data.state_cmd
+
+    def get_trace(self, user_id: int) -> Optional[str]:
+        user_data = self.users.get(user_id)
+        if user_data:
+            return user_data.trace
+
+    def get_session_info(self, user_id: int) -> Tuple[Optional[str], Optional[int], Optional[str]]:
+        """ Команда, состояние команды и трасса пользователя (одним чтением сессии). """
+
+        user_data = self.users.get(user_id)
+        if user_data:
+            return user_data.active_cmd, user_data.state_cmd, user_data.trace
+        return None, None, None
 
-    def get_obj_msg_cur_state(self, user_id: int) -> Message:
-        if user_id in self.users:
-            return self.users[user_id].obj_message_cur_state
+    def get_date_step_info(self, user_id: int) -> Tuple[Optional[int], Optional[int], Optional[str]]:
+        """ Состояние команды, id сообщения с вопросом и дата въезда пользователя (одним чтением сессии). """
 
-    def get_calendar(self, user_id: int) -> Calendar:
-        if user_id in self.users:
-            return self.users[user_id].calendar
+        user_data = self.users.get(user_id)
+        if user_data:
+            return user_data.state_cmd, user_data.msg_id_cur_state, getattr(user_data.api_params, 'checkIn', None)
+        return None, None, None
+
+    def get_msg_cur_state(self, user_id: int) -> Optional[Tuple[str, str]]:
+        """ Получение текста и клавиатуры (json) последнего отправленного пользователю вопроса. """
+
+        user_data = self.users.get(user_id)
+        if user_data and user_data.msg_text_cur_state:
+            return user_data.msg_text_cur_state, user_data.msg_markup_cur_state
+
+    def get_locations_info(self, user_id: int) -> dict:
+        user_data = self.users.get(user_id)
+        if user_data:
+            return user_data.locations_info
+        return {}
 
     def save_locations_info(self, user_id: int, locations: dict) -> None:
-        self.users[user_id].locations_info.update(locations)
+        self.users.update(user_id, lambda user_data: user_data.locations_info.update(locations))
 
     def add_data_to_form_confirm(self, user_id: int, value: Union[str, int], state: int = None) -> None:
         """
@@ -129,16 +298,18 @@ class BotController:
         :param state: id состояния команды
         """
 
-        if state is None:
-            state = self.get_state_cmd(user_id)
-        data_form = {fsm.title_form_confirm[state]: value}
-        self.users[user_id].form_confirm.update(data_form)
+        def add_value(user_data: UserData) -> None:
+            title = fsm.machine.title_form_confirm(user_data.state_cmd if state is None else state)
+            user_data.form_confirm[title] = value
+
+        self.users.update(user_id, add_value)
 
-    def get_state_attrs(self, user_id: int, new_state: int):
+    @staticmethod
+    def get_state_attrs(user_data: UserData, new_state: int):
         """
         Получение текста вопроса и клавиатуры в зависимости от текущего состояния команды.
 
-        :param user_id: id пользователя
+        :param user_data: атрибуты команды пользователя
         :param new_state: id состояния команды
 
         :return текст вопроса и клавиатура
@@ -146,25 +317,26 @@ class BotController:
         """
 
         if new_state == fsm.END:
-            return form_check_entered_data(self.users[user_id].active_cmd, self.users[user_id].form_confirm)
+            return form_check_entered_data(user_data.active_cmd, user_data.form_confirm)
 
         if new_state == fsm.CHOICE_CITY:
-            return form_choice_city(self.users[user_id].locations_info)
+            return form_choice_city(user_data.locations_info)
 
         if new_state == fsm.IS_SET_DEF_VALUE:
             return form_set_def_value()
 
         if new_state in (fsm.GET_CHECKIN_DATE, fsm.GET_CHECKOUT_DATE):
-            if not self.users[user_id].calendar:
-                calendar = Calendar(language=RUSSIAN_LANGUAGE)
-                self.users[user_id].calendar = calendar
-            else:
-                calendar = self.users[user_id].calendar
-            return form_entered_date(new_state, calendar, calendar_callback)
+            check_in = None
+            if new_state == fsm.GET_CHECKOUT_DATE and getattr(user_data.api_params, 'checkIn', None):
+                check_in = datetime.date.fromisoformat(user_data.api_params.checkIn)
+            return form_entered_date(new_state, calendar, calendar_callback, check_in)
 
         btn_cancel = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True)
-        btn_cancel.row('Отмена')
-        return fsm.questions[new_state], btn_cancel
+        if fsm.machine.prev_state(user_data.active_cmd, new_state) not in (None, fsm.START):
+            btn_cancel.row(BACK_CAPTION, 'Отмена')
+        else:
+            btn_cancel.row('Отмена')
+        return fsm.machine.question(new_state), btn_cancel
 
     def set_new_state(self, user_id: int, new_state: int) -> None:
         """
@@ -175,13 +347,22 @@ class BotController:
         :param new_state: id состояния команды
         """
 
-        self.users[user_id].state_cmd = new_state
         if new_state == fsm.START:
+            self.users.update(user_id, lambda user_data: setattr(user_data, 'state_cmd', new_state))
             self.go_next_state(user_id)
             return
-        msg, markup = self.get_state_attrs(user_id, new_state)
+        msg, markup = self.get_state_attrs(self.users.get(user_id), new_state)
+        markup = markup.to_json()
         obj_message = self.bot.send_message(user_id, msg, reply_markup=markup, parse_mode='HTML')
-        self.users[user_id].obj_message_cur_state = obj_message
+
+        #  сессия изменяется после отправки вопроса (без блокировки хранилища на время запроса к телеграму)
+        def set_state(user_data: UserData) -> None:
+            user_data.state_cmd = new_state
+            user_data.msg_id_cur_state = obj_message.message_id
+            user_data.msg_text_cur_state = msg
+            user_data.msg_markup_cur_state = markup
+
+        self.users.update(user_id, set_state)
 
     def go_next_state(self, user_id: int) -> None:
         """
@@ -191,47 +372,168 @@ class BotController:
         :param user_id: id пользователя
         """
 
-        states_cmd = fsm.states[self.get_active_cmd(user_id)]
-        ind_next_state = states_cmd.index(self.get_state_cmd(user_id)) + 1
-        new_state = states_cmd[ind_next_state]
+        user_data = self.users.get(user_id)
+        new_state = fsm.machine.next_state(user_data.active_cmd, user_data.state_cmd)
         self.set_new_state(user_id, new_state)
 
+    def go_prev_state(self, user_id: int) -> bool:
+        """
+        Возврат команды к предыдущему шагу (повторная отправка вопроса предыдущего состояния).
+        С первого шага команды возврат не выполняется.
+
+        :param user_id: id пользователя
+
+        :return: True - команда возвращена к предыдущему шагу.
+        """
+
+        user_data = self.users.get(user_id)
+        if not user_data:
+            return False
+        prev_state = fsm.machine.prev_state(user_data.active_cmd, user_data.state_cmd)
+        if prev_state is None or prev_state == fsm.START:
+            return False
+        self.set_new_state(user_id, prev_state)
+        return True
+
     def send_lst_hotels(self, user_id: int, hotels: list) -> None:
         """
         Отправка пользователю сформированную информацию по отелям.
-        При возникновении исключения делается попытка отправки фото отеля из файла.
+        В режиме "album" отели отправляются альбомами (media group) до 10 фото с подписями,
+        в режиме "single" - по одному сообщению с фото на отель.
+        Если телеграм отклонил фото, оно повторно отправляется по url, затем отправляется фото отеля из файла.
+        Если задана проверка фото, недоступные фото (кроме уже отправленных ранее) сразу заменяются фото из файла.
 
         :param user_id: id пользователя
         :param hotels: обработанный список с информацией по отелям
         """
 
-        for hotel in hotels:
-            self.bot.send_chat_action(user_id, 'typing')  # показывает индикатор «набора текста»
-            html_hotel_info = generate_html_hotel_info(hotel)
+        time_start = time.perf_counter()
+        if self.photo_checker is not None:
+            with tracer.span('check_photos', hotels=len(hotels)):
+                hotels = self.photo_checker.replace_dead_photos(hotels, skip=lambda url: self.photo_cache.get(url))
+        count_calls = 0
+        #  результаты отправляются с низким приоритетом (после интерактивных ответов)
+        with self.typing.show(user_id), bulk_delivery():
+            if config.HOTELS_DELIVERY_MODE == 'album':
+                for ind in range(0, len(hotels), MEDIA_GROUP_SIZE):
+                    count_calls += self._send_hotels_album(user_id, hotels[ind:ind + MEDIA_GROUP_SIZE])
+            else:
+                for hotel in hotels:
+                    count_calls += self._send_hotel(user_id, hotel)
+        logger.info(f'Отправлено отелей: {len(hotels)}, запросов к api телеграма: {count_calls}, '
+                    f'время отправки: {time.perf_counter() - time_start:.2f} с, user_id={user_id}')
+        self.photo_cache.maybe_save()
+
+    def _send_hotel(self, user_id: int, hotel: dict) -> int:
+        """
+        Отправка информации по одному отелю. Повторные отправки фото выполняются по file_id из кэша фото.
+        Если телеграм отклонил фото, следующая попытка: file_id из кэша -> url фото -> file_id фото-заглушки
+        -> фото-заглушка из файла. Отклоненный file_id (устаревший или полученный другим ботом/сервером api)
+        удаляется из кэша.
+
+        :return кол-во выполненных запросов к api телеграма
+        """
+
+        html_hotel_info = generate_html_hotel_info(hotel)
+        url = hotel['url_photo']
+        attempts = []
+        if url:
+            file_id = self.photo_cache.get(url)
+            if file_id:
+                attempts.append((url, file_id, 'photo'))
+            attempts.append((url, url, 'photo'))
+        file_id = self.photo_cache.get(PLACEHOLDER_PHOTO_PATH)
+        if file_id:
+            attempts.append((PLACEHOLDER_PHOTO_PATH, file_id, 'placeholder'))
+        count_calls = 0
+        for key, photo, kind in attempts:
+            count_calls += 1
+            time_start = time.perf_counter()
             try:
-                self.bot.send_photo(user_id, hotel['url_photo'], caption=html_hotel_info, parse_mode='HTML')
+                message = self.bot.send_photo(user_id, photo, caption=html_hotel_info, parse_mode='HTML')
             except ApiTelegramException:
-                logger.exception(f'Ошибка при отправке информации по отелю: {hotel}')
-                with open('debug_data/hotel.png', 'rb') as photo_hotel:
-                    self.bot.send_photo(user_id, photo_hotel, caption=html_hotel_info, parse_mode='HTML')
+                logger.exception(f'Ошибка при отправке информации по отелю ({kind}): {hotel}')
+                PHOTO_SEND_FAILURES.inc(kind)
+                self.photo_cache.delete(key)
+                continue
+            PHOTO_SEND_SECONDS.observe(time.perf_counter() - time_start, kind)
+            self.photo_cache.put(key, get_file_id(message))
+            return count_calls
+        with PHOTO_SEND_SECONDS.time('placeholder'):
+            message = self.bot.send_photo(user_id, get_placeholder_photo(), caption=html_hotel_info, parse_mode='HTML')
+        self.photo_cache.put(PLACEHOLDER_PHOTO_PATH, get_file_id(message))
+        return count_calls + 1
+
+    def _send_hotels_album(self, user_id: int, hotels: list) -> int:
+        """
+        Отправка информации по отелям одним альбомом. Если телеграм отклонил альбом (например, недоступен
+        url одного из фото), отели альбома отправляются по одному.
+
+        :return кол-во выполненных запросов к api телеграма
+        """
+
+        if len(hotels) == 1:
+            return self._send_hotel(user_id, hotels[0])
+        keys = [hotel['url_photo'] or PLACEHOLDER_PHOTO_PATH for hotel in hotels]
+        media = [InputMediaPhoto(self._get_photo(key), caption=generate_html_hotel_info(hotel), parse_mode='HTML')
+                 for key, hotel in zip(keys, hotels)]
+        time_start = time.perf_counter()
+        try:
+            messages = self.bot.send_media_group(user_id, media)
+        except ApiTelegramException as e:
+            logger.warning(f'Альбом из {len(hotels)} отелей не отправлен ({e}), отправка по одному отелю')
+            PHOTO_SEND_FAILURES.inc('album')
+            return 1 + sum(self._send_hotel(user_id, hotel) for hotel in hotels)
+        #  время отправки альбома записывается на каждое фото альбома
+        time_photo = (time.perf_counter() - time_start) / len(hotels)
+        for _ in hotels:
+            PHOTO_SEND_SECONDS.observe(time_photo, 'album')
+        self.photo_cache.put_from_messages(keys, messages)
+        return 1
+
+    def _get_photo(self, key: str) -> Union[str, bytes]:
+        """
+        Фото для отправки: file_id из кэша фото, если фото уже отправлялось, иначе url фото
+        (для фото-заглушки - содержимое файла).
+
+        :param key: url фото или путь к файлу фото-заглушки.
+        """
+
+        file_id = self.photo_cache.get(key)
+        if file_id:
+            return file_id
+        if key == PLACEHOLDER_PHOTO_PATH:
+            return get_placeholder_photo()
+        return key
 
     def exec_cmd(self, user_id: int) -> None:
         """
         Запуск команды на исполнение, получение результатов и отправка их пользователю.
+        Пока команда выполняется, пользователю показывается индикатор «набора текста».
 
         :param user_id: id пользователя
         """
 
-        if not self.users.get(user_id):
+        with self.typing.show(user_id):
+            self._exec_cmd(user_id)
+
+    def _exec_cmd(self, user_id: int) -> None:
+        user_data = self.users.get(user_id)
+        if not user_data:
             return
-        user_data = self.users[user_id]
         active_cmd = user_data.active_cmd
-        implementer = handlers_cmd[active_cmd](user_data.api_params,
-                                               user_data.cmd_options,
+        slo.mark_exec()
+        with CMD_SECONDS.time(active_cmd), tracer.span('exec_cmd', command=active_cmd):
+            self._run_cmd(user_id, active_cmd, user_data)
+
+    def _run_cmd(self, user_id: int, active_cmd: str, user_data: UserData) -> None:
+        implementer = handlers_cmd[active_cmd](user_data.api_params.to_dict(),
+                                               user_data.cmd_options.to_dict(),
                                                self.debug_mode)
         result = implementer.start()
+        CMD_PAGES.observe(implementer.count_pages, active_cmd)
 
-        if self.users.get(user_id) and self.get_state_cmd(user_id) == fsm.END:
+        if self.get_state_cmd(user_id) == fsm.END:
             if result.err_msg:
                 self.bot.send_message(user_id, result.err_msg, reply_markup=ReplyKeyboardRemove())
             elif not result.hotels:
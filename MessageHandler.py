@@ -3,7 +3,9 @@ from telebot import TeleBot
 import handlers.callback_query
 import handlers.middleware
 import handlers.message
+import config
 from BotController import BotController
+from router import UpdateRouter
 
 
 class MessageHandler:
@@ -12,21 +14,27 @@ class MessageHandler:
         self.bot = bot
         self.bot_controller = bot_controller
         self.debug_mode = debug_mode
+        self.router = UpdateRouter(bot_controller)
 
     def start(self):
         handlers.middleware.handle_cancel_command(self.bot, self.bot_controller)
 
-        handlers.callback_query.handle_callback_set_default_value(self.bot, self.bot_controller)
-        handlers.callback_query.handle_callback_check_entered_data(self.bot, self.bot_controller)
-        handlers.callback_query.handle_callback_select_date(self.bot, self.bot_controller)
-
-        handlers.message.handle_cmd_send_welcome(self.bot)
-        handlers.message.handle_cmd_low_price_and_high_price(self.bot, self.bot_controller)
-        handlers.message.handle_cmd_best_deal(self.bot, self.bot_controller)
-        handlers.message.handle_get_location(self.bot, self.bot_controller, self.debug_mode)
-        handlers.message.handle_get_city(self.bot, self.bot_controller)
-        handlers.message.handle_get_count_humans(self.bot, self.bot_controller)
-        handlers.message.handle_get_range_price(self.bot, self.bot_controller)
-        handlers.message.handle_get_range_distance(self.bot, self.bot_controller)
-        handlers.message.handle_get_count_hotels(self.bot, self.bot_controller)
-        handlers.message.handle_unknown_message(self.bot, self.bot_controller)
+        handlers.callback_query.handle_callback_set_default_value(self.router, self.bot, self.bot_controller)
+        handlers.callback_query.handle_callback_check_entered_data(self.router, self.bot, self.bot_controller)
+        handlers.callback_query.handle_callback_select_date(self.router, self.bot, self.bot_controller)
+        handlers.callback_query.handle_callback_back(self.router, self.bot, self.bot_controller)
+
+        handlers.message.handle_cmd_send_welcome(self.router, self.bot)
+        handlers.message.handle_cmd_profile(self.router, self.bot, config.ADMIN_IDS, config.PROFILE_DURATION)
+        handlers.message.handle_cmd_slo(self.router, self.bot, config.ADMIN_IDS)
+        handlers.message.handle_search_commands(self.router, self.bot, self.bot_controller)
+        handlers.message.handle_get_location(self.router, self.bot, self.bot_controller, self.debug_mode)
+        handlers.message.handle_get_city(self.router, self.bot, self.bot_controller)
+        handlers.message.handle_get_count_humans(self.router, self.bot, self.bot_controller)
+        handlers.message.handle_get_range_price(self.router, self.bot, self.bot_controller)
+        handlers.message.handle_get_range_distance(self.router, self.bot, self.bot_controller)
+        handlers.message.handle_get_count_hotels(self.router, self.bot, self.bot_controller)
+        handlers.message.handle_back(self.router, self.bot, self.bot_controller)
+        handlers.message.handle_unknown_message(self.router, self.bot, self.bot_controller)
+
+        self.router.attach(self.bot)
@@ -0,0 +1,38 @@
+"""
+Замер времени построения клавиатуры календаря на одно нажатие кнопки (DAY, PREVIOUS-MONTH, NEXT-MONTH):
+построение клавиатуры месяца и ее сериализация в json (как при отправке запроса к api телеграма).
+
+Имитируется перелистывание календаря на год вперед и назад с выбранной датой въезда.
+
+Запуск из корневой папки проекта:
+    python benchmarks/bench_calendar.py
+"""
+
+import datetime
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_calendar import Calendar, RUSSIAN_LANGUAGE  # noqa: E402
+
+
+def main() -> None:
+    today = datetime.datetime.utcnow()
+    months = [((today.month - 1 + shift) // 12 + today.year, (today.month - 1 + shift) % 12 + 1)
+              for shift in list(range(12)) + list(range(11, -1, -1))]
+    calendar = Calendar(language=RUSSIAN_LANGUAGE)
+    selection = datetime.date(today.year, today.month, 1) + datetime.timedelta(days=40)
+
+    def render_clicks():
+        for year, month in months:
+            calendar.create_calendar('calendar', year, month, selection=selection).to_json()
+
+    number = 200
+    seconds = min(timeit.repeat(render_clicks, number=number, repeat=3))
+    print(f'calendar render + json: {seconds / number / len(months) * 1e6:.1f} us per click')
+
+
+if __name__ == '__main__':
+    main()
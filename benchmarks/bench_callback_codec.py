@@ -0,0 +1,36 @@
+"""
+Замер кодирования/декодирования данных кнопки календаря и построения шаблона клавиатуры месяца
+(при построении шаблона кодируются данные ~45 кнопок).
+
+Запуск из корневой папки проекта:
+    python benchmarks/bench_callback_codec.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot_calendar  # noqa: E402
+from bot_calendar import RUSSIAN_LANGUAGE, calendar_codec  # noqa: E402
+
+
+def get_time(func, number: int) -> float:
+    """ Время одного вызова функции, в микросекундах. """
+
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main() -> None:
+    codec = calendar_codec('cal')
+    data = codec.encode('DAY', 2026, 11, 23, None, None)
+    build_template = bot_calendar._get_month_template.__wrapped__
+    print(f'callback data: {data!r}, {len(data)} bytes')
+    print(f'encode: {get_time(lambda: codec.encode("DAY", 2026, 11, 23, None, None), 200_000):.2f} us')
+    print(f'decode: {get_time(lambda: codec.decode(data), 200_000):.2f} us')
+    print(f'month template: {get_time(lambda: build_template("cal", 2026, 11, RUSSIAN_LANGUAGE), 2_000):.1f} us')
+
+
+if __name__ == '__main__':
+    main()
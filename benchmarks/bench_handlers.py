@@ -0,0 +1,93 @@
+"""
+Нагрузочный замер слоя диалогов: обработчики обновлений (MessageHandler, маршрутизатор), BotController и FSM
+на боте без сети (fake_telebot.FakeTeleBot) в тестовом режиме (данные из папки debug_data).
+
+N имитируемых пользователей выполняют сценарии диалогов команд /lowprice, /highprice и /bestdeal (команда, город,
+кнопки, календарь, подтверждение) - по шагу за раз по очереди, так что в хранилище одновременно находятся сессии
+всех пользователей. Выводятся кол-во обработанных обновлений в секунду, перцентили времени обработчиков
+и прирост памяти процесса (RSS, Linux).
+
+Запуск из корневой папки проекта:
+    python benchmarks/bench_handlers.py [кол-во пользователей]
+"""
+
+import gc
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import apihelper  # noqa: E402
+
+from BotController import BotController  # noqa: E402
+from fake_telebot import DIALOGS, FakeTeleBot, ScriptedUser  # noqa: E402
+from MessageHandler import MessageHandler  # noqa: E402
+from slo import RollingPercentiles  # noqa: E402
+
+
+def get_rss() -> int:
+    with open('/proc/self/statm') as f_statm:
+        return int(f_statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def make_users(bot: FakeTeleBot, user_ids: range) -> list:
+    scripts = list(DIALOGS.values())
+    return [ScriptedUser(bot, user_id, scripts[user_id % len(scripts)]) for user_id in user_ids]
+
+
+def run_users(bot: FakeTeleBot, users: list) -> int:
+    count_updates = 0
+    while users:
+        for user in users:
+            bot.process_new_updates([user.next_update()])
+            count_updates += 1
+        users = [user for user in users if not user.finished]
+    return count_updates
+
+
+def main(count_users: int) -> None:
+    apihelper.ENABLE_MIDDLEWARE = True
+    bot = FakeTeleBot()
+    controller = BotController(bot, True)
+    message_handler = MessageHandler(bot, controller, True)
+    message_handler.start()
+
+    latencies = defaultdict(list)
+    router = message_handler.router
+    run_handler = router._run_handler
+
+    def timed_run_handler(handler, update, user_id, session):
+        time_start = time.perf_counter()
+        run_handler(handler, update, user_id, session)
+        latencies[handler.__name__].append(time.perf_counter() - time_start)
+
+    router._run_handler = timed_run_handler
+
+    #  прогрев: кэши календаря, данные debug_data
+    run_users(bot, make_users(bot, range(-len(DIALOGS), 0)))
+    latencies.clear()
+    gc.collect()
+    rss_before = get_rss()
+
+    time_start = time.perf_counter()
+    count_updates = run_users(bot, make_users(bot, range(1, count_users + 1)))
+    elapsed = time.perf_counter() - time_start
+    gc.collect()
+    rss_after = get_rss()
+    controller.typing.shutdown()
+
+    print(f'users: {count_users}, updates: {count_updates}, {elapsed:.2f} s, {count_updates / elapsed:.0f} updates/s')
+    print(f'{"handler":<32}{"count":>8}{"p50, ms":>10}{"p95, ms":>10}{"p99, ms":>10}')
+    for name, values in sorted(latencies.items()):
+        values.sort()
+        print(f'{name:<32}{len(values):>8}' + ''.join(f'{RollingPercentiles.percentile(values, percent) * 1e3:>10.3f}'
+                                                       for percent in (50, 95, 99)))
+    print(f'rss growth: {(rss_after - rss_before) / 2 ** 20:.1f} MiB, sessions left: {len(controller.users)}, '
+          f'photo cache: {len(controller.photo_cache)}')
+    print(f'api calls: {dict(bot.counts)}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,137 @@
+"""
+Замер задержки обработчика обновления при записи логов: без логов, с записью в файлы в потоке обработчика
+и с записью через очередь (LogPipeline).
+
+Обработчик имитирует обработку одного обновления: записи DEBUG логера telebot о запросах к api телеграма
+(как при отправке ответа) и запись INFO логера бота. Время считается для нескольких потоков обработчиков.
+Замер выполняется для быстрого диска (временная папка) и для медленного: каждая запись на диск (flush) ждет
+SLOW_FLUSH секунд, а каждая ROTATION_EVERY-я запись - ROTATION_STALL секунд (как при ротации файла лога).
+
+Запуск из корневой папки проекта:
+    python benchmarks/bench_logging.py
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import telebot  # noqa: E402
+
+from utils import LogPipeline, configure_app_logger, configure_telebot_logger  # noqa: E402
+
+
+NUM_THREADS = 4
+NUM_UPDATES = 1000  # на один поток
+
+SLOW_FLUSH = 0.0002
+ROTATION_EVERY = 5000
+ROTATION_STALL = 0.05
+
+
+class SlowStream:
+    """ Поток записи в файл с задержками записи на диск. """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def write(self, text: str) -> int:
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+        self.count += 1
+        time.sleep(ROTATION_STALL if self.count % ROTATION_EVERY == 0 else SLOW_FLUSH)
+
+    def close(self) -> None:
+        self.stream.close()
+
+
+def handle_update(logger: logging.Logger, update_id: int) -> None:
+    params = {'chat_id': update_id, 'text': 'Укажите город, где будет проводиться поиск?'}
+    for method in ('sendChatAction', 'sendMessage', 'answerCallbackQuery'):
+        telebot.logger.debug('Request: method=post url=https://api.telegram.org/bot{0}/%s params=%s files=None',
+                             method, params)
+        telebot.logger.debug("The server returned: '%s'", json.dumps({'ok': True, 'result': params}))
+    logger.info(f'Обработано обновление {update_id}')
+
+
+def run_handlers(logger: logging.Logger) -> list:
+    latencies = []
+    lock = threading.Lock()
+
+    def worker(ind_thread: int):
+        times = []
+        for ind in range(NUM_UPDATES):
+            time_start = time.perf_counter()
+            handle_update(logger, ind_thread * NUM_UPDATES + ind)
+            times.append(time.perf_counter() - time_start)
+        with lock:
+            latencies.extend(times)
+
+    threads = [threading.Thread(target=worker, args=(ind,)) for ind in range(NUM_THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies)
+
+
+def reset_loggers() -> None:
+    for logger in (telebot.logger, logging.getLogger('bench')):
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            handler.close()
+
+
+def main() -> None:
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        os.mkdir('logs')
+        try:
+            modes = [('off', False)] + [(mode, slow) for slow in (False, True)
+                                        for mode in ('sync', 'queue', 'queue, DEBUG 1/10')]
+            for mode, slow in modes:
+                reset_loggers()
+                pipeline = None
+                if mode == 'off':
+                    telebot.logger.setLevel(logging.WARNING)
+                    logger = logging.getLogger('bench')
+                    logger.setLevel(logging.WARNING)
+                else:
+                    if mode != 'sync':
+                        pipeline = LogPipeline(queue_size=100_000)
+                    configure_telebot_logger(pipeline, debug_sample=10 if mode.endswith('1/10') else 1)
+                    logger = configure_app_logger('bench', pipeline)
+                    handlers = pipeline.handlers if pipeline else logger.handlers + telebot.logger.handlers
+                    for handler in handlers:
+                        #  консоль не участвует в замере
+                        if type(handler) is logging.StreamHandler:
+                            handler.setLevel(logging.CRITICAL)
+                        elif slow:
+                            handler.stream = SlowStream(handler.stream)
+                    if pipeline:
+                        pipeline.start()
+                latencies = run_handlers(logger)
+                time_stop = time.perf_counter()
+                if pipeline:
+                    pipeline.stop()
+                mean = sum(latencies) / len(latencies)
+                p99 = latencies[int(len(latencies) * 0.99)]
+                drain = f', drain {time.perf_counter() - time_stop:.2f} s' if pipeline else ''
+                mode = f'{mode} ({"slow" if slow else "fast"} disk)' if mode != 'off' else mode
+                print(f'{mode:>30}: mean {mean * 1e6:7.1f} us, p99 {p99 * 1e6:7.1f} us{drain}')
+        finally:
+            reset_loggers()
+            os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Сравнение стоимости выбора обработчика текстового сообщения при росте числа обработчиков:
+- линейная проверка предикатов telebot (func=lambda msg: get_state_cmd(...) == STATE на каждый обработчик);
+- маршрутизатор UpdateRouter (один поиск состояния в сессии и поиск по индексу).
+
+Сообщение отправляется пользователю в последнем зарегистрированном состоянии (худший случай для перебора).
+
+Запуск из корневой папки проекта:
+    python benchmarks/bench_router.py
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import TeleBot  # noqa: E402
+from telebot.types import Message  # noqa: E402
+
+from router import UpdateRouter  # noqa: E402
+from session_storage import MemorySessionStorage  # noqa: E402
+
+
+class FakeUserData:
+    __slots__ = ('state_cmd',)
+
+    def __init__(self, state_cmd: int):
+        self.state_cmd = state_cmd
+
+
+class FakeController:
+    """ Контроллер с хранилищем сессий в памяти (как BotController.get_state_cmd). """
+
+    def __init__(self):
+        self.users = MemorySessionStorage()
+
+    def get_state_cmd(self, user_id: int):
+        user_data = self.users.get(user_id)
+        if user_data:
+            return user_data.state_cmd
+
+
+def make_message(user_id: int) -> Message:
+    return Message.de_json({'message_id': 1, 'date': 0, 'text': 'text',
+                            'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+                            'chat': {'id': user_id, 'type': 'private'}})
+
+
+def handler(msg):
+    pass
+
+
+def make_linear_bot(controller: FakeController, count_handlers: int) -> TeleBot:
+    bot = TeleBot('1:TOKEN', threaded=False)
+    for state in range(count_handlers):
+        bot.register_message_handler(handler, content_types=['text'],
+                                     func=lambda msg, state=state: controller.get_state_cmd(msg.from_user.id) == state)
+    return bot
+
+
+def make_router_bot(controller: FakeController, count_handlers: int) -> TeleBot:
+    bot = TeleBot('1:TOKEN', threaded=False)
+    router = UpdateRouter(controller)
+    for state in range(count_handlers):
+        router.message_handler(state)(handler)
+    router.attach(bot)
+    return bot
+
+
+def main() -> None:
+    number = 20_000
+    print(f'{"handlers":>8} | {"linear, us":>10} | {"router, us":>10}')
+    for count_handlers in (5, 10, 25, 50, 100, 250):
+        controller = FakeController()
+        controller.users.save(1, FakeUserData(count_handlers - 1))
+        messages = [make_message(1)]
+        results = []
+        for make_bot in (make_linear_bot, make_router_bot):
+            bot = make_bot(controller, count_handlers)
+            seconds = min(timeit.repeat(lambda: bot.process_new_messages(messages), number=number, repeat=3))
+            results.append(seconds / number * 1e6)
+        print(f'{count_handlers:>8} | {results[0]:>10.2f} | {results[1]:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
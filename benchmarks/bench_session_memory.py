@@ -0,0 +1,92 @@
+"""
+Замер памяти, занимаемой сессиями пользователей (UserData) в хранилище в памяти процесса.
+
+Для каждой имитируемой сессии проводится диалог команды "/bestdeal" до шага выбора даты въезда
+(найдены локации, введены диапазоны, отправлен календарь) - наиболее "тяжелое" состояние сессии.
+
+Память оценивается по приросту RSS процесса (Linux, /proc/self/statm).
+
+Запуск из корневой папки проекта:
+    python benchmarks/bench_session_memory.py [кол-во сессий]
+"""
+
+import gc
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot.types import Message, JsonSerializable  # noqa: E402
+
+import fsm  # noqa: E402
+from BotController import BotController  # noqa: E402
+
+
+class FakeBot:
+    """ Заглушка бота, возвращающая сообщение в том виде, в каком его возвращает api телеграма. """
+
+    def __init__(self):
+        self.message_id = 0
+
+    def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        self.message_id += 1
+        data = {'message_id': self.message_id, 'date': 1634650000, 'text': text,
+                'from': {'id': 1852742318, 'is_bot': True, 'first_name': 'BestOtelsBot',
+                         'username': 'best_otels_bot'},
+                'chat': {'id': chat_id, 'first_name': 'User', 'username': f'user{chat_id}', 'type': 'private'}}
+        if isinstance(reply_markup, JsonSerializable):
+            reply_markup = reply_markup.to_json()
+        if reply_markup and 'inline_keyboard' in reply_markup:
+            data['reply_markup'] = json.loads(reply_markup)
+        return Message.de_json(data)
+
+
+def simulate_session(controller: BotController, user_id: int) -> None:
+    controller.set_command(user_id, '/bestdeal')
+    controller.set_new_state(user_id, fsm.START)
+    controller.save_locations_info(user_id, {'Москва, Россия': 1153093, 'Московская область, Россия': 1634340,
+                                             'Москва (и окрестности), Россия': 10233141})
+    controller.go_next_state(user_id)
+    controller.add_api_params(user_id, destinationId=1153093)
+    controller.add_data_to_form_confirm(user_id, 'Москва, Россия')
+    controller.go_next_state(user_id)
+    controller.add_api_params(user_id, priceMin=1000, priceMax=3000)
+    controller.add_data_to_form_confirm(user_id, '1000-3000')
+    controller.go_next_state(user_id)
+    controller.add_cmd_options(user_id, range_dist=(0.9, 2.5))
+    controller.add_data_to_form_confirm(user_id, '0.9-2.5')
+    controller.go_next_state(user_id)
+    controller.add_cmd_options(user_id, size_result=10)
+    controller.add_data_to_form_confirm(user_id, '10')
+    controller.go_next_state(user_id)
+    controller.set_new_state(user_id, fsm.GET_NUM_HUMANS)
+    controller.add_api_params(user_id, adults1=2)
+    controller.add_data_to_form_confirm(user_id, 2)
+    controller.go_next_state(user_id)
+
+
+def get_rss() -> int:
+    with open('/proc/self/statm') as f_statm:
+        return int(f_statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+
+
+def main(count_sessions: int) -> None:
+    controller = BotController(FakeBot(), True)
+    simulate_session(controller, 0)  # прогрев: импорт и кэши модулей не должны попасть в замер
+    controller.cancel_cmd(0)
+    gc.collect()
+    before = get_rss()
+    for user_id in range(1, count_sessions + 1):
+        simulate_session(controller, user_id)
+    gc.collect()
+    after = get_rss()
+
+    total = after - before
+    print(f'sessions: {count_sessions}')
+    print(f'total: {total / 2 ** 20:.1f} MiB')
+    print(f'per session: {total / count_sessions:.0f} bytes')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,69 @@
+"""
+Замер записи и восстановления снимка сессий (snapshot.py) при перезапуске бота.
+
+Сессии имитируются диалогом команды "/bestdeal" до шага выбора даты въезда (см. bench_session_memory.py).
+Для сравнения замеряется простой снимок: строка UserData.dumps() на сессию и разбор всех сессий при запуске.
+
+Запуск из корневой папки проекта:
+    python benchmarks/bench_snapshot.py [кол-во сессий]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_session_memory import FakeBot, simulate_session  # noqa: E402
+from BotController import BotController, UserData  # noqa: E402
+from session_storage import MemorySessionStorage  # noqa: E402
+from snapshot import BotSnapshot  # noqa: E402
+
+
+def plain_save(path: str, storage: MemorySessionStorage) -> None:
+    sessions, _ = storage.export()
+    with open(path, 'w', encoding='utf8') as f_snapshot:
+        f_snapshot.write('\n'.join(f'{user_id}\t{user_data.dumps()}' for user_id, user_data in sessions.items()))
+
+
+def plain_restore(path: str, storage: MemorySessionStorage) -> None:
+    with open(path, 'r', encoding='utf8') as f_snapshot:
+        for line in f_snapshot:
+            user_id, raw = line.split('\t', 1)
+            storage.save(int(user_id), UserData.loads(raw))
+
+
+def measure(func, *args) -> float:
+    time_start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - time_start
+
+
+def main(count_sessions: int) -> None:
+    storage = MemorySessionStorage()
+    controller = BotController(FakeBot(), True, storage)
+    for user_id in range(1, count_sessions + 1):
+        simulate_session(controller, user_id)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'snapshot.txt')
+
+        time_save = measure(plain_save, path, storage)
+        size = os.path.getsize(path)
+        time_restore = measure(plain_restore, path, MemorySessionStorage())
+        print(f'{"plain":>9}: save {time_save:.3f} s, restore {time_restore:.3f} s, file {size / 2 ** 20:.1f} MiB')
+
+        snapshot = BotSnapshot(path, UserData)
+        time_save = measure(snapshot.save, storage)
+        size = os.path.getsize(path)
+        restored = MemorySessionStorage()
+        time_restore = measure(BotSnapshot(path, UserData).restore, restored)
+        time_get = measure(lambda: [restored.get(user_id) for user_id in range(1, 1001)]) / 1000
+        print(f'{"snapshot":>9}: save {time_save:.3f} s, restore {time_restore:.3f} s, file {size / 2 ** 20:.1f} MiB, '
+              f'first access {time_get * 1e6:.1f} us')
+        assert restored.get(count_sessions).dumps() == storage.get(count_sessions).dumps()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
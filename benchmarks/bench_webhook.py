@@ -0,0 +1,100 @@
+"""
+Нагрузочный тест приема обновлений через webhook: обновления отправляются POST запросами
+в несколько постоянных соединений (как это делает телеграм), измеряется время ответа сервера и пропускная способность.
+
+Без параметра --url запускается локальный сервер (WebhookServer) с ботом, обработчик которого только считает сообщения.
+С параметром --url обновления отправляются запущенному боту (python main.py --webhook).
+Обновления берутся из json файла (список обновлений, например, записанных из getUpdates) или генерируются.
+
+Запуск из корневой папки проекта:
+    python benchmarks/bench_webhook.py [--updates updates.json] [--url http://127.0.0.1:8443/webhook]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import TeleBot  # noqa: E402
+
+from dispatcher import ChatDispatcher  # noqa: E402
+from fake_telebot import message_update_data  # noqa: E402
+from webhook import WebhookServer  # noqa: E402
+
+
+def make_updates(count: int, count_chats: int) -> list:
+    return [message_update_data(ind + 1, ind % count_chats + 1, 'Москва') for ind in range(count)]
+
+
+def post_updates(url: str, bodies: list, latencies: list) -> None:
+    parts = urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+    for body in bodies:
+        time_start = time.perf_counter()
+        conn.request('POST', parts.path, body=body, headers={'Content-Type': 'application/json'})
+        res = conn.getresponse()
+        res.read()
+        latencies.append((time.perf_counter() - time_start, res.status))
+    conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--updates', help='json файл со списком обновлений')
+    parser.add_argument('--url', help='адрес webhook запущенного бота')
+    parser.add_argument('--count', type=int, default=5000, help='кол-во генерируемых обновлений')
+    parser.add_argument('--chats', type=int, default=200, help='кол-во чатов в генерируемых обновлениях')
+    parser.add_argument('--connections', type=int, default=8, help='кол-во соединений')
+    args = parser.parse_args()
+
+    if args.updates:
+        with open(args.updates, 'r', encoding='utf8') as f_json:
+            updates = json.load(f_json)
+    else:
+        updates = make_updates(args.count, args.chats)
+    bodies = [json.dumps(update).encode() for update in updates]
+
+    server = dispatcher = None
+    processed = []
+    url = args.url
+    if not url:
+        bot = TeleBot('1:TOKEN', threaded=False)
+        bot.register_message_handler(processed.append, content_types=['text'])
+        dispatcher = ChatDispatcher()
+        dispatcher.attach(bot)
+        server = WebhookServer(bot, dispatcher, '127.0.0.1', 0, '/webhook', max_pending=len(bodies))
+        server.start()
+        url = f'http://127.0.0.1:{server.port}/webhook'
+
+    latencies = []
+    threads = [threading.Thread(target=post_updates, args=(url, bodies[ind::args.connections], latencies))
+               for ind in range(args.connections)]
+    time_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - time_start
+
+    times = sorted(latency for latency, _ in latencies)
+    statuses = {}
+    for _, status in latencies:
+        statuses[status] = statuses.get(status, 0) + 1
+    print(f'updates: {len(bodies)}, connections: {args.connections}, time: {seconds:.2f} s, '
+          f'rps: {len(bodies) / seconds:.0f}, statuses: {statuses}')
+    print(f'latency, ms: p50={times[len(times) // 2] * 1000:.2f} p99={times[int(len(times) * 0.99)] * 1000:.2f} '
+          f'max={times[-1] * 1000:.2f}')
+    if server is not None:
+        dispatcher.shutdown()
+        print(f'processed: {len(processed)}, server stats: {server.stats()}')
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
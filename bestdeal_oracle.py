@@ -0,0 +1,329 @@
+"""
+Эталон алгоритма команды "bestdeal" и разностная проверка (differential testing) его оптимизированных вариантов.
+
+ReferenceCmdSortByPriceAndDist - зафиксированная копия алгоритма CmdSortByPriceAndDist.start (с выбором отелей
+по страницам, примечаниями о выходе диапазона за левую/правую границу, дополнением результата отелями предыдущей
+страницы и переходом к сортировке по цене, если у отелей не указано расстояние). Эталон не меняется вместе
+с исполнителем команды: любой новый вариант алгоритма (параллельные запросы страниц, поиск страницы
+с экспоненциальным шагом, выбор top-N и т.д.) должен возвращать те же отели и примечания.
+
+run_differential - прогон эталона и проверяемого класса на случайных наборах страниц (HotelsPages) и диапазонах
+расстояний: сравниваются отели (в том же порядке), текст ошибки и примечание, считаются api запросы страниц.
+Проверяемый класс получает страницы только через метод query_hotels (как CmdSortByPrice).
+
+Запуск из корневой папки проекта (проверка текущего CmdSortByPriceAndDist):
+    python bestdeal_oracle.py [кол-во наборов] [seed]
+"""
+
+import random
+import sys
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from operator import itemgetter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from executor_commands import CmdSortByPriceAndDist, HotelsParsed
+from resources import ERR_MSG, HotelsInfo, query_hotels_by_param
+
+
+#  примечания эталона (для классификации наборов данных в отчете)
+WARNING_KINDS = (('left', 'Минимальное расстояние от центра'), ('right', 'Максимальное расстояние от центра'),
+                 ('no_distance', 'Показаны отели по росту цены'), ('api_error', 'возникли ошибки'))
+
+
+@dataclass
+class ReferenceCmdSortByPriceAndDist:
+    """
+    Эталон исполнителя команды "bestdeal" (копия алгоритма CmdSortByPriceAndDist, не изменять).
+
+    :param api_params (dict): данные для api запроса.
+    :param cmd_options (dict): дополнительная информация по команде (размер вывода, диапазон расстояний).
+    :param debug_mode (bool): флаг отладочного режима.
+    :param required_size_result (int): размер вывода.
+    :param count_pages (int): кол-во выполненных api запросов страниц списка отелей.
+    :param page_number (int): текущий номер страницы для api запроса.
+    :param next_page_number (int): ожидаемый номер следующей страницы.
+    """
+    api_params: dict
+    cmd_options: dict
+    debug_mode: bool
+    required_size_result: int = field(init=False)
+    count_pages: int = field(init=False, default=0)
+    page_number: int = field(init=False, default=1)
+    next_page_number: int = field(init=False, default=1)
+
+    def __post_init__(self):
+        self.required_size_result = self.cmd_options['size_result']
+
+    def query_hotels(self, **kwargs) -> HotelsInfo:
+        self.count_pages += 1
+        return query_hotels_by_param(**kwargs)
+
+    def is_last_page(self) -> bool:
+        return self.page_number >= self.next_page_number
+
+    def cmd_sort_by_price(self, sort_direction: str = None, def_warning: str = '') -> HotelsParsed:
+        api_params = self.api_params
+        if sort_direction:
+            api_params['sortOrder'] = sort_direction
+        result = self.query_hotels(data_query=api_params, page_size=self.required_size_result,
+                                   debug_mode=self.debug_mode)
+        warning = def_warning
+        warning += self._get_warning_mismatch_size_result(result.hotels)
+        return HotelsParsed(hotels=result.hotels, err_msg=result.err_msg, warning_msg=warning)
+
+    def start(self) -> HotelsParsed:
+        cur_lst_hotels = []
+        prev_lst_hotels = []
+        while True:
+            result = self.query_hotels(data_query=self.api_params, debug_mode=self.debug_mode,
+                                       page_number=self.page_number)
+
+            if (result.err_msg or not result.hotels) and not cur_lst_hotels:
+                return HotelsParsed(result.hotels, result.err_msg)
+
+            if (result.err_msg or not result.hotels) and cur_lst_hotels:
+                warning = ''
+                if result.err_msg:
+                    warning = '\n<b>При выполнении запроса возникли ошибки. Результат вывода может быть не точный!</b>'
+                return self._sort_and_parsed_hotels(cur_lst_hotels, ('price_exact', 'to_center_exact'), warning)
+
+            hotels_with_def_dist = [hotel for hotel in result.hotels if hotel['to_center_exact']]
+            if not hotels_with_def_dist:
+                warning = '\nВ указанной локации не найдено отелей с обозначенным расстоянием от центра города. ' \
+                          'Показаны отели по росту цены (аналогично команде low_price).'
+                return self.cmd_sort_by_price(sort_direction='PRICE', def_warning=warning)
+
+            hotels = hotels_with_def_dist
+            min_dist_user, max_dist_user = self.cmd_options['range_dist']
+            min_dist_hotel = hotels[0]['to_center_exact']
+            max_dist_hotel = hotels[-1]['to_center_exact']
+
+            if max_dist_user < min_dist_hotel:
+                warning = '\nНи один из отелей не попадает в указанный диапазон расстояния от центра города. ' \
+                          f'Минимальное расстояние от центра {min_dist_hotel}. ' \
+                          f'Показаны отели с минимально возможным расстоянием!'
+                if cur_lst_hotels:
+                    hotels = cur_lst_hotels
+                    warning = ''
+                return self._sort_and_parsed_hotels(hotels[:self.required_size_result],
+                                                    ('price_exact', 'to_center_exact'), warning)
+
+            self.next_page_number = result.next_page_number
+            if max_dist_hotel < min_dist_user:
+                if self.is_last_page():
+                    warning = '\nНи один из отелей не попадает в указанный диапазон расстояния от центра города. ' \
+                              f'Максимальное расстояние от центра {max_dist_hotel}. ' \
+                              f'Показаны отели с максимально возможным расстоянием!'
+                    if len(hotels) < self.required_size_result:
+                        prev_lst_hotels.extend(hotels)
+                        hotels = prev_lst_hotels
+                    return self._sort_and_parsed_hotels(hotels[-self.required_size_result:],
+                                                        ('price_exact', 'to_center_exact'), warning)
+                else:
+                    self.page_number += 1
+                    prev_lst_hotels = hotels[:]
+                    continue
+
+            hotels_with_req_dist = [hotel for hotel in hotels
+                                    if min_dist_user <= hotel['to_center_exact'] <= max_dist_user]
+            cur_lst_hotels.extend(hotels_with_req_dist)
+            if (len(cur_lst_hotels) >= self.required_size_result
+                and max_dist_user < max_dist_hotel) \
+                    or self.is_last_page():
+                return self._sort_and_parsed_hotels(cur_lst_hotels, ('price_exact', 'to_center_exact'), '')
+            else:
+                self.page_number += 1
+
+    def _get_warning_mismatch_size_result(self, lst_hotels: list) -> str:
+        if lst_hotels is not None:
+            count_hotels = len(lst_hotels)
+            if count_hotels < self.required_size_result:
+                return f'\n<b>Количество найденных предложений: {count_hotels}</b>'
+        return ''
+
+    def _sort_and_parsed_hotels(self, lst_hotels: list, keys_sort: tuple, warning: str) -> HotelsParsed:
+        res_hotels = sorted(lst_hotels, key=itemgetter(*keys_sort))
+        res_hotels = res_hotels[:self.required_size_result]
+        warning += self._get_warning_mismatch_size_result(res_hotels)
+        return HotelsParsed(hotels=res_hotels, warning_msg=warning)
+
+
+class HotelsPages:
+    """
+    Набор страниц ответа api списка отелей (сортировка по расстоянию от центра) для подстановки вместо api запросов.
+
+    :param pages: отели страниц (page_number - индекс + 1), расстояние от центра по возрастанию (None - не указано).
+    :param error_pages: номера страниц, запрос которых завершается ошибкой.
+    :param last_next_page: nextPageNumber последней страницы (0 - не указан, иначе равен номеру страницы).
+    """
+
+    def __init__(self, pages: List[List[dict]], error_pages: frozenset = frozenset(), last_next_page: int = None):
+        self.pages = pages
+        self.error_pages = error_pages
+        self.last_next_page = len(pages) if last_next_page is None else last_next_page
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def query(self, data_query: dict, debug_mode: bool, page_number: int = 1, page_size: int = 25) -> HotelsInfo:
+        """ Ответ на запрос страницы (сигнатура query_hotels_by_param). """
+
+        with self._lock:
+            self.calls += 1
+        if data_query.get('sortOrder') == 'PRICE':
+            hotels = sorted((hotel for page in self.pages for hotel in page), key=itemgetter('price_exact'))
+            return HotelsInfo(hotels=hotels[:page_size], next_page_number=0)
+        if page_number in self.error_pages:
+            return HotelsInfo(err_msg=ERR_MSG.format(desc=''))
+        if page_number > len(self.pages):
+            return HotelsInfo(hotels=[], next_page_number=0)
+        next_page_number = page_number + 1 if page_number < len(self.pages) else self.last_next_page
+        return HotelsInfo(hotels=self.pages[page_number - 1][:], next_page_number=next_page_number)
+
+
+class Mismatch(NamedTuple):
+    """ Расхождение результата проверяемого класса с эталоном на наборе данных. """
+    case: int
+    cmd_options: dict
+    pages: list
+    expected: tuple
+    received: tuple
+
+
+class DiffReport(NamedTuple):
+    """
+    Результат разностной проверки.
+
+    :param cases: кол-во наборов данных.
+    :param reference_calls: кол-во api запросов страниц эталона.
+    :param candidate_calls: кол-во api запросов страниц проверяемого класса.
+    :param kinds: кол-во наборов по видам результата эталона (примечания WARNING_KINDS, back_fill, in_range).
+    :param mismatches: расхождения с эталоном.
+    """
+    cases: int
+    reference_calls: int
+    candidate_calls: int
+    kinds: Counter
+    mismatches: List[Mismatch]
+
+    @property
+    def calls_saved(self) -> int:
+        return self.reference_calls - self.candidate_calls
+
+
+def generate_case(rnd: random.Random) -> Tuple[HotelsPages, dict]:
+    """
+    Случайный набор страниц и параметров команды: от 1 до 5 страниц по 0-8 отелей, расстояния с шагом 0.1 км
+    (часть отелей без расстояния, возможны страницы без расстояний), одинаковые цены и расстояния, ошибки запроса
+    страниц; диапазон расстояний пользователя - внутри, слева и справа от расстояний отелей.
+    """
+
+    count_pages = rnd.randint(1, 5)
+    no_distance = rnd.random() < 0.05
+    dist = rnd.choice((0.1, 0.5, 1.0))
+    pages = []
+    for page_number in range(1, count_pages + 1):
+        page = []
+        for ind in range(rnd.choice((0, 1, 2, 3, 5, 8)) if rnd.random() < 0.1 else rnd.randint(3, 8)):
+            if no_distance or rnd.random() < 0.15:
+                to_center = None
+            else:
+                dist = round(dist + rnd.choice((0, 0.1, 0.1, 0.2, 0.5)), 1)
+                to_center = dist
+            page.append({'name': f'hotel {page_number}-{ind}', 'price_exact': float(rnd.randrange(1000, 9000, 250)),
+                         'to_center_exact': to_center})
+        pages.append(page)
+    error_pages = frozenset(page_number for page_number in range(1, count_pages + 1) if rnd.random() < 0.05)
+    last_next_page = rnd.choice((0, count_pages))
+
+    dists = [hotel['to_center_exact'] for page in pages for hotel in page if hotel['to_center_exact']] or [1.0]
+    low, high = min(dists), max(dists)
+    bounds = sorted(round(rnd.uniform(low - 1.0, high + 1.0), 1) for _ in range(2))
+    if rnd.random() < 0.3:
+        bounds = sorted(rnd.sample(dists, 2) if len(dists) > 1 else dists * 2)
+    cmd_options = {'size_result': rnd.randint(1, 6), 'range_dist': tuple(bounds)}
+    return HotelsPages(pages, error_pages, last_next_page), cmd_options
+
+
+def run_engine(engine_cls, pages: HotelsPages, cmd_options: dict) -> Tuple[tuple, int]:
+    """
+    Выполнение команды классом engine_cls на наборе страниц.
+
+    :return: результат (отели, текст ошибки, примечание или тип исключения) и кол-во api запросов страниц.
+    """
+
+    calls = pages.calls
+    engine = engine_cls({'sortOrder': 'DISTANCE_FROM_LANDMARK'}, dict(cmd_options), True)
+    engine.query_hotels = pages.query
+    try:
+        result = engine.start()
+        outcome = (result.hotels, result.err_msg, result.warning_msg)
+    except Exception as e:
+        outcome = ('raised', type(e).__name__)
+    return outcome, pages.calls - calls
+
+
+def classify(outcome: tuple) -> str:
+    """ Вид результата эталона для отчета. """
+
+    if outcome[0] == 'raised':
+        return 'raised'
+    hotels, err_msg, warning = outcome
+    if err_msg:
+        return 'error'
+    for kind, text in WARNING_KINDS:
+        if text in warning:
+            #  при выходе за правую границу результат дополнен отелями предыдущей страницы
+            if kind == 'right' and len({hotel['name'].split('-')[0] for hotel in hotels}) > 1:
+                return 'back_fill'
+            return kind
+    return 'in_range' if hotels else 'empty'
+
+
+def run_differential(candidate_cls, cases: int = 1000, seed: int = 0,
+                     reference_cls=ReferenceCmdSortByPriceAndDist) -> DiffReport:
+    """
+    Сравнение результатов candidate_cls с эталоном на cases случайных наборах данных.
+
+    :param candidate_cls: проверяемый класс исполнителя команды (конструктор и start() как у CmdSortByPriceAndDist).
+    :param cases: кол-во наборов данных.
+    :param seed: начальное значение генератора наборов (для воспроизведения расхождений).
+    :param reference_cls: эталонный класс.
+    """
+
+    rnd = random.Random(seed)
+    reference_calls = candidate_calls = 0
+    kinds: Counter = Counter()
+    mismatches = []
+    for case in range(cases):
+        pages, cmd_options = generate_case(rnd)
+        expected, calls = run_engine(reference_cls, pages, cmd_options)
+        reference_calls += calls
+        received, calls = run_engine(candidate_cls, pages, cmd_options)
+        candidate_calls += calls
+        kinds[classify(expected)] += 1
+        if received != expected:
+            mismatches.append(Mismatch(case, cmd_options, pages.pages, expected, received))
+    return DiffReport(cases, reference_calls, candidate_calls, kinds, mismatches)
+
+
+def format_report(report: DiffReport, name: str) -> str:
+    lines = [f'{name}: cases {report.cases}, mismatches {len(report.mismatches)}',
+             f'api calls: reference {report.reference_calls}, candidate {report.candidate_calls}, '
+             f'saved {report.calls_saved} ({report.calls_saved / max(report.reference_calls, 1):.1%})',
+             'cases by kind: ' + ', '.join(f'{kind} {count}' for kind, count in report.kinds.most_common())]
+    for mismatch in report.mismatches[:3]:
+        lines.append(f'case {mismatch.case}: {mismatch.cmd_options}\n  expected: {mismatch.expected}\n'
+                     f'  received: {mismatch.received}')
+    return '\n'.join(lines)
+
+
+def main(cases: int, seed: int, candidates: Optional[Dict[str, type]] = None) -> None:
+    candidates = candidates or {'CmdSortByPriceAndDist': CmdSortByPriceAndDist}
+    for name, candidate_cls in candidates.items():
+        print(format_report(run_differential(candidate_cls, cases, seed), name))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000, int(sys.argv[2]) if len(sys.argv) > 2 else 0)
@@ -11,20 +11,31 @@
 6. Добавление к тексту вопроса (отправляемый вместе с календарем) по указанию даты, информации о выбранной дате.
 7. Сохранение в календаре информации о дате въезда, чтобы при показе календаря для выбора даты выезда,
  показать отмеченный день въезда.
+8. Кэширование шаблонов клавиатуры месяца (уже сериализованных в json): при нажатии кнопок календаря
+ в шаблон подставляются только меняющиеся дни (сегодня, дата въезда, дата выезда).
+9. Данные кнопок кодируются компилированным кодеком (callback_codec.CallbackCodec) вместо CallbackData.
+10. Календарь без состояния: выбранная дата и дата въезда передаются в данных каждой кнопки календаря,
+ поэтому следующий вид календаря строится только по нажатой кнопке (без объекта календаря в сессии пользователя).
+11. Текст сообщения календаря строится по шаблону (вопрос и выбранная дата, см. DateMessage) вместо замены
+ регулярным выражением. Текст изменяется только при выборе даты, при перелистывании изменяется только клавиатура.
 
 """
 
 import datetime
 import calendar
-import re
-import typing
+import json
 from dataclasses import dataclass
+from functools import lru_cache
+from json.encoder import encode_basestring_ascii
+from typing import Optional
 
 from telebot import TeleBot
-from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
+from telebot.types import CallbackQuery, JsonSerializable
 
+from callback_codec import CallbackCodec
 
-@dataclass
+
+@dataclass(frozen=True)
 class Language:
     days: tuple
     months: tuple
@@ -67,31 +78,194 @@ RUSSIAN_LANGUAGE = Language(
 )
 
 
+CALENDAR_ACTIONS = ("IGNORE", "MONTHS", "DAY", "PREVIOUS-MONTH", "NEXT-MONTH", "OK", "MONTH")
+
+
+@lru_cache(maxsize=None)
+def calendar_codec(name: str) -> CallbackCodec:
+    """
+    Codec of the calendar buttons data: action, year, month, day
+    and the calendar state: selected date and check-in date.
+    """
+
+    return CallbackCodec(name, action=CALENDAR_ACTIONS, year=int, month=int, day=int,
+                         selection=datetime.date, check_in=datetime.date)
+
+
+@dataclass(frozen=True)
+class DateMessage:
+    """
+    Text of the calendar message: the question and the selected date slot.
+    """
+
+    question: str
+    selection: Optional[datetime.date] = None
+
+    #  selected date in the message: html to send and the text without formatting (as telegram returns it)
+    SELECTION_HTML = " <b>Выбранная дата: {:%d.%m.%Y}</b>"
+    SELECTION_TEXT = " Выбранная дата: {:%d.%m.%Y}"
+
+    @classmethod
+    def from_text(cls, text: str, selection: Optional[datetime.date] = None) -> "DateMessage":
+        """
+        Message from the text of the sent calendar message (call.message.text).
+
+        :param selection: Selected date from the button data, its slot is cut from the text.
+        """
+
+        if selection:
+            slot = cls.SELECTION_TEXT.format(selection)
+            if text.endswith(slot):
+                text = text[:-len(slot)]
+        return cls(text, selection)
+
+    def with_selection(self, selection: datetime.date) -> "DateMessage":
+        return DateMessage(self.question, selection)
+
+    @property
+    def html(self) -> str:
+        if self.selection is None:
+            return self.question
+        return self.question + self.SELECTION_HTML.format(self.selection)
+
+
+class KeyboardJson(JsonSerializable):
+    """
+    Inline keyboard that is already serialized to json (telebot sends the result of to_json() as is).
+    """
+
+    __slots__ = ('json',)
+
+    def __init__(self, json_str: str):
+        self.json = json_str
+
+    def to_json(self) -> str:
+        return self.json
+
+    def to_dict(self) -> dict:
+        return json.loads(self.json)
+
+
+def _button(text: str, callback_data: str) -> str:
+    """ Button serialized the same way as json.dumps(InlineKeyboardButton.to_dict()). """
+
+    return ('{"text": ' + encode_basestring_ascii(text)
+            + ', "callback_data": ' + encode_basestring_ascii(callback_data) + '}')
+
+
+def _keyboard(rows) -> str:
+    return '{"inline_keyboard": [' + ", ".join("[" + ", ".join(row) + "]" for row in rows) + "]}"
+
+
+@lru_cache(maxsize=4096)
+def _state_suffix(name: str, selection: Optional[datetime.date], check_in: Optional[datetime.date]) -> str:
+    """
+    Calendar state to substitute into the templates. Templates are built without the state,
+    so the data of every template button ends with empty fields "selection" and "check_in" (a '::"' suffix).
+    """
+
+    calendar_callback = calendar_codec(name)
+    sep = calendar_callback.sep
+    data = calendar_callback.encode("IGNORE", None, None, None, selection, check_in)
+    return sep + data.split(sep, 5)[5] + '"'
+
+
+def _set_state(keyboard_json: str, state: str) -> str:
+    return keyboard_json.replace('::"', state) if state != '::"' else keyboard_json
+
+
+@lru_cache(maxsize=256)
+def _get_month_template(name: str, year: int, month: int, language: Language):
+    """
+    Month template: serialized buttons by rows and the position (row, column) of each day of the month.
+    """
+
+    calendar_callback = calendar_codec(name)
+    data_ignore = calendar_callback.encode("IGNORE", year, month, None, None, None)
+
+    rows = [
+        (_button(language.months[month - 1] + " " + str(year),
+                 calendar_callback.encode("MONTHS", year, month, None, None, None)),),
+        tuple(_button(day, data_ignore) for day in language.days),
+    ]
+    days = {}
+    for week in calendar.monthcalendar(year, month):
+        row = []
+        for day in week:
+            if day == 0:
+                row.append(_button(" ", data_ignore))
+            else:
+                days[day] = (len(rows), len(row), calendar_callback.encode("DAY", year, month, day, None, None))
+                row.append(_button(str(day), days[day][2]))
+        rows.append(tuple(row))
+    rows.append((
+        _button("<", calendar_callback.encode("PREVIOUS-MONTH", year, month, None, None, None)),
+        _button("OK", calendar_callback.encode("OK", year, month, None, None, None)),
+        _button(">", calendar_callback.encode("NEXT-MONTH", year, month, None, None, None)),
+    ))
+    return tuple(rows), days
+
+
+@lru_cache(maxsize=4096)
+def _render_month(name: str, year: int, month: int, language: Language, overlays: tuple, state: str) -> str:
+    """
+    Serialized month keyboard with the variable cells overlaid.
+
+    :param overlays: ((day, button text), ...)
+    :param state: calendar state in the buttons data (see _state_suffix)
+    """
+
+    rows, days = _get_month_template(name, year, month, language)
+    if overlays:
+        rows = list(rows)
+        for day, text in overlays:
+            ind_row, ind_col, callback_data = days[day]
+            row = list(rows[ind_row])
+            row[ind_col] = _button(text, callback_data)
+            rows[ind_row] = row
+    return _set_state(_keyboard(rows), state)
+
+
+@lru_cache(maxsize=256)
+def _render_months(name: str, year: int, language: Language, state: str) -> str:
+    calendar_callback = calendar_codec(name)
+    return _set_state(_keyboard(
+        (_button(month[0], calendar_callback.encode("MONTH", year, 2 * i + 1, None, None, None)),
+         _button(month[1], calendar_callback.encode("MONTH", year, (i + 1) * 2, None, None, None)))
+        for i, month in enumerate(zip(language.months[0::2], language.months[1::2]))
+    ), state)
+
+
 class Calendar:
     """
-    Calendar data factory
+    Calendar data factory.
+    The calendar has no state: the selected date and the check-in date are carried in the buttons data.
     """
 
-    __lang: Language
+    __slots__ = ('__lang',)
 
     def __init__(self, language: Language = ENGLISH_LANGUAGE):
         self.__lang = language
-        self.cur_selection = None
-        self.save_date = None
 
     def create_calendar(
         self,
         name: str = "calendar",
         year: int = None,
         month: int = None,
-    ) -> InlineKeyboardMarkup:
+        selection: datetime.date = None,
+        check_in: datetime.date = None,
+    ) -> "KeyboardJson":
         """
-        Create a built in inline keyboard with calendar
+        Create a built in inline keyboard with calendar.
+        The keyboard is assembled from the cached month template, only the variable cells
+        (today, check-in and check-out days) are overlaid.
 
         :param name:
         :param year: Year to use in the calendar if you are not using the current year.
         :param month: Month to use in the calendar if you are not using the current month.
-        :return: Returns an InlineKeyboardMarkup object with a calendar.
+        :param selection: Selected (not yet confirmed) date.
+        :param check_in: Confirmed check-in date, when the calendar is used to select the check-out date.
+        :return: Returns a serialized inline keyboard with a calendar.
         """
 
         now_day = datetime.datetime.utcnow()
@@ -101,118 +275,40 @@ class Calendar:
         if month is None:
             month = now_day.month
 
-        calendar_callback = CallbackData(name, "action", "year", "month", "day")
-        data_ignore = calendar_callback.new("IGNORE", year, month, "!")
-        data_months = calendar_callback.new("MONTHS", year, month, "!")
-
-        keyboard = InlineKeyboardMarkup(row_width=7)
-
-        keyboard.add(
-            InlineKeyboardButton(
-                self.__lang.months[month - 1] + " " + str(year),
-                callback_data=data_months,
-            )
-        )
-
-        keyboard.add(
-            *[
-                InlineKeyboardButton(day, callback_data=data_ignore)
-                for day in self.__lang.days
-            ]
-        )
-
-        for week in calendar.monthcalendar(year, month):
-            row = list()
-            for day in week:
-                if day == 0:
-                    row.append(InlineKeyboardButton(" ", callback_data=data_ignore))
-                elif datetime.datetime(year, month, day) in (self.cur_selection, self.save_date):
-                    if self.save_date and self.cur_selection == datetime.datetime(year, month, day):
-                        symbol = "⤵"
-                    else:
-                        symbol = "⤴"
-                    row.append(
-                        InlineKeyboardButton(
-                            symbol,
-                            callback_data=calendar_callback.new(
-                                "DAY", year, month, day
-                            ),
-                        )
-                    )
-                elif (
-                    f"{now_day.day}.{now_day.month}.{now_day.year}"
-                    == f"{day}.{month}.{year}"
-                ):
-                    row.append(
-                        InlineKeyboardButton(
-                            f"<{day}>",
-                            callback_data=calendar_callback.new(
-                                "DAY", year, month, day
-                            ),
-                        )
-                    )
+        overlays = {}
+        if now_day.year == year and now_day.month == month:
+            overlays[now_day.day] = f"<{now_day.day}>"
+        for date in (selection, check_in):
+            if date and date.year == year and date.month == month:
+                if check_in and selection == date:
+                    overlays[date.day] = "⤵"
                 else:
-                    row.append(
-                        InlineKeyboardButton(
-                            str(day),
-                            callback_data=calendar_callback.new(
-                                "DAY", year, month, day
-                            ),
-                        )
-                    )
-            keyboard.add(*row)
-
-        keyboard.add(
-            InlineKeyboardButton(
-                "<",
-                callback_data=calendar_callback.new("PREVIOUS-MONTH", year, month, "!"),
-            ),
-            InlineKeyboardButton(
-                "OK",
-                callback_data=calendar_callback.new("OK", year, month, "!"),
-            ),
-            InlineKeyboardButton(
-                ">", callback_data=calendar_callback.new("NEXT-MONTH", year, month, "!")
-            ),
-        )
+                    overlays[date.day] = "⤴"
 
-        return keyboard
+        return KeyboardJson(_render_month(name, year, month, self.__lang, tuple(sorted(overlays.items())),
+                                          _state_suffix(name, selection, check_in)))
 
     def create_months_calendar(
-        self, name: str = "calendar", year: int = None
-    ) -> InlineKeyboardMarkup:
+        self,
+        name: str = "calendar",
+        year: int = None,
+        selection: datetime.date = None,
+        check_in: datetime.date = None,
+    ) -> "KeyboardJson":
         """
         Creates a calendar with month selection
 
         :param name:
         :param year:
+        :param selection:
+        :param check_in:
         :return:
         """
 
         if year is None:
             year = datetime.datetime.now().year
 
-        calendar_callback = CallbackData(name, "action", "year", "month", "day")
-
-        keyboard = InlineKeyboardMarkup()
-
-        for i, month in enumerate(
-            zip(self.__lang.months[0::2], self.__lang.months[1::2])
-        ):
-            keyboard.add(
-                InlineKeyboardButton(
-                    month[0],
-                    callback_data=calendar_callback.new("MONTH", year, 2 * i + 1, "!"),
-                ),
-                InlineKeyboardButton(
-                    month[1],
-                    callback_data=calendar_callback.new(
-                        "MONTH", year, (i + 1) * 2, "!"
-                    ),
-                ),
-            )
-
-        return keyboard
+        return KeyboardJson(_render_months(name, year, self.__lang, _state_suffix(name, selection, check_in)))
 
     def calendar_query_handler(
         self,
@@ -223,10 +319,13 @@ class Calendar:
         year: int,
         month: int,
         day: int,
-    ) -> None or datetime.datetime:
+        selection: datetime.date = None,
+        check_in: datetime.date = None,
+    ) -> None or datetime.date:
         """
         The method creates a new calendar if the forward or backward button is pressed
         This method should be called inside CallbackQueryHandler.
+        The result depends only on the button data (decoded by calendar_codec(name)).
 
 
         :param bot: The object of the bot CallbackQueryHandler
@@ -236,100 +335,68 @@ class Calendar:
         :param year:
         :param action:
         :param name:
-        :return: Returns a tuple
+        :param selection: Selected date from the button data.
+        :param check_in: Check-in date from the button data.
+        :return: Returns the selected date when it is confirmed by "OK" button, otherwise None
         """
 
-        current = datetime.datetime(int(year), int(month), 1)
-        msg_template = ' <b>Выбранная дата: {}</b>'
-        if self.cur_selection:
-            msg_txt = re.sub(r' Выбранная.+', msg_template.format(self.cur_selection.strftime("%d.%m.%Y")),
-                             call.message.text)
-        else:
-            msg_txt = call.message.text
+        current = datetime.date(int(year), int(month), 1)
         if action == "IGNORE":
             bot.answer_callback_query(callback_query_id=str(call.id))
-            return False, None
+            return None
         elif action == "DAY":
-            sel_date = datetime.datetime(int(year), int(month), int(day))
-            if sel_date == self.cur_selection:
+            sel_date = datetime.date(int(year), int(month), int(day))
+            if sel_date == selection:
                 bot.answer_callback_query(str(call.id))
-                return
-            if self.save_date and sel_date <= self.save_date:
+                return None
+            if check_in and sel_date <= check_in:
                 bot.answer_callback_query(str(call.id), 'Дата выезда должна быть позже даты въезда!')
-                return
-            if sel_date.date() >= datetime.datetime.utcnow().date():
-                if self.cur_selection:
-                    msg_txt = re.sub(r' Выбранная.+', msg_template.format(sel_date.strftime("%d.%m.%Y")),
-                                     call.message.text)
-                else:
-                    msg_txt = call.message.text + msg_template.format(sel_date.strftime("%d.%m.%Y"))
-                self.cur_selection = sel_date
+                return None
+            if sel_date >= datetime.datetime.utcnow().date():
+                #  изменилась выбранная дата - изменяется и текст сообщения
+                message = DateMessage.from_text(call.message.text, selection).with_selection(sel_date)
                 bot.edit_message_text(
-                    text=msg_txt,
+                    text=message.html,
                     chat_id=call.message.chat.id,
                     message_id=call.message.message_id,
                     reply_markup=self.create_calendar(
                         name=name,
                         year=current.year,
                         month=current.month,
+                        selection=sel_date,
+                        check_in=check_in,
                     ),
                     parse_mode='HTML'
                 )
             else:
                 bot.answer_callback_query(str(call.id), 'Дата не должна быть ранее текущей!')
-            return datetime.datetime(int(year), int(month), int(day))
+            return None
 
         elif action == "PREVIOUS-MONTH":
             preview_month = current - datetime.timedelta(days=1)
-            bot.edit_message_text(
-                text=msg_txt,
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                reply_markup=self.create_calendar(
-                    name=name,
-                    year=int(preview_month.year),
-                    month=int(preview_month.month),
-                ),
-                parse_mode='HTML'
+            keyboard = self.create_calendar(
+                name=name,
+                year=int(preview_month.year),
+                month=int(preview_month.month),
+                selection=selection,
+                check_in=check_in,
             )
-            return None
         elif action == "NEXT-MONTH":
             next_month = current + datetime.timedelta(days=31)
-            bot.edit_message_text(
-                text=msg_txt,
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                reply_markup=self.create_calendar(
-                    name=name, year=int(next_month.year), month=int(next_month.month)
-                ),
-                parse_mode='HTML'
+            keyboard = self.create_calendar(
+                name=name, year=int(next_month.year), month=int(next_month.month),
+                selection=selection, check_in=check_in
             )
-            return None
         elif action == "MONTHS":
-            bot.edit_message_text(
-                text=msg_txt,
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                reply_markup=self.create_months_calendar(name=name, year=current.year),
-                parse_mode='HTML'
-            )
-            return None
+            keyboard = self.create_months_calendar(name=name, year=current.year,
+                                                   selection=selection, check_in=check_in)
         elif action == "MONTH":
-            bot.edit_message_text(
-                text=msg_txt,
-                chat_id=call.message.chat.id,
-                message_id=call.message.message_id,
-                reply_markup=self.create_calendar(
-                    name=name, year=int(year), month=int(month)
-                ),
-                parse_mode='HTML'
+            keyboard = self.create_calendar(
+                name=name, year=int(year), month=int(month), selection=selection, check_in=check_in
             )
-            return None
         elif action == "OK":
-            if self.cur_selection:
-                self.save_date = self.cur_selection
-                self.cur_selection = None
-                return self.save_date
+            if selection:
+                return selection
             else:
                 bot.answer_callback_query(str(call.id), 'Сначала нужно указать дату!')
             return None
@@ -341,102 +408,10 @@ class Calendar:
             )
             return None
 
-
-class CallbackData:
-    """
-    Callback data factory
-    """
-
-    def __init__(self, prefix, *parts, sep=":"):
-        if not isinstance(prefix, str):
-            raise TypeError(
-                f"Prefix must be instance of str not {type(prefix).__name__}"
-            )
-        if not prefix:
-            raise ValueError("Prefix can't be empty")
-        if sep in prefix:
-            raise ValueError(f"Separator {sep!r} can't be used in prefix")
-        if not parts:
-            raise TypeError("Parts were not passed!")
-
-        self.prefix = prefix
-        self.sep = sep
-
-        self._part_names = parts
-
-    def new(self, *args, **kwargs) -> str:
-        """
-        Generate callback data
-
-        :param args:
-        :param kwargs:
-        :return:
-        """
-
-        args = list(args)
-
-        data = [self.prefix]
-
-        for part in self._part_names:
-            value = kwargs.pop(part, None)
-            if value is None:
-                if args:
-                    value = args.pop(0)
-                else:
-                    raise ValueError(f"Value for {part!r} was not passed!")
-
-            if value is not None and not isinstance(value, str):
-                value = str(value)
-
-            if not value:
-                raise ValueError(f"Value for part {part!r} can't be empty!'")
-            if self.sep in value:
-                raise ValueError(
-                    f"Symbol {self.sep!r} is defined as the separator and can't be used in parts' values"
-                )
-
-            data.append(value)
-
-        if args or kwargs:
-            raise TypeError("Too many arguments were passed!")
-
-        callback_data = self.sep.join(data)
-        if len(callback_data) > 64:
-            raise ValueError("Resulted callback data is too long!")
-
-        return callback_data
-
-    def parse(self, callback_data: str) -> typing.Dict[str, str]:
-        """
-        Parse data from the callback data
-
-        :param callback_data:
-        :return:
-        """
-
-        prefix, *parts = callback_data.split(self.sep)
-
-        if prefix != self.prefix:
-            raise ValueError("Passed callback data can't be parsed with that prefix.")
-        elif len(parts) != len(self._part_names):
-            raise ValueError("Invalid parts count!")
-
-        result = {"@": prefix}
-        result.update(zip(self._part_names, parts))
-
-        return result
-
-    def filter(self, **config):
-        """
-        Generate filter
-
-        :param config:
-        :return:
-        """
-
-        print(config, self._part_names)
-        for key in config.keys():
-            if key not in self._part_names:
-                return False
-
-        return True
+        #  перелистывание календаря: текст сообщения не изменяется, отправляется только клавиатура
+        bot.edit_message_reply_markup(
+            chat_id=call.message.chat.id,
+            message_id=call.message.message_id,
+            reply_markup=keyboard,
+        )
+        return None
@@ -0,0 +1,175 @@
+"""
+Кодирование данных inline кнопок (callback_data).
+
+Схема данных кнопки (префикс и поля) компилируется один раз в список функций кодирования/декодирования полей.
+Числа кодируются в base36, даты - кол-вом дней от DATE_EPOCH (тоже в base36), значения из заданного набора -
+номером значения, поэтому данные кнопки короче и больше полей помещается в ограничение телеграма 64 байта.
+Префикс отделяется от полей разделителем ":" (по префиксу маршрутизатор определяет обработчик).
+"""
+
+from collections import namedtuple
+from datetime import date
+from typing import Callable, Optional, Tuple
+
+
+MAX_CALLBACK_DATA_LENGTH = 64
+#  начало отсчета дней для полей с датой
+DATE_EPOCH = date(2020, 1, 1)
+_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+
+
+def to_base36(number: int) -> str:
+    if number < 0:
+        raise ValueError(f'Отрицательное число {number} не кодируется')
+    if number < 36:
+        return _DIGITS[number]
+    digits = []
+    while number:
+        number, rest = divmod(number, 36)
+        digits.append(_DIGITS[rest])
+    return ''.join(reversed(digits))
+
+
+#  готовые коды небольших чисел (дни, месяцы, годы) и обратная таблица (пустой код - нет значения)
+_BASE36 = tuple(to_base36(number) for number in range(4096))
+_FROM_BASE36 = {code: number for number, code in enumerate(_BASE36)}
+_FROM_BASE36[''] = None
+
+
+def _compile_field(name: str, field_type, sep: str) -> Tuple[Callable, Callable]:
+    """
+    Функции кодирования и декодирования поля. Пустое значение поля (None) кодируется пустой строкой.
+
+    :param field_type: int - число, date - дата (не ранее DATE_EPOCH), tuple - набор допустимых строковых значений,
+     str - строка без разделителя.
+    """
+
+    if field_type is int:
+        def encode(value):
+            if value is None:
+                return ''
+            return _BASE36[value] if 0 <= value < 4096 else to_base36(value)
+
+        def decode(text):
+            try:
+                return _FROM_BASE36[text]
+            except KeyError:
+                return int(text, 36)
+    elif field_type is date:
+        epoch = DATE_EPOCH.toordinal()
+
+        def encode(value):
+            if value is None:
+                return ''
+            days = value.toordinal() - epoch
+            return _BASE36[days] if 0 <= days < 4096 else to_base36(days)
+
+        def decode(text):
+            if not text:
+                return None
+            return date.fromordinal(epoch + int(text, 36))
+    elif isinstance(field_type, tuple):
+        if len(field_type) > len(_DIGITS):
+            raise ValueError(f'Слишком много значений поля {name!r}')
+        codes = {value: _DIGITS[ind] for ind, value in enumerate(field_type)}
+        values = {code: value for value, code in codes.items()}
+        codes[None] = ''
+        values[''] = None
+        #  поиск по словарю без вызова python функции
+        encode = codes.__getitem__
+        decode = values.__getitem__
+    elif field_type is str:
+        def encode(value):
+            if value is None:
+                return ''
+            if sep in value:
+                raise ValueError(f'Значение поля {name!r} не может содержать разделитель {sep!r}')
+            return value
+
+        def decode(text):
+            return text or None
+    else:
+        raise TypeError(f'Неизвестный тип поля {name!r}: {field_type!r}')
+    return encode, decode
+
+
+class CallbackCodec:
+    """
+    Кодек данных inline кнопок по схеме: префикс и поля с типами (см. _compile_field).
+    Пример: CallbackCodec('cal', action=('DAY', 'OK'), year=int, month=int, day=int).
+    Для схемы генерируются функции encode/decode, которые кодируют/декодируют все поля за один проход
+    (без циклов по полям и промежуточных списков).
+
+    :param prefix: префикс данных (непустая строка без разделителя).
+    :param fields: поля данных и их типы (в порядке кодирования).
+    """
+
+    sep = ':'
+
+    def __init__(self, prefix: str, **fields):
+        if not prefix or self.sep in prefix:
+            raise ValueError(f'Некорректный префикс {prefix!r}')
+        if not fields:
+            raise TypeError('Не указаны поля данных')
+        self.prefix = prefix
+        self.fields = tuple(fields)
+        self.data_cls = namedtuple(f'{prefix.capitalize()}Data', self.fields)
+        #  длину в байтах нужно считать только для строковых полей (остальные поля и префикс - ascii)
+        self._check_bytes = str in fields.values() or not prefix.isascii()
+        self._encode, self._decode = self._compile([_compile_field(name, field_type, self.sep)
+                                                    for name, field_type in fields.items()])
+
+    def _compile(self, compiled_fields: list) -> Tuple[Callable, Callable]:
+        namespace = {'data_cls': self.data_cls, 'new': tuple.__new__}
+        args = []
+        encode_parts = []
+        decode_parts = []
+        for ind, (encode, decode) in enumerate(compiled_fields):
+            namespace[f'e{ind}'] = encode
+            namespace[f'd{ind}'] = decode
+            args.append(f'v{ind}')
+            encode_parts.append(f'{{e{ind}(v{ind})}}')
+            decode_parts.append(f'd{ind}(parts[{ind + 1}])')
+        prefix = self.prefix.replace('{', '{{').replace('}', '}}')
+        source = (
+            f'def encode({", ".join(args)}):\n'
+            f'    return f{(prefix + self.sep + self.sep.join(encode_parts))!r}\n'
+            f'def decode(parts):\n'
+            f'    return new(data_cls, ({", ".join(decode_parts)},))\n'
+        )
+        exec(source, namespace)
+        return namespace['encode'], namespace['decode']
+
+    def encode(self, *values) -> str:
+        """
+        Данные кнопки из значений полей (в порядке схемы).
+
+        :raise ValueError: недопустимое значение поля, превышение длины данных.
+        :raise TypeError: неверное кол-во значений.
+        """
+
+        try:
+            data = self._encode(*values)
+        except KeyError as e:
+            raise ValueError(f'Недопустимое значение поля: {e}') from None
+        except AttributeError:
+            raise TypeError(f'Неверный тип значения поля: {values!r}') from None
+        if len(data.encode() if self._check_bytes else data) > MAX_CALLBACK_DATA_LENGTH:
+            raise ValueError(f'Длина данных кнопки больше {MAX_CALLBACK_DATA_LENGTH} байт: {data!r}')
+        return data
+
+    def decode(self, data: Optional[str]):
+        """
+        Значения полей из данных кнопки.
+
+        :return: namedtuple с полями схемы.
+        :raise ValueError: данные не соответствуют схеме.
+        """
+
+        parts = (data or '').split(self.sep)
+        if parts[0] != self.prefix or len(parts) != len(self.fields) + 1:
+            raise ValueError(f'Данные {data!r} не соответствуют схеме {self.prefix!r}')
+        try:
+            return self._decode(parts)
+        except (KeyError, ValueError):
+            raise ValueError(f'Некорректное значение в данных {data!r}') from None
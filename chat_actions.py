@@ -0,0 +1,114 @@
+"""
+Индикатор «набора текста» для длительных операций (поиск локаций, выполнение команды, отправка результата).
+
+Телеграм показывает индикатор около 5 секунд, поэтому пока операция выполняется, индикатор повторно отправляется
+фоновым потоком не чаще, чем раз в interval секунд. Потоки обработки обновлений на отправку индикатора не тратятся.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from telebot import TeleBot
+
+
+logger = logging.getLogger('main.chat_actions')
+
+
+class TypingIndicator:
+    """
+    Общий для всех чатов фоновый поток, отправляющий индикатор в чаты с активными операциями.
+    Поток запускается при первом использовании.
+
+    :param bot: объект бота.
+    :param interval: интервал повторной отправки индикатора, в секундах.
+    :param action: отправляемое действие.
+    :param max_workers: кол-во потоков, отправляющих запросы (медленный запрос в один чат не задерживает другие).
+    """
+
+    def __init__(self, bot: TeleBot, interval: float = 4.0, action: str = 'typing', max_workers: int = 4):
+        self.bot = bot
+        self.interval = interval
+        self.action = action
+        self.max_workers = max_workers
+        self._chats: Dict[int, List] = {}  # id чата -> [кол-во активных операций, время следующей отправки]
+        self._sending = set()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+
+    @contextmanager
+    def show(self, chat_id: int):
+        """
+        Индикатор отображается в чате, пока выполняется блок with. Вложенные блоки для одного чата допустимы.
+
+        :param chat_id: id чата.
+        """
+
+        self._start(chat_id)
+        try:
+            yield
+        finally:
+            self._stop(chat_id)
+
+    def _start(self, chat_id: int) -> None:
+        with self._cond:
+            item = self._chats.get(chat_id)
+            if item is not None:
+                item[0] += 1
+                return
+            self._chats[chat_id] = [1, 0.0]
+            if self._thread is None and not self._closed:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='ChatAction')
+                self._thread = threading.Thread(target=self._loop, name='TypingIndicator', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _stop(self, chat_id: int) -> None:
+        with self._cond:
+            item = self._chats[chat_id]
+            item[0] -= 1
+            if not item[0]:
+                del self._chats[chat_id]
+
+    def active_chats(self) -> int:
+        with self._cond:
+            return len(self._chats)
+
+    def _loop(self) -> None:
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                for chat_id, item in self._chats.items():
+                    if item[1] > now:
+                        continue
+                    item[1] = now + self.interval
+                    if chat_id not in self._sending:
+                        self._sending.add(chat_id)
+                        self._executor.submit(self._send, chat_id)
+                next_time = min((item[1] for item in self._chats.values()), default=None)
+                self._cond.wait(None if next_time is None else next_time - now)
+
+    def _send(self, chat_id: int) -> None:
+        try:
+            with self._cond:
+                if chat_id not in self._chats:  # операция уже завершилась
+                    return
+            self.bot.send_chat_action(chat_id, self.action)
+        except Exception:
+            logger.exception(f'Не удалось отправить индикатор в чат {chat_id}')
+        finally:
+            with self._cond:
+                self._sending.discard(chat_id)
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._executor.shutdown(wait=False)
@@ -1,3 +1,4 @@
+import hashlib
 import os
 
 from dotenv import load_dotenv
@@ -5,6 +6,12 @@ from dotenv import load_dotenv
 load_dotenv()
 
 TG_TOKEN = os.getenv('TG_TOKEN')
+#  шаблон адреса api телеграма ({0} - токен, {1} - метод), например локального сервера fake_telegram.py:
+#  "http://127.0.0.1:8081/bot{0}/{1}" (пустая строка - api.telegram.org)
+TG_API_URL = os.getenv('TG_API_URL', '')
+#  префикс файлов состояния по умолчанию (сессии, снимок, кэш file_id фото) при работе с другим сервером api:
+#  file_id и диалоги сервера не должны попадать в файлы бота, работающего с телеграмом
+STATE_FILES_PREFIX = 'fake_' if TG_API_URL else ''
 
 HEADERS_RAPID_API = {
     'x-rapidapi-key': os.getenv('RAPID_API_KEY'),
@@ -15,3 +22,74 @@ LOCALE = "ru_RU"
 CURRENCY = "RUB"
 
 DEBUG_NAME_CITY = 'москва'
+
+#  хранилище сессий пользователей: "memory" - в памяти процесса, "sqlite" - в файле (общее для нескольких процессов)
+SESSION_STORAGE = os.getenv('SESSION_STORAGE', 'memory')
+SESSION_DB_PATH = os.getenv('SESSION_DB_PATH', f'{STATE_FILES_PREFIX}sessions.sqlite3')
+
+#  кол-во потоков обработки обновлений (обновления одного чата обрабатываются последовательно)
+NUM_WORKERS = int(os.getenv('NUM_WORKERS', 16))
+
+#  способ отправки найденных отелей: "album" - альбомами до 10 фото, "single" - по одному сообщению на отель
+HOTELS_DELIVERY_MODE = os.getenv('HOTELS_DELIVERY_MODE', 'album')
+
+#  снимок незавершенных диалогов (сессий в памяти) и кэшей при остановке бота для восстановления при запуске
+#  (пустая строка - без снимка)
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', f'{STATE_FILES_PREFIX}snapshot.txt')
+
+#  кэш file_id отправленных фото (повторная отправка фото без загрузки файла/скачивания по url)
+PHOTO_CACHE_PATH = os.getenv('PHOTO_CACHE_PATH', f'{STATE_FILES_PREFIX}photo_cache.json')
+PHOTO_CACHE_SIZE = int(os.getenv('PHOTO_CACHE_SIZE', 10000))
+
+#  проверка доступности фото отелей перед отправкой: кол-во потоков (0 - без проверки), таймаут (с), время кэша (с)
+#  и время кэша результата при ошибке сети (таймаут, разрыв соединения), с
+PHOTO_CHECK_WORKERS = int(os.getenv('PHOTO_CHECK_WORKERS', 8))
+PHOTO_CHECK_TIMEOUT = float(os.getenv('PHOTO_CHECK_TIMEOUT', 2.0))
+PHOTO_CHECK_TTL = int(os.getenv('PHOTO_CHECK_TTL', 3600))
+PHOTO_CHECK_ERROR_TTL = int(os.getenv('PHOTO_CHECK_ERROR_TTL', 60))
+
+#  лимиты исходящих запросов к api телеграма (в секунду): для всего бота, для одного чата и всплеск запросов в чат
+OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', 30))
+OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', 1))
+OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', 5))
+OUTBOUND_SENDERS = int(os.getenv('OUTBOUND_SENDERS', 8))
+
+#  максимальное кол-во обновлений в очереди обработки при опросе getUpdates (при превышении опрос приостанавливается)
+POLLING_MAX_PENDING = int(os.getenv('POLLING_MAX_PENDING', 1000))
+
+#  режим webhook (python main.py --webhook): публичный адрес бота (https://..., обязателен), адрес и порт http сервера,
+#  секретный путь для приема обновлений (по умолчанию - хэш токена бота: отправитель обновлений не проверяется,
+#  поэтому путь не должен быть известен никому, кроме телеграма) и максимальное кол-во обновлений в очереди обработки
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH') or '/' + hashlib.sha256((TG_TOKEN or '').encode()).hexdigest()[:32]
+WEBHOOK_MAX_PENDING = int(os.getenv('WEBHOOK_MAX_PENDING', 1000))
+
+#  запись логов через очередь в фоновом потоке: размер очереди (при переполнении записи отбрасываются),
+#  формат файлов логов ("text" или "json" - JSON lines) и запись каждой N-й DEBUG записи telebot (0 - без DEBUG)
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+LOG_TELEBOT_DEBUG_SAMPLE = int(os.getenv('LOG_TELEBOT_DEBUG_SAMPLE', 1))
+
+#  трассировка команд: доля трассируемых команд (0 - трассировка выключена, 1 - все команды) и файл трасс
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+TRACE_PATH = os.getenv('TRACE_PATH', 'logs/traces.jsonl')
+
+#  http сервер метрик в формате Prometheus (GET /metrics): адрес и порт (0 - сервер не запускается)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+
+#  id пользователей телеграма (через запятую), которым доступны служебные команды бота (/profile, /slo)
+ADMIN_IDS = {int(user_id) for user_id in os.getenv('ADMIN_IDS', '').split(',') if user_id.strip()}
+
+#  профилирование (python main.py --profile или команда /profile): длительность по умолчанию (с)
+#  и интервал снятия стеков потоков (с)
+PROFILE_DURATION = float(os.getenv('PROFILE_DURATION', 60))
+PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.01))
+
+#  целевое время ответа пользователю (SLO, с): шаг команды (до следующего вопроса) и выполнение команды (до отправки
+#  последнего отеля), окно расчета перцентилей для команды /slo (с)
+SLO_STEP_SECONDS = float(os.getenv('SLO_STEP_SECONDS', 2.0))
+SLO_EXEC_SECONDS = float(os.getenv('SLO_EXEC_SECONDS', 30.0))
+SLO_WINDOW = float(os.getenv('SLO_WINDOW', 3600))
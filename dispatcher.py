@@ -0,0 +1,154 @@
+"""
+Диспетчер обработки входящих обновлений телеграма.
+
+Гарантирует, что обновления одного чата обрабатываются строго по очереди и в порядке поступления,
+а обновления разных чатов - параллельно в общем пуле потоков. Время постановки обновления в очередь доступно
+обработчику (get_received_time) для замера задержки ответа пользователю с учетом ожидания в очереди.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Callable, Deque, Dict, List, Optional
+
+from telebot import TeleBot
+from telebot.types import Update
+
+
+logger = logging.getLogger('main.dispatcher')
+
+#  время постановки в очередь (time.perf_counter) выполняемой в потоке задачи
+_received: ContextVar[Optional[float]] = ContextVar('received', default=None)
+
+
+def get_received_time() -> Optional[float]:
+    """ Время постановки в очередь диспетчера обрабатываемого обновления (None - обработка вне диспетчера). """
+
+    return _received.get()
+
+
+def get_chat_id(update: Update) -> Optional[int]:
+    """
+    Определение id чата, к которому относится обновление.
+
+    :param update: обновление телеграма.
+    :return: id чата или None, если обновление не относится к чату (например, inline запрос).
+    """
+
+    message = update.message or update.edited_message
+    if message:
+        return message.chat.id
+    if update.callback_query:
+        call = update.callback_query
+        return call.message.chat.id if call.message else call.from_user.id
+    return None
+
+
+class ChatDispatcher:
+    """
+    Очереди задач по чатам поверх общего пула потоков. Для каждого чата, у которого есть задачи,
+    существует очередь (lane), которую в каждый момент времени разбирает не более одного потока.
+
+    :param num_workers: размер пула потоков.
+    :param max_batch: кол-во задач чата, выполняемых потоком подряд, прежде чем уступить поток другим чатам.
+    """
+
+    def __init__(self, num_workers: int = 16, max_batch: int = 8):
+        self.num_workers = num_workers
+        self.max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='ChatWorker')
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._lanes: Dict[int, Deque[tuple]] = {}
+
+    def submit(self, chat_id: Optional[int], task: Callable, *args) -> None:
+        """
+        Постановка задачи в очередь чата.
+
+        :param chat_id: id чата, None - задача выполняется без упорядочивания.
+        :param task: функция для выполнения.
+        :param args: аргументы функции.
+        """
+
+        received = time.perf_counter()
+        if chat_id is None:
+            self._executor.submit(self._run_task, task, args, received)
+            return
+        with self._lock:
+            lane = self._lanes.get(chat_id)
+            if lane is not None:
+                lane.append((task, args, received))
+                return
+            self._lanes[chat_id] = deque([(task, args, received)])
+        self._executor.submit(self._drain, chat_id)
+
+    def _drain(self, chat_id: int) -> None:
+        """ Последовательное выполнение задач из очереди чата. """
+
+        for _ in range(self.max_batch):
+            with self._lock:
+                lane = self._lanes[chat_id]
+                if not lane:
+                    del self._lanes[chat_id]
+                    self._idle.notify_all()
+                    return
+                task, args, received = lane[0]
+            self._run_task(task, args, received)
+            with self._lock:
+                lane.popleft()
+        #  очередь чата не пуста - уступаем поток другим чатам, разбор продолжится в порядке общей очереди пула
+        with self._lock:
+            if not self._lanes[chat_id]:
+                del self._lanes[chat_id]
+                self._idle.notify_all()
+                return
+        self._executor.submit(self._drain, chat_id)
+
+    @staticmethod
+    def _run_task(task: Callable, args: tuple, received: float) -> None:
+        token = _received.set(received)
+        try:
+            task(*args)
+        except Exception:
+            logger.exception(f'Ошибка при обработке задачи {getattr(task, "__qualname__", task)}')
+        finally:
+            _received.reset(token)
+
+    def pending(self) -> int:
+        """ Кол-во задач в очередях чатов (включая выполняемые). """
+
+        with self._lock:
+            return sum(len(lane) for lane in self._lanes.values())
+
+    def attach(self, bot: TeleBot) -> None:
+        """
+        Подключение диспетчера к боту: полученные обновления раскладываются по очередям чатов
+        и обрабатываются обработчиками бота (включая middleware) в потоках пула.
+        Бот должен быть создан с параметром threaded=False, чтобы обработчики выполнялись
+        в потоке диспетчера, а не во внутреннем пуле telebot.
+
+        :param bot: объект бота.
+        """
+
+        process_updates = bot.process_new_updates
+
+        def dispatch_updates(updates: List[Update]) -> None:
+            for update in updates:
+                #  номер последнего обновления фиксируется сразу, т.к. от него зависит смещение следующего запроса
+                if update.update_id > bot.last_update_id:
+                    bot.last_update_id = update.update_id
+                self.submit(get_chat_id(update), process_updates, [update])
+
+        bot.process_new_updates = dispatch_updates
+
+    def shutdown(self, wait: bool = True) -> None:
+        """ Остановка пула потоков. При wait=True предварительно дожидается разбора всех очередей чатов. """
+
+        if wait:
+            with self._lock:
+                while self._lanes:
+                    self._idle.wait()
+        self._executor.shutdown(wait=wait)
@@ -2,7 +2,8 @@ from dataclasses import dataclass, field
 from operator import itemgetter
 from typing import NamedTuple
 
-from resources import query_hotels_by_param
+from resources import HotelsInfo, query_hotels_by_param
+from tracing import tracer
 
 
 class HotelsParsed(NamedTuple):
@@ -27,11 +28,13 @@ class CmdSortByPrice:
     :param cmd_options (dict): дополнительная информация по команде (размер вывода, диапазон расстояний).
     :param debug_mode (bool): флаг отладочного режима.
     :param required_size_result (int): размер вывода.
+    :param count_pages (int): кол-во выполненных api запросов страниц списка отелей.
     """
     api_params: dict
     cmd_options: dict
     debug_mode: bool
     required_size_result: int = field(init=False)
+    count_pages: int = field(init=False, default=0)
 
     def __post_init__(self):
         self.required_size_result = self.cmd_options['size_result']
@@ -39,6 +42,18 @@ class CmdSortByPrice:
     def start(self) -> HotelsParsed:
         return self.cmd_sort_by_price()
 
+    def query_hotels(self, **kwargs) -> HotelsInfo:
+        """ Api запрос страницы списка отелей (с подсчетом запрошенных страниц). """
+
+        self.count_pages += 1
+        with tracer.span('query_hotels', page=kwargs.get('page_number', 1), sort=kwargs['data_query'].get('sortOrder'),
+                         source='file' if kwargs.get('debug_mode') else 'api') as span:
+            result = query_hotels_by_param(**kwargs)
+            if span is not None:
+                span['tags'].update(hotels=str(len(result.hotels or ())), next_page=str(result.next_page_number),
+                                    api_error=str(bool(result.err_msg)).lower())
+        return result
+
     def cmd_sort_by_price(self, sort_direction: str = None, def_warning: str = '') -> HotelsParsed:
         """
         Функция отправляет api запрос на получение списка отелей в рамках команды ("lowprice" и "highprice"),
@@ -56,8 +71,8 @@ class CmdSortByPrice:
         api_params = self.api_params
         if sort_direction:
             api_params['sortOrder'] = sort_direction
-        result = query_hotels_by_param(data_query=api_params, page_size=self.required_size_result,
-                                       debug_mode=self.debug_mode)
+        result = self.query_hotels(data_query=api_params, page_size=self.required_size_result,
+                                   debug_mode=self.debug_mode)
         warning = def_warning
         warning += self._get_warning_mismatch_size_result(result.hotels)
         return HotelsParsed(hotels=result.hotels, err_msg=result.err_msg, warning_msg=warning)
@@ -103,8 +118,8 @@ class CmdSortByPriceAndDist(CmdSortByPrice):
         cur_lst_hotels = []
         prev_lst_hotels = []
         while True:
-            result = query_hotels_by_param(data_query=self.api_params, debug_mode=self.debug_mode,
-                                           page_number=self.page_number)
+            result = self.query_hotels(data_query=self.api_params, debug_mode=self.debug_mode,
+                                       page_number=self.page_number)
 
             if (result.err_msg or not result.hotels) and not cur_lst_hotels:
                 return HotelsParsed(result.hotels, result.err_msg)
@@ -116,7 +131,11 @@ class CmdSortByPriceAndDist(CmdSortByPrice):
                 return self._sort_and_parsed_hotels(cur_lst_hotels, ('price_exact', 'to_center_exact'), warning)
 
             #  формируем список отелей с обозначенным расстоянием от центра города
-            hotels_with_def_dist = [hotel for hotel in result.hotels if hotel['to_center_exact']]
+            with tracer.span('filter_hotels', page=self.page_number, stage='def_dist',
+                             hotels=len(result.hotels)) as span:
+                hotels_with_def_dist = [hotel for hotel in result.hotels if hotel['to_center_exact']]
+                if span is not None:
+                    span['tags']['kept'] = str(len(hotels_with_def_dist))
             if not hotels_with_def_dist:
                 warning = '\nВ указанной локации не найдено отелей с обозначенным расстоянием от центра города. ' \
                           'Показаны отели по росту цены (аналогично команде low_price).'
@@ -165,8 +184,11 @@ class CmdSortByPriceAndDist(CmdSortByPrice):
 
             #  когда заданный диапазон расстояний находится внутри диапазона расстояний полученного списка отелей
             #  получаем список отелей из заданного диапазона
-            hotels_with_req_dist = [hotel for hotel in hotels
-                                    if min_dist_user <= hotel['to_center_exact'] <= max_dist_user]
+            with tracer.span('filter_hotels', page=self.page_number, stage='req_dist', hotels=len(hotels)) as span:
+                hotels_with_req_dist = [hotel for hotel in hotels
+                                        if min_dist_user <= hotel['to_center_exact'] <= max_dist_user]
+                if span is not None:
+                    span['tags']['kept'] = str(len(hotels_with_req_dist))
             cur_lst_hotels.extend(hotels_with_req_dist)
             #  если размер накопленного результата не меньше требуемого и правая граница заданного диапазона
             #  расстояния < макс. расстояния у отеля на текущей странице или текущая стр. последняя
@@ -190,8 +212,9 @@ class CmdSortByPriceAndDist(CmdSortByPrice):
         :rtype class: HotelsParsed
         """
 
-        res_hotels = sorted(lst_hotels, key=itemgetter(*keys_sort))
-        res_hotels = res_hotels[:self.required_size_result]
+        with tracer.span('sort_hotels', hotels=len(lst_hotels)):
+            res_hotels = sorted(lst_hotels, key=itemgetter(*keys_sort))
+            res_hotels = res_hotels[:self.required_size_result]
         warning += self._get_warning_mismatch_size_result(res_hotels)
 
         return HotelsParsed(hotels=res_hotels, warning_msg=warning)
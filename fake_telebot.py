@@ -0,0 +1,211 @@
+"""
+Бот без сети для нагрузочных замеров и тестов слоя диалогов (обработчики, BotController, FSM).
+
+FakeTeleBot - TeleBot, у которого запросы к api телеграма не выполняются: вызовы считаются (и при необходимости
+записываются), а ответ api (Message) формируется в памяти так же, как его возвращает телеграм. Для каждого чата
+запоминается последнее сообщение с inline клавиатурой (с учетом изменений), чтобы имитировать нажатия кнопок.
+
+ScriptedUser - пользователь, выполняющий сценарий диалога (DIALOGS): ввод текста и нажатия кнопок по их тексту.
+Сценарии рассчитаны на тестовый режим бота (debug_mode, данные из папки debug_data).
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from telebot import TeleBot
+from telebot.types import JsonSerializable, Message, Update
+
+
+#  сценарии диалогов: ('text', текст сообщения) или ('press', текст кнопки последней inline клавиатуры);
+#  даты выбираются в следующем месяце (въезд 5-го, выезд 9-го числа)
+DIALOGS = {
+    '/lowprice': (('text', '/lowprice'), ('text', 'москва'), ('text', 'Москва, Россия'), ('text', '5'),
+                  ('press', 'Изменить'), ('text', '2'),
+                  ('press', '>'), ('press', '5'), ('press', 'OK'), ('press', '>'), ('press', '9'), ('press', 'OK'),
+                  ('press', 'Да, все верно')),
+    '/highprice': (('text', '/highprice'), ('text', 'москва'), ('text', 'Москва, Россия'), ('text', '3'),
+                   ('press', 'Оставить по умолчанию'), ('press', 'Да, все верно')),
+    '/bestdeal': (('text', '/bestdeal'), ('text', 'москва'), ('text', 'Москва, Россия'), ('text', '1000-3000'),
+                  ('text', '0.9-2.5'), ('text', '5'), ('press', 'Оставить по умолчанию'),
+                  ('press', 'Да, все верно')),
+}
+
+
+def message_update_data(update_id: int, chat_id: int, text: str, date: int = 0) -> dict:
+    """ json обновления с сообщением text пользователя chat_id в личном чате (id сообщения равен update_id). """
+
+    message = {'message_id': update_id, 'date': date, 'text': text,
+               'from': {'id': chat_id, 'is_bot': False, 'first_name': 'User'},
+               'chat': {'id': chat_id, 'type': 'private'}}
+    if text.startswith('/'):
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+    return {'update_id': update_id, 'message': message}
+
+
+def _markup_json(markup) -> Optional[str]:
+    if isinstance(markup, JsonSerializable):
+        return markup.to_json()
+    return markup
+
+
+class FakeTeleBot(TeleBot):
+    """
+    Бот, отвечающий на запросы к api телеграма из памяти.
+
+    :param keep_calls: записывать все вызовы api в список calls (метод, id чата, текст); иначе только счетчики.
+    """
+
+    def __init__(self, keep_calls: bool = False):
+        super().__init__('0:fake', threaded=False)
+        self.keep_calls = keep_calls
+        self.calls: List[Tuple[str, Optional[int], Optional[str]]] = []
+        self.counts: Counter = Counter()
+        #  id чата -> (id сообщения, текст, json клавиатуры) последнего сообщения с inline клавиатурой
+        self.screens: Dict[int, Tuple[int, str, str]] = {}
+        self._message_ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _record(self, method: str, chat_id: Optional[int], text: Optional[str] = None) -> None:
+        with self._lock:
+            self.counts[method] += 1
+            if self.keep_calls:
+                self.calls.append((method, chat_id, text))
+
+    def _message(self, chat_id: int, text: str = None, reply_markup=None, photo: bool = False) -> Message:
+        message_id = next(self._message_ids)
+        markup = _markup_json(reply_markup)
+        if markup and 'inline_keyboard' in markup:
+            self.screens[chat_id] = (message_id, text, markup)
+        data = {'message_id': message_id, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'},
+                'from': {'id': 0, 'is_bot': True, 'first_name': 'BestOtelsBot'}}
+        if photo:
+            data['photo'] = [{'file_id': f'photo-{message_id}', 'file_unique_id': str(message_id),
+                              'width': 640, 'height': 480}]
+            data['caption'] = text
+        else:
+            data['text'] = text or ''
+        return Message.de_json(data)
+
+    def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        self._record('sendMessage', chat_id, text)
+        return self._message(chat_id, text, reply_markup)
+
+    def send_photo(self, chat_id, photo, caption=None, reply_markup=None, **kwargs):
+        self._record('sendPhoto', chat_id, caption)
+        return self._message(chat_id, caption, reply_markup, photo=True)
+
+    def send_media_group(self, chat_id, media, **kwargs):
+        self._record('sendMediaGroup', chat_id, f'{len(media)} photos')
+        return [self._message(chat_id, item.caption, photo=True) for item in media]
+
+    def send_document(self, chat_id, data, caption=None, **kwargs):
+        self._record('sendDocument', chat_id, caption)
+        return self._message(chat_id, caption)
+
+    def send_chat_action(self, chat_id, action, **kwargs):
+        self._record('sendChatAction', chat_id, action)
+        return True
+
+    def answer_callback_query(self, callback_query_id, text=None, **kwargs):
+        self._record('answerCallbackQuery', None, text)
+        return True
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, reply_markup=None, **kwargs):
+        self._record('editMessageText', chat_id, text)
+        screen = self.screens.get(chat_id)
+        if screen and screen[0] == message_id:
+            self.screens[chat_id] = (message_id, text, _markup_json(reply_markup) or screen[2])
+        return True
+
+    def edit_message_reply_markup(self, chat_id=None, message_id=None, reply_markup=None, **kwargs):
+        self._record('editMessageReplyMarkup', chat_id)
+        screen = self.screens.get(chat_id)
+        if screen and screen[0] == message_id:
+            markup = _markup_json(reply_markup)
+            if markup:
+                self.screens[chat_id] = (message_id, screen[1], markup)
+            else:
+                del self.screens[chat_id]
+        return True
+
+    def delete_message(self, chat_id, message_id, **kwargs):
+        self._record('deleteMessage', chat_id)
+        screen = self.screens.get(chat_id)
+        if screen and screen[0] == message_id:
+            del self.screens[chat_id]
+        return True
+
+
+class ScriptedUser:
+    """
+    Пользователь, формирующий обновления телеграма по шагам сценария диалога.
+
+    :param bot: бот (FakeTeleBot) или сервер api (fake_telegram.FakeTelegramServer), от которого пользователь
+                получает сообщения (экраны чатов screens).
+    :param user_id: id пользователя (и чата).
+    :param script: шаги сценария (см. DIALOGS).
+    """
+
+    _update_ids = itertools.count(1)
+
+    def __init__(self, bot, user_id: int, script: tuple):
+        self.bot = bot
+        self.user_id = user_id
+        self.script = script
+        self.step = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.step >= len(self.script)
+
+    def _user(self) -> dict:
+        return {'id': self.user_id, 'is_bot': False, 'first_name': f'User {self.user_id}'}
+
+    def text_data(self, text: str) -> dict:
+        """ json обновления с сообщением text. """
+
+        return message_update_data(next(self._update_ids), self.user_id, text, int(time.time()))
+
+    def press_data(self, caption: str) -> dict:
+        """
+        json обновления с нажатием кнопки с текстом caption последней inline клавиатуры чата.
+
+        :raises LookupError: в чате нет inline клавиатуры или кнопки с текстом caption.
+        """
+
+        message_id, text, markup = self.bot.screens[self.user_id]
+        buttons = [button for row in json.loads(markup)['inline_keyboard'] for button in row
+                   if button['text'] == caption]
+        if not buttons:
+            raise LookupError(f'Кнопка {caption!r} не найдена, user_id={self.user_id}')
+        #  телеграм возвращает текст сообщения без html разметки
+        text = (text or '').replace('<b>', '').replace('</b>', '').replace('<u>', '').replace('</u>', '')
+        update_id = next(self._update_ids)
+        return {'update_id': update_id, 'callback_query': {
+            'id': str(update_id), 'data': buttons[0]['callback_data'], 'chat_instance': str(self.user_id),
+            'from': self._user(),
+            'message': {'message_id': message_id, 'date': 0, 'text': text,
+                        'chat': {'id': self.user_id, 'type': 'private'}}}}
+
+    def text(self, text: str) -> Update:
+        return Update.de_json(self.text_data(text))
+
+    def press(self, caption: str) -> Update:
+        return Update.de_json(self.press_data(caption))
+
+    def next_update_data(self) -> dict:
+        """ json обновления следующего шага сценария (шаг не засчитывается, если кнопка не найдена). """
+
+        kind, value = self.script[self.step]
+        data = self.text_data(value) if kind == 'text' else self.press_data(value)
+        self.step += 1
+        return data
+
+    def next_update(self) -> Update:
+        """ Обновление следующего шага сценария. """
+
+        return Update.de_json(self.next_update_data())
@@ -0,0 +1,419 @@
+"""
+Локальный сервер, имитирующий Bot API телеграма, для прогонов бота без сети и под нагрузкой.
+
+FakeTelegramServer отвечает на запросы бота (getUpdates, sendMessage, sendPhoto, sendMediaGroup, sendDocument,
+editMessageText, editMessageReplyMarkup, deleteMessage, answerCallbackQuery, sendChatAction и т.д.) так же,
+как api телеграма: параметры запроса - в строке запроса или в теле (form/json), файлы (multipart) не разбираются.
+Задержка ответов (latency + случайная добавка до jitter) и ответы 429 Too Many Requests с заданной долей запросов
+(error_rate) настраиваются, чтобы проверять бота при медленном и ограничивающем запросы телеграме.
+Для каждого чата, как и в fake_telebot.FakeTeleBot, запоминается последнее сообщение с inline клавиатурой.
+
+ScriptedTraffic - поток имитируемых пользователей: каждый пользователь выполняет сценарии диалогов (DIALOGS)
+по кругу, отправляя следующий шаг после ответа бота в свой чат и паузы на "обдумывание".
+
+Запуск из корневой папки проекта (бот подключается к серверу через параметр TG_API_URL, см. README):
+    python fake_telegram.py --users 100 --latency 0.05 --error-rate 0.01
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+from fake_telebot import DIALOGS, ScriptedUser
+from slo import RollingPercentiles
+
+
+logger = logging.getLogger('main.fake_telegram')
+
+#  методы, которые могут получить ответ 429 (отправка и изменение сообщений)
+THROTTLED_METHODS = {'sendMessage', 'sendPhoto', 'sendMediaGroup', 'sendDocument', 'editMessageText',
+                     'editMessageReplyMarkup', 'deleteMessage'}
+#  методы, которые считаются ответом бота пользователю (после них пользователь выполняет следующий шаг сценария)
+REPLY_METHODS = THROTTLED_METHODS - {'deleteMessage'}
+
+BOT_USER = {'id': 0, 'is_bot': True, 'first_name': 'BestOtelsBot', 'username': 'BestOtelsBot'}
+
+
+class FakeTelegramHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # постоянные соединения сессии requests
+    server: 'FakeTelegramServer'
+
+    def _reply(self, code: int, payload: dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self) -> None:
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type', '')
+        try:
+            if content_type.startswith('application/json'):
+                params.update(json.loads(body))
+            elif content_type.startswith('application/x-www-form-urlencoded'):
+                params.update(parse_qsl(body.decode('utf8'), keep_blank_values=True))
+        except (ValueError, UnicodeDecodeError):
+            self._reply(400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: invalid body'})
+            return
+        parts = url.path.strip('/').split('/')
+        if len(parts) != 2 or not parts[0].startswith('bot'):
+            self._reply(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+            return
+        self._reply(*self.server.call(parts[1], params))
+
+    do_GET = _handle
+    do_POST = _handle
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class FakeTelegramServer(ThreadingHTTPServer):
+    """
+    Http сервер, отвечающий на запросы бота как Bot API телеграма.
+    Обновления пользователей добавляются методом push_update и выдаются боту через getUpdates (long polling).
+
+    :param host: адрес сервера.
+    :param port: порт сервера (0 - любой свободный).
+    :param latency: задержка ответа на запросы (кроме getUpdates), в секундах.
+    :param jitter: максимальная случайная добавка к задержке ответа, в секундах.
+    :param error_rate: доля запросов отправки/изменения сообщений, на которые сервер отвечает 429.
+    :param retry_after: значение retry_after в ответе 429, в секундах.
+    :param seed: начальное значение генератора случайных чисел (для повторяемых прогонов).
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 8081, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, retry_after: int = 1, seed: Optional[int] = None):
+        super().__init__((host, port), FakeTelegramHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.counts: Counter = Counter()
+        self.throttled = 0
+        #  id чата -> (id сообщения, текст, json клавиатуры) последнего сообщения с inline клавиатурой
+        self.screens: Dict[int, Tuple[int, str, str]] = {}
+        #  id чата -> время (time.monotonic) последнего ответа бота в чат
+        self.replied: Dict[int, float] = {}
+        self._random = random.Random(seed)
+        self._updates: deque = deque()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        #  id callback запроса -> id чата (answerCallbackQuery не содержит id чата)
+        self._callbacks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._new_updates = threading.Condition(self._lock)
+        self._methods = {
+            'getMe': self._get_me,
+            'getUpdates': self._get_updates,
+            'setWebhook': self._ok,
+            'deleteWebhook': self._ok,
+            'sendMessage': self._send_message,
+            'sendPhoto': self._send_photo,
+            'sendMediaGroup': self._send_media_group,
+            'sendDocument': self._send_document,
+            'sendChatAction': self._ok,
+            'answerCallbackQuery': self._answer_callback_query,
+            'editMessageText': self._edit_message_text,
+            'editMessageReplyMarkup': self._edit_message_reply_markup,
+            'deleteMessage': self._delete_message,
+        }
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    @property
+    def api_url(self) -> str:
+        """ Шаблон адреса api для бота (apihelper.API_URL, параметр TG_API_URL). """
+
+        return f'http://{self.server_address[0]}:{self.port}/bot{{0}}/{{1}}'
+
+    def start(self) -> threading.Thread:
+        """ Запуск сервера в отдельном потоке. """
+
+        thread = threading.Thread(target=self.serve_forever, name='FakeTelegram', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        with self._new_updates:
+            self._new_updates.notify_all()
+
+    def push_update(self, data: dict) -> int:
+        """
+        Добавление обновления в очередь getUpdates (update_id назначается сервером).
+
+        :return: update_id обновления.
+        """
+
+        with self._new_updates:
+            data['update_id'] = update_id = next(self._update_ids)
+            callback_query = data.get('callback_query')
+            if callback_query:
+                callback_query['id'] = str(update_id)
+                self._callbacks[callback_query['id']] = callback_query['from']['id']
+            self._updates.append(data)
+            self._new_updates.notify_all()
+        return update_id
+
+    def pending(self) -> int:
+        """ Кол-во обновлений, еще не подтвержденных ботом (offset getUpdates). """
+
+        with self._lock:
+            return len(self._updates)
+
+    def call(self, method: str, params: dict) -> Tuple[int, dict]:
+        """
+        Выполнение метода api.
+
+        :return: http код и json ответа.
+        """
+
+        func = self._methods.get(method)
+        if func is None:
+            return 404, {'ok': False, 'error_code': 404, 'description': 'Not Found: method not found'}
+        with self._lock:
+            self.counts[method] += 1
+            throttled = method in THROTTLED_METHODS and self._random.random() < self.error_rate
+            if throttled:
+                self.throttled += 1
+            delay = self.latency + self._random.uniform(0, self.jitter) if method != 'getUpdates' else 0
+        if delay:
+            time.sleep(delay)
+        if throttled:
+            return 429, {'ok': False, 'error_code': 429,
+                         'description': f'Too Many Requests: retry after {self.retry_after}',
+                         'parameters': {'retry_after': self.retry_after}}
+        try:
+            result = func(params)
+        except (KeyError, ValueError, TypeError) as e:
+            return 400, {'ok': False, 'error_code': 400, 'description': f'Bad Request: {e!r}'}
+        if method in REPLY_METHODS and 'chat_id' in params:
+            self.replied[int(params['chat_id'])] = time.monotonic()
+        return 200, {'ok': True, 'result': result}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'requests': dict(self.counts), 'throttled': self.throttled, 'pending_updates': len(self._updates)}
+
+    @staticmethod
+    def _ok(params: dict) -> bool:
+        return True
+
+    @staticmethod
+    def _get_me(params: dict) -> dict:
+        return BOT_USER
+
+    def _get_updates(self, params: dict) -> List[dict]:
+        offset = int(params.get('offset') or 0)
+        limit = min(int(params.get('limit') or 100), 100)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        with self._new_updates:
+            #  обновления с update_id меньше offset подтверждены ботом
+            while self._updates and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            while not self._updates and time.monotonic() < deadline:
+                self._new_updates.wait(deadline - time.monotonic())
+            return list(itertools.islice(self._updates, limit))
+
+    def _message(self, chat_id: int, text: Optional[str] = None, reply_markup: Optional[str] = None,
+                 photo: bool = False) -> dict:
+        with self._lock:
+            message_id = next(self._message_ids)
+            if reply_markup and 'inline_keyboard' in reply_markup:
+                self.screens[chat_id] = (message_id, text, reply_markup)
+        data = {'message_id': message_id, 'date': int(time.time()), 'chat': {'id': chat_id, 'type': 'private'},
+                'from': BOT_USER}
+        if photo:
+            data['photo'] = [{'file_id': f'photo-{message_id}', 'file_unique_id': str(message_id),
+                              'width': 640, 'height': 480}]
+            if text:
+                data['caption'] = text
+        else:
+            data['text'] = text or ''
+        return data
+
+    def _send_message(self, params: dict) -> dict:
+        return self._message(int(params['chat_id']), params['text'], params.get('reply_markup'))
+
+    def _send_photo(self, params: dict) -> dict:
+        return self._message(int(params['chat_id']), params.get('caption'), params.get('reply_markup'), photo=True)
+
+    def _send_media_group(self, params: dict) -> List[dict]:
+        media = params['media']
+        if isinstance(media, str):
+            media = json.loads(media)
+        return [self._message(int(params['chat_id']), item.get('caption'), photo=True) for item in media]
+
+    def _send_document(self, params: dict) -> dict:
+        return self._message(int(params['chat_id']), params.get('caption'))
+
+    def _answer_callback_query(self, params: dict) -> bool:
+        with self._lock:
+            chat_id = self._callbacks.pop(params['callback_query_id'], None)
+        if chat_id is not None:
+            self.replied[chat_id] = time.monotonic()
+        return True
+
+    def _edit_message_text(self, params: dict) -> bool:
+        chat_id, message_id = int(params['chat_id']), int(params['message_id'])
+        with self._lock:
+            screen = self.screens.get(chat_id)
+            if screen and screen[0] == message_id:
+                self.screens[chat_id] = (message_id, params['text'], params.get('reply_markup') or screen[2])
+        return True
+
+    def _edit_message_reply_markup(self, params: dict) -> bool:
+        chat_id, message_id = int(params['chat_id']), int(params['message_id'])
+        with self._lock:
+            screen = self.screens.get(chat_id)
+            if screen and screen[0] == message_id:
+                markup = params.get('reply_markup')
+                if markup and 'inline_keyboard' in markup:
+                    self.screens[chat_id] = (message_id, screen[1], markup)
+                else:
+                    del self.screens[chat_id]
+        return True
+
+    def _delete_message(self, params: dict) -> bool:
+        chat_id, message_id = int(params['chat_id']), int(params['message_id'])
+        with self._lock:
+            screen = self.screens.get(chat_id)
+            if screen and screen[0] == message_id:
+                del self.screens[chat_id]
+        return True
+
+
+class ScriptedTraffic:
+    """
+    Имитация пользователей, выполняющих сценарии диалогов (DIALOGS) по кругу через FakeTelegramServer.
+    Следующий шаг сценария отправляется после ответа бота в чат пользователя и паузы think (с); если кнопка
+    следующего шага еще не появилась на экране, нажатие повторяется позже. Если бот не ответил за reply_timeout
+    секунд, пользователь начинает сценарий заново.
+
+    :param server: сервер api телеграма.
+    :param count_users: кол-во пользователей (id пользователей 1..count_users).
+    :param think: пауза пользователя перед следующим шагом, в секундах.
+    :param reply_timeout: время ожидания ответа бота, в секундах.
+    :param first_user_id: id первого пользователя.
+    """
+
+    def __init__(self, server: FakeTelegramServer, count_users: int, think: float = 0.5, reply_timeout: float = 30,
+                 first_user_id: int = 1):
+        self.server = server
+        self.think = think
+        self.reply_timeout = reply_timeout
+        scripts = list(DIALOGS.values())
+        self.users = [ScriptedUser(server, user_id, scripts[user_id % len(scripts)])
+                      for user_id in range(first_user_id, first_user_id + count_users)]
+        self.dialogs = 0
+        self.timeouts = 0
+        self.updates = 0
+        self.step_latencies: deque = deque(maxlen=100000)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.run, name='ScriptedTraffic', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self) -> None:
+        #  id пользователя -> время отправки последнего шага (None - ответ получен) и время следующего шага
+        sent_at: Dict[int, Optional[float]] = {user.user_id: None for user in self.users}
+        ready_at = {user.user_id: 0.0 for user in self.users}
+        while not self._stop.is_set():
+            now = time.monotonic()
+            for user in self.users:
+                user_id = user.user_id
+                if sent_at[user_id] is not None:
+                    replied = self.server.replied.get(user_id, 0.0)
+                    if replied >= sent_at[user_id]:
+                        self.step_latencies.append(replied - sent_at[user_id])
+                        sent_at[user_id] = None
+                        ready_at[user_id] = replied + self.think
+                        if user.finished:
+                            self.dialogs += 1
+                            user.step = 0
+                    elif now - sent_at[user_id] > self.reply_timeout:
+                        self.timeouts += 1
+                        sent_at[user_id] = None
+                        user.step = 0
+                    continue
+                if now < ready_at[user_id]:
+                    continue
+                try:
+                    data = user.next_update_data()
+                except LookupError:
+                    #  клавиатура шага еще не отправлена ботом
+                    ready_at[user_id] = now + self.think
+                    continue
+                sent_at[user_id] = time.monotonic()
+                self.server.push_update(data)
+                self.updates += 1
+            self._stop.wait(0.005)
+
+    def stats(self) -> dict:
+        latencies = sorted(self.step_latencies)
+        return {'updates': self.updates, 'dialogs': self.dialogs, 'timeouts': self.timeouts,
+                **{f'step_p{percent}_ms': round(RollingPercentiles.percentile(latencies, percent) * 1e3, 1)
+                   for percent in (50, 95, 99)}}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Локальный сервер Bot API телеграма с имитацией пользователей')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--users', type=int, default=10, help='кол-во пользователей (0 - без имитации)')
+    parser.add_argument('--think', type=float, default=0.5, help='пауза пользователя перед шагом, с')
+    parser.add_argument('--latency', type=float, default=0.0, help='задержка ответа api, с')
+    parser.add_argument('--jitter', type=float, default=0.0, help='случайная добавка к задержке, с')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='доля ответов 429 на отправку сообщений')
+    parser.add_argument('--retry-after', type=int, default=1, help='retry_after в ответах 429, с')
+    parser.add_argument('--duration', type=float, default=0, help='длительность прогона, с (0 - до Ctrl+C)')
+    parser.add_argument('--stats-interval', type=float, default=10, help='интервал вывода статистики, с')
+    args = parser.parse_args()
+
+    server = FakeTelegramServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.retry_after)
+    server.start()
+    print(f'TG_API_URL={server.api_url}')
+    traffic = ScriptedTraffic(server, args.users, args.think)
+    time_start = time.monotonic()
+    try:
+        if args.users:
+            traffic.start()
+        while not args.duration or time.monotonic() - time_start < args.duration:
+            time.sleep(min(args.stats_interval, args.duration or args.stats_interval))
+            print(f'{time.monotonic() - time_start:.0f} s: {traffic.stats()}, {server.stats()}', flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        traffic.stop()
+        server.stop()
+    print(f'total: {traffic.stats()}, {server.stats()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,18 @@ from datetime import datetime
 from telebot.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup
 
 import fsm
+from bot_calendar import DateMessage
+from callback_codec import CallbackCodec
+
+
+#  кодеки данных кнопок форм
+set_default_callback = CallbackCodec('def', answer=('set_default', 'change_default'))
+check_data_callback = CallbackCodec('chk', answer=('exec_cmd', 'start_cmd_again'))
+#  возврат к предыдущему шагу команды из формы с inline клавиатурой (state - состояние, в котором показана форма)
+back_callback = CallbackCodec('back', state=int)
+
+#  текст кнопки возврата к предыдущему шагу команды
+BACK_CAPTION = 'Назад'
 
 
 def make_inline_keyboard(btn_property_lst: list, size_kb: int = 1) -> InlineKeyboardMarkup:
@@ -16,10 +28,13 @@ def make_inline_keyboard(btn_property_lst: list, size_kb: int = 1) -> InlineKeyb
     return keyboard
 
 
-def make_reply_keyboard(btn_caption_lst: tuple, size_kb: int = 1) -> ReplyKeyboardMarkup:
+def make_reply_keyboard(btn_caption_lst: tuple, size_kb: int = 1, back: bool = False) -> ReplyKeyboardMarkup:
     keyboard = ReplyKeyboardMarkup(resize_keyboard=True, one_time_keyboard=True, row_width=size_kb)
     [keyboard.add(caption) for caption in btn_caption_lst]
-    keyboard.add('Отмена')
+    if back:
+        keyboard.row(BACK_CAPTION, 'Отмена')
+    else:
+        keyboard.add('Отмена')
 
     return keyboard
 
@@ -30,34 +45,38 @@ def form_check_entered_data(cmd_name: str, cmd_params: dict):
     for title, val in cmd_params.items():
         text_form += f'<b>{title}:</b> {val}\n'
 
-    keyboard = make_inline_keyboard([{'caption': 'Да, все верно', 'callback': 'exec_cmd'},
-                                     {'caption': 'Нет, начать сначала', 'callback': 'start_cmd_again'}
+    keyboard = make_inline_keyboard([{'caption': 'Да, все верно', 'callback': check_data_callback.encode('exec_cmd')},
+                                     {'caption': 'Нет, начать сначала',
+                                      'callback': check_data_callback.encode('start_cmd_again')}
                                      ], size_kb=2)
 
     return text_form, keyboard
 
 
 def form_set_def_value():
-    text_form = fsm.questions[fsm.IS_SET_DEF_VALUE]
-    keyboard = make_inline_keyboard([{'caption': 'Оставить по умолчанию', 'callback': 'set_default'},
-                                     {'caption': 'Изменить', 'callback': 'change_default'}
+    text_form = fsm.machine.question(fsm.IS_SET_DEF_VALUE)
+    keyboard = make_inline_keyboard([{'caption': 'Оставить по умолчанию',
+                                      'callback': set_default_callback.encode('set_default')},
+                                     {'caption': 'Изменить', 'callback': set_default_callback.encode('change_default')},
+                                     {'caption': BACK_CAPTION, 'callback': back_callback.encode(fsm.IS_SET_DEF_VALUE)}
                                      ])
     return text_form, keyboard
 
 
 def form_choice_city(locations_info: dict):
-    text_form = fsm.questions[fsm.CHOICE_CITY]
-    keyboard = make_reply_keyboard(tuple(locations_info.keys()))
+    text_form = fsm.machine.question(fsm.CHOICE_CITY)
+    keyboard = make_reply_keyboard(tuple(locations_info.keys()), back=True)
 
     return text_form, keyboard
 
 
-def form_entered_date(state: int, calendar, calendar_callback):
-    text_form = fsm.questions[state]
+def form_entered_date(state: int, calendar, calendar_callback, check_in=None):
+    text_form = DateMessage(fsm.machine.question(state)).html
     now = datetime.utcnow()
     keyboard = calendar.create_calendar(
             name=calendar_callback.prefix,
             year=now.year,
-            month=now.month
+            month=now.month,
+            check_in=check_in
         )
     return text_form, keyboard
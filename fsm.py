@@ -1,5 +1,7 @@
 """Finite State Machine"""
 
+from fsm_engine import CommandFlow, StateInfo, StateMachine
+
 '''States'''
 
 START = 0
@@ -14,33 +16,49 @@ GET_SIZE_OUT = 7
 IS_SET_DEF_VALUE = 8
 END = 100
 
-#  таблица переходов состояний
-states = {'/lowprice': (START, GET_LOCATION, CHOICE_CITY, GET_SIZE_OUT, IS_SET_DEF_VALUE, GET_NUM_HUMANS,
-                        GET_CHECKIN_DATE, GET_CHECKOUT_DATE, END),
-          '/highprice': (START, GET_LOCATION, CHOICE_CITY, GET_SIZE_OUT, IS_SET_DEF_VALUE, GET_NUM_HUMANS,
-                         GET_CHECKIN_DATE, GET_CHECKOUT_DATE, END),
-          '/bestdeal': (START, GET_LOCATION, CHOICE_CITY, GET_RANGE_PRICE, GET_RANGE_DIST, GET_SIZE_OUT,
-                        IS_SET_DEF_VALUE, GET_NUM_HUMANS, GET_CHECKIN_DATE, GET_CHECKOUT_DATE, END)
-          }
+#  имена состояний (для логов и метрик)
+state_names = {value: name for name, value in list(globals().items()) if name.isupper() and isinstance(value, int)}
 
-questions = {
-    GET_LOCATION: 'Укажите город, где будет проводиться поиск?',
-    CHOICE_CITY: 'Подтвердите/уточните местоположение, выберите кнопкой один из вариантов ниже:',
-    GET_NUM_HUMANS: 'Количество гостей?',
-    GET_CHECKIN_DATE: 'Дата въезда ⤴ ?',
-    GET_CHECKOUT_DATE: 'Ок. Теперь дата выезда ⤵ ?',
-    GET_RANGE_PRICE: 'Укажите диапазон цен (стоимость номера за сутки, в рублях) для поиска, например: 1000-3000',
-    GET_RANGE_DIST: 'Укажите диапазон расстояния отелей от центра города, в км., например 0.9-2.5',
-    GET_SIZE_OUT: 'Количество отелей в выводе (max 25) ?',
-    IS_SET_DEF_VALUE: 'По умолчанию, поиск ведется для одного гостя и ближайших 3-х суток проживания.'
+#  атрибуты состояний: вопрос пользователю и название параметра в форме подтверждения
+states_info = {
+    GET_LOCATION: StateInfo(question='Укажите город, где будет проводиться поиск?'),
+    CHOICE_CITY: StateInfo(question='Подтвердите/уточните местоположение, выберите кнопкой один из вариантов ниже:',
+                           title_form_confirm='Город для поиска'),
+    GET_NUM_HUMANS: StateInfo(question='Количество гостей?',
+                              title_form_confirm='Количество гостей'),
+    GET_CHECKIN_DATE: StateInfo(question='Дата въезда ⤴ ?',
+                                title_form_confirm='Дата въезда'),
+    GET_CHECKOUT_DATE: StateInfo(question='Ок. Теперь дата выезда ⤵ ?',
+                                 title_form_confirm='Дата выезда'),
+    GET_RANGE_PRICE: StateInfo(question='Укажите диапазон цен (стоимость номера за сутки, в рублях) для поиска, '
+                                        'например: 1000-3000',
+                               title_form_confirm='Диапазон цен'),
+    GET_RANGE_DIST: StateInfo(question='Укажите диапазон расстояния отелей от центра города, в км., например 0.9-2.5',
+                              title_form_confirm='Диапазон расстояния от центра'),
+    GET_SIZE_OUT: StateInfo(question='Количество отелей в выводе (max 25) ?',
+                            title_form_confirm='Количество отелей в выводе'),
+    IS_SET_DEF_VALUE: StateInfo(question='По умолчанию, поиск ведется для одного гостя и ближайших 3-х суток '
+                                         'проживания.'),
 }
 
-title_form_confirm = {
-    CHOICE_CITY: 'Город для поиска',
-    GET_NUM_HUMANS: 'Количество гостей',
-    GET_CHECKIN_DATE: 'Дата въезда',
-    GET_CHECKOUT_DATE: 'Дата выезда',
-    GET_RANGE_PRICE: 'Диапазон цен',
-    GET_RANGE_DIST: 'Диапазон расстояния от центра',
-    GET_SIZE_OUT: 'Количество отелей в выводе'
-}
+#  команды поиска отелей
+commands = (
+    CommandFlow(name='/lowprice',
+                description='самые дешёвые отели в городе',
+                steps=(START, GET_LOCATION, CHOICE_CITY, GET_SIZE_OUT, IS_SET_DEF_VALUE, GET_NUM_HUMANS,
+                       GET_CHECKIN_DATE, GET_CHECKOUT_DATE, END),
+                api_params={'sortOrder': 'PRICE'}),
+    CommandFlow(name='/highprice',
+                description='самые дорогие отели в городе',
+                steps=(START, GET_LOCATION, CHOICE_CITY, GET_SIZE_OUT, IS_SET_DEF_VALUE, GET_NUM_HUMANS,
+                       GET_CHECKIN_DATE, GET_CHECKOUT_DATE, END),
+                api_params={'sortOrder': 'PRICE_HIGHEST_FIRST'}),
+    CommandFlow(name='/bestdeal',
+                description='наиболее подходящие по цене и расположению от центра',
+                steps=(START, GET_LOCATION, CHOICE_CITY, GET_RANGE_PRICE, GET_RANGE_DIST, GET_SIZE_OUT,
+                       IS_SET_DEF_VALUE, GET_NUM_HUMANS, GET_CHECKIN_DATE, GET_CHECKOUT_DATE, END),
+                api_params={'sortOrder': 'DISTANCE_FROM_LANDMARK'}),
+)
+
+#  скомпилированные таблицы переходов состояний
+machine = StateMachine(commands, states_info, start_state=START, end_state=END)
@@ -0,0 +1,118 @@
+"""
+Движок конечного автомата (FSM) команд бота.
+
+Команды описываются декларативно (CommandFlow - последовательность шагов), при создании StateMachine
+описания проверяются и компилируются в готовые таблицы переходов вперед/назад, поэтому определение
+следующего/предыдущего состояния - это поиск по словарю.
+"""
+
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+
+class StateInfo(NamedTuple):
+    """
+    Атрибуты состояния команды.
+
+    :param question: (optional) Str, текст вопроса, отправляемого пользователю в этом состоянии.
+    :param title_form_confirm: (optional) Str, название параметра в форме подтверждения введенных данных.
+    """
+    question: str = None
+    title_form_confirm: str = None
+
+
+class CommandFlow(NamedTuple):
+    """
+    Декларативное описание команды.
+
+    :param name: Str, имя команды (например "/lowprice").
+    :param description: Str, описание команды для справки.
+    :param steps: Tuple[int], последовательность состояний команды (от начального до конечного).
+    :param api_params: Dict, параметры api запроса, задаваемые при запуске команды.
+    """
+    name: str
+    description: str
+    steps: Tuple[int, ...]
+    api_params: dict = {}
+
+
+class CompiledCommand(NamedTuple):
+    """
+    Скомпилированная команда: описание и таблицы переходов.
+
+    :param flow: исходное описание команды.
+    :param next_states: Dict[int, int], состояние -> следующее состояние.
+    :param prev_states: Dict[int, int], состояние -> предыдущее состояние.
+    """
+    flow: CommandFlow
+    next_states: Dict[int, int]
+    prev_states: Dict[int, int]
+
+
+class StateMachine:
+    """
+    Скомпилированный набор команд бота.
+
+    :param commands: описания команд.
+    :param states_info: атрибуты состояний (вопросы, названия параметров формы подтверждения).
+    :param start_state: начальное состояние, с которого должна начинаться каждая команда.
+    :param end_state: конечное состояние, которым должна заканчиваться каждая команда.
+
+    :raises ValueError: при некорректном описании команд (неизвестные/повторяющиеся состояния,
+        неверные начальное/конечное состояния, состояния, недостижимые ни в одной команде).
+    """
+
+    def __init__(self, commands: Iterable[CommandFlow], states_info: Dict[int, StateInfo],
+                 start_state: int, end_state: int):
+        self.start_state = start_state
+        self.end_state = end_state
+        self._states_info = dict(states_info)
+        self._commands: Dict[str, CompiledCommand] = {}
+
+        reachable = set()
+        for flow in commands:
+            if flow.name in self._commands:
+                raise ValueError(f'Команда {flow.name} описана повторно')
+            self._commands[flow.name] = self._compile(flow)
+            reachable.update(flow.steps)
+
+        unreachable = set(self._states_info) - reachable
+        if unreachable:
+            raise ValueError(f'Состояния {sorted(unreachable)} недостижимы ни в одной команде')
+
+    def _compile(self, flow: CommandFlow) -> CompiledCommand:
+        steps = flow.steps
+        if len(steps) < 2 or steps[0] != self.start_state or steps[-1] != self.end_state:
+            raise ValueError(f'Команда {flow.name} должна начинаться состоянием {self.start_state} '
+                             f'и заканчиваться состоянием {self.end_state}')
+        if len(set(steps)) != len(steps):
+            raise ValueError(f'В команде {flow.name} состояния повторяются')
+        unknown = [state for state in steps[1:-1] if state not in self._states_info]
+        if unknown:
+            raise ValueError(f'В команде {flow.name} используются неописанные состояния {unknown}')
+
+        next_states = dict(zip(steps[:-1], steps[1:]))
+        prev_states = dict(zip(steps[1:], steps[:-1]))
+        return CompiledCommand(flow=flow, next_states=next_states, prev_states=prev_states)
+
+    @property
+    def commands(self) -> Tuple[CommandFlow, ...]:
+        return tuple(command.flow for command in self._commands.values())
+
+    def command(self, name: str) -> CommandFlow:
+        return self._commands[name].flow
+
+    def next_state(self, name: str, state: int) -> Optional[int]:
+        """ Следующее состояние команды, None - для конечного состояния. """
+
+        return self._commands[name].next_states.get(state)
+
+    def prev_state(self, name: str, state: int) -> Optional[int]:
+        """ Предыдущее состояние команды ("назад"), None - для начального состояния. """
+
+        return self._commands[name].prev_states.get(state)
+
+    def question(self, state: int) -> Optional[str]:
+        return self._states_info[state].question
+
+    def title_form_confirm(self, state: int) -> Optional[str]:
+        return self._states_info[state].title_form_confirm
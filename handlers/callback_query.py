@@ -4,11 +4,13 @@ from telebot import TeleBot
 from telebot.types import CallbackQuery
 
 import fsm
-from BotController import BotController, calendar_callback
+from BotController import BotController, calendar, calendar_callback
+from forms_questions import back_callback, check_data_callback, set_default_callback
+from router import UpdateRouter
 
 
-def handle_callback_set_default_value(bot: TeleBot, bot_controller: BotController):
-    @bot.callback_query_handler(func=lambda call: call.data in ['set_default', 'change_default'])
+def handle_callback_set_default_value(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.callback_handler(set_default_callback.prefix)
     def callback_set_default_value(call: CallbackQuery):
         """
         Обработка inline callback запросов после отправки пользователю формы
@@ -21,7 +23,11 @@ def handle_callback_set_default_value(bot: TeleBot, bot_controller: BotControlle
         id_user = call.message.chat.id
         if bot_controller.get_state_cmd(id_user) != fsm.IS_SET_DEF_VALUE:
             return
-        if call.data == 'set_default':
+        try:
+            answer = set_default_callback.decode(call.data).answer
+        except ValueError:
+            return
+        if answer == 'set_default':
             in_date = datetime.utcnow()
             out_date = in_date + timedelta(days=3)
             default_api_param = {'adults1': 1,
@@ -41,8 +47,8 @@ def handle_callback_set_default_value(bot: TeleBot, bot_controller: BotControlle
         bot.edit_message_reply_markup(id_user, call.message.message_id)
 
 
-def handle_callback_check_entered_data(bot: TeleBot, bot_controller: BotController):
-    @bot.callback_query_handler(func=lambda call: call.data in ['start_cmd_again', 'exec_cmd'])
+def handle_callback_check_entered_data(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.callback_handler(check_data_callback.prefix)
     def callback_check_entered_data(call: CallbackQuery):
         """
         Обработка inline callback запросов после отправки пользователю формы
@@ -55,38 +61,81 @@ def handle_callback_check_entered_data(bot: TeleBot, bot_controller: BotControll
         id_user = call.message.chat.id
         if bot_controller.get_state_cmd(id_user) != fsm.END:
             return
-        if call.data == 'start_cmd_again':
+        try:
+            answer = check_data_callback.decode(call.data).answer
+        except ValueError:
+            return
+        if answer == 'start_cmd_again':
             name_cmd = bot_controller.get_active_cmd(id_user)
             bot.send_message(id_user, f'<b>Ок. Запуск команды {name_cmd} сначала.</b>', parse_mode='HTML')
             bot_controller.set_new_state(id_user, fsm.START)
         else:
             bot.send_message(id_user, 'Данные приняты, ожидайте результат.')
-            bot.send_chat_action(id_user, 'typing')  # показывает индикатор «набора текста»
             bot_controller.exec_cmd(id_user)
 
         # после ответа, клавиатура будет исчезать из чата
         bot.edit_message_reply_markup(id_user, call.message.message_id)
 
 
-def handle_callback_select_date(bot: TeleBot, bot_controller: BotController):
-    @bot.callback_query_handler(func=lambda call: call.data.startswith(calendar_callback.prefix))
+def handle_callback_select_date(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.callback_handler(calendar_callback.prefix)
     def callback_select_date(call: CallbackQuery):
         """
         Обработка inline callback запросов при выборе даты по календарю.
+        Состояние календаря передается в данных кнопок, поэтому сессия пользователя
+        читается только при подтверждении даты: дата принимается только с календаря текущего шага команды,
+        а дата выезда - только с календаря, построенного от сохраненной даты въезда, и позже нее.
         """
 
         id_user = call.message.chat.id
-        calendar = bot_controller.get_calendar(id_user)
-        if not calendar:
+        try:
+            data = calendar_callback.decode(call.data)
+        except ValueError:
+            bot.answer_callback_query(str(call.id))
             return
-        name, action, *date_values = call.data.split(calendar_callback.sep)
-        selected_date = calendar.calendar_query_handler(bot, call, name, action, *date_values)
-        if action == 'OK' and selected_date:
+        selected_date = calendar.calendar_query_handler(bot, call, calendar_callback.prefix, *data)
+        if data.action == 'OK' and selected_date:
+            state, msg_id, check_in = bot_controller.get_date_step_info(id_user)
+            #  календарь сообщения с вопросом предыдущего шага (или другой команды) не обрабатывается
+            if call.message.message_id != msg_id:
+                bot.answer_callback_query(str(call.id))
+                return
+            if state == fsm.GET_CHECKIN_DATE:
+                is_valid = data.check_in is None
+            elif state == fsm.GET_CHECKOUT_DATE:
+                is_valid = (check_in is not None and data.check_in is not None
+                            and f'{data.check_in:%Y-%m-%d}' == check_in and selected_date > data.check_in)
+            else:
+                is_valid = False
+            if not is_valid:
+                bot.answer_callback_query(str(call.id))
+                return
             date_str = f'{selected_date:%Y-%m-%d}'
-            key_date = 'checkIn' if bot_controller.get_state_cmd(id_user) == fsm.GET_CHECKIN_DATE else 'checkOut'
+            key_date = 'checkIn' if state == fsm.GET_CHECKIN_DATE else 'checkOut'
             bot_controller.add_api_params(id_user, **{key_date: date_str})
             bot_controller.add_data_to_form_confirm(id_user, date_str)
 
             # после ответа, клавиатура будет исчезать из чата
             bot.edit_message_reply_markup(id_user, call.message.message_id)
             bot_controller.go_next_state(id_user)
+
+
+def handle_callback_back(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.callback_handler(back_callback.prefix)
+    def callback_back(call: CallbackQuery):
+        """ Обработка inline кнопки "Назад" формы: возврат команды к предыдущему шагу. """
+
+        # убирает состояние загрузки, к которому переходит бот после нажатия кнопки
+        bot.answer_callback_query(str(call.id))
+
+        id_user = call.message.chat.id
+        try:
+            state = back_callback.decode(call.data).state
+        except ValueError:
+            return
+        #  кнопка формы, показанной на другом шаге команды, не обрабатывается
+        if bot_controller.get_state_cmd(id_user) != state:
+            return
+        # после ответа, клавиатура будет исчезать из чата
+        bot.edit_message_reply_markup(id_user, call.message.message_id)
+        bot_controller.go_prev_state(id_user)
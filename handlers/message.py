@@ -1,19 +1,25 @@
+import html
 import logging
 
 from telebot import TeleBot
 from telebot.types import Message
+from telebot.util import extract_command
 
 import fsm
 from BotController import BotController, cmd_desc
+from forms_questions import BACK_CAPTION
+from profiler import profiler
 from resources import query_locations_info
+from router import UpdateRouter
+from slo import slo
 from utils import is_valid_number, is_valid_float
 
 
 logger = logging.getLogger('main.message')
 
 
-def handle_cmd_send_welcome(bot: TeleBot):
-    @bot.message_handler(commands=['start', 'help'])
+def handle_cmd_send_welcome(router: UpdateRouter, bot: TeleBot):
+    @router.command_handler('start', 'help')
     def cmd_send_welcome(msg: Message):
         """ Вывод команд бота. """
 
@@ -24,41 +30,64 @@ def handle_cmd_send_welcome(bot: TeleBot):
         bot.send_message(msg.from_user.id, text, parse_mode='HTML')
 
 
-def handle_cmd_low_price_and_high_price(bot: TeleBot, bot_controller: BotController):
-    @bot.message_handler(commands=['lowprice', 'highprice'])
-    def cmd_sort_price(msg: Message):
-        """ Обработка команд "lowprice" и "highprice". """
+def handle_cmd_profile(router: UpdateRouter, bot: TeleBot, admin_ids: set, default_duration: float):
+    @router.command_handler('profile')
+    def cmd_profile(msg: Message):
+        """ Служебная команда "/profile [секунды]": профилирование бота, отчет отправляется файлом. """
 
         id_user = msg.from_user.id
-        logger.debug(f'Запущена команда {msg.text}, user_id={id_user}')
-        bot_controller.set_command(id_user, cmd_name=msg.text)
-        sort_order = 'PRICE' if msg.text == '/lowprice' else 'PRICE_HIGHEST_FIRST'
-        bot_controller.add_api_params(id_user, sortOrder=sort_order)
-        bot_controller.set_new_state(id_user, fsm.START)
+        if id_user not in admin_ids:
+            bot.reply_to(msg, 'Неизвестная команда. Список команд: /help')
+            return
+        arg = msg.text.split()[1:]
+        if arg and not is_valid_number(arg[0], min_val=1, max_val=3600):
+            bot.send_message(id_user, 'Длительность профилирования - от 1 до 3600 секунд.')
+            return
+        duration = int(arg[0]) if arg else default_duration
+
+        def send_report(path: str):
+            with open(path, 'rb') as f_report:
+                bot.send_document(id_user, f_report, caption='Результаты профилирования')
+
+        if not profiler.start(duration, on_finish=send_report):
+            bot.send_message(id_user, 'Профилирование уже запущено.')
+            return
+        logger.info(f'Запущено профилирование на {duration} с, user_id={id_user}')
+        bot.send_message(id_user, f'Профилирование запущено на {duration:g} с, отчет будет отправлен по окончании.')
+
+
+def handle_cmd_slo(router: UpdateRouter, bot: TeleBot, admin_ids: set):
+    @router.command_handler('slo')
+    def cmd_slo(msg: Message):
+        """ Служебная команда "/slo": перцентили задержек ответа пользователям по командам и шагам. """
 
+        id_user = msg.from_user.id
+        if id_user not in admin_ids:
+            bot.reply_to(msg, 'Неизвестная команда. Список команд: /help')
+            return
+        bot.send_message(id_user, f'<pre>{html.escape(slo.report())}</pre>', parse_mode='HTML')
 
-def handle_cmd_best_deal(bot: TeleBot, bot_controller: BotController):
-    @bot.message_handler(commands=['bestdeal'])
-    def cmd_best_deal(msg: Message):
-        """ Обработка команды "bestdeal". """
+
+def handle_search_commands(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.command_handler(*[command.name.lstrip('/') for command in fsm.machine.commands])
+    def cmd_search(msg: Message):
+        """ Обработка команд поиска отелей ("lowprice", "highprice", "bestdeal"). """
 
         id_user = msg.from_user.id
-        logger.debug(f'Запущена команда {msg.text}, user_id={id_user}')
-        bot_controller.set_command(id_user, cmd_name=msg.text)
-        bot_controller.add_api_params(id_user, sortOrder='DISTANCE_FROM_LANDMARK')
+        cmd_name = '/' + extract_command(msg.text)
+        logger.debug(f'Запущена команда {cmd_name}, user_id={id_user}')
+        bot_controller.set_command(id_user, cmd_name=cmd_name)
         bot_controller.set_new_state(id_user, fsm.START)
 
 
-def handle_get_location(bot: TeleBot, bot_controller: BotController, debug_mode: bool):
-    @bot.message_handler(func=lambda msg: bot_controller.get_state_cmd(msg.from_user.id) == fsm.GET_LOCATION,
-                         content_types=['text'])
+def handle_get_location(router: UpdateRouter, bot: TeleBot, bot_controller: BotController, debug_mode: bool):
+    @router.message_handler(fsm.GET_LOCATION)
     def get_location_step(msg: Message):
         """ Обработка шага по вводу города для поиска по нему локаций.  """
 
         id_user = msg.from_user.id
-        bot.send_chat_action(id_user, 'typing')  # показывает индикатор «набора текста»
-
-        locations_info, err_msg = query_locations_info(msg.text, debug_mode)
+        with bot_controller.typing.show(id_user):  # показывает индикатор «набора текста»
+            locations_info, err_msg = query_locations_info(msg.text, debug_mode)
         if err_msg:
             bot.reply_to(msg, err_msg)
             return
@@ -70,14 +99,13 @@ def handle_get_location(bot: TeleBot, bot_controller: BotController, debug_mode:
         bot_controller.go_next_state(id_user)
 
 
-def handle_get_city(bot: TeleBot, bot_controller: BotController):
-    @bot.message_handler(func=lambda msg: bot_controller.get_state_cmd(msg.from_user.id) == fsm.CHOICE_CITY,
-                         content_types=['text'])
+def handle_get_city(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.message_handler(fsm.CHOICE_CITY)
     def get_city_step(msg: Message):
         """ Обработка шага по выбору города из найденных локаций.  """
 
         id_user = msg.from_user.id
-        locations_info = bot_controller.users[id_user].locations_info
+        locations_info = bot_controller.get_locations_info(id_user)
         if msg.text not in locations_info:
             bot.reply_to(msg, 'Некорректный ввод. Выберите кнопкой один из вариантов ниже.')
             return
@@ -86,9 +114,8 @@ def handle_get_city(bot: TeleBot, bot_controller: BotController):
         bot_controller.go_next_state(id_user)
 
 
-def handle_get_count_humans(bot: TeleBot, bot_controller: BotController):
-    @bot.message_handler(func=lambda msg: bot_controller.get_state_cmd(msg.from_user.id) == fsm.GET_NUM_HUMANS,
-                         content_types=['text'])
+def handle_get_count_humans(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.message_handler(fsm.GET_NUM_HUMANS)
     def get_count_humans_step(msg: Message):
         """ Обработка шага по вводу кол-ва гостей.  """
 
@@ -100,9 +127,8 @@ def handle_get_count_humans(bot: TeleBot, bot_controller: BotController):
         bot_controller.go_next_state(msg.from_user.id)
 
 
-def handle_get_range_price(bot: TeleBot, bot_controller: BotController):
-    @bot.message_handler(func=lambda msg: bot_controller.get_state_cmd(msg.from_user.id) == fsm.GET_RANGE_PRICE,
-                         content_types=['text'])
+def handle_get_range_price(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.message_handler(fsm.GET_RANGE_PRICE)
     def get_range_price_step(msg: Message):
         """ Обработка шага по вводу диапазона цены.  """
 
@@ -122,9 +148,8 @@ def handle_get_range_price(bot: TeleBot, bot_controller: BotController):
         bot_controller.go_next_state(msg.from_user.id)
 
 
-def handle_get_range_distance(bot: TeleBot, bot_controller: BotController):
-    @bot.message_handler(func=lambda msg: bot_controller.get_state_cmd(msg.from_user.id) == fsm.GET_RANGE_DIST,
-                         content_types=['text'])
+def handle_get_range_distance(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.message_handler(fsm.GET_RANGE_DIST)
     def get_range_distance_step(msg: Message):
         """ Обработка шага по вводу диапазона дистанции.  """
 
@@ -145,9 +170,8 @@ def handle_get_range_distance(bot: TeleBot, bot_controller: BotController):
         bot_controller.go_next_state(msg.from_user.id)
 
 
-def handle_get_count_hotels(bot: TeleBot, bot_controller: BotController):
-    @bot.message_handler(func=lambda msg: bot_controller.get_state_cmd(msg.from_user.id) == fsm.GET_SIZE_OUT,
-                         content_types=['text'])
+def handle_get_count_hotels(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.message_handler(fsm.GET_SIZE_OUT)
     def get_count_hotels_step(msg: Message):
         """ Обработка шага по вводу кол-ва отелей в результирующем выводе.  """
 
@@ -160,15 +184,25 @@ def handle_get_count_hotels(bot: TeleBot, bot_controller: BotController):
         bot_controller.go_next_state(msg.from_user.id)
 
 
-def handle_unknown_message(bot: TeleBot, bot_controller: BotController):
-    @bot.message_handler(func=lambda msg: msg.text != 'Отмена')
-    def unknown_message(msg):
+def handle_back(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.text_handler(BACK_CAPTION)
+    def back_step(msg: Message):
+        """ Обработка кнопки "Назад": возврат команды к предыдущему шагу. """
+
+        if not bot_controller.go_prev_state(msg.from_user.id):
+            bot.reply_to(msg, 'Это первый шаг команды')
+
+
+def handle_unknown_message(router: UpdateRouter, bot: TeleBot, bot_controller: BotController):
+    @router.default_message_handler
+    def unknown_message(msg: Message):
         """ Обработка ввода неизвестных команд.  """
 
+        if msg.text == 'Отмена':
+            return
         bot.reply_to(msg, 'Неизвестная команда. Список команд: /help')
         id_user = msg.from_user.id
-        obj_msg_form = bot_controller.get_obj_msg_cur_state(id_user)
-        if obj_msg_form:
-            text_form = obj_msg_form.text
-            keyboard_form = obj_msg_form.reply_markup
+        msg_form = bot_controller.get_msg_cur_state(id_user)
+        if msg_form:
+            text_form, keyboard_form = msg_form
             bot.send_message(id_user, text_form, parse_mode='HTML', reply_markup=keyboard_form)
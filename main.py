@@ -3,19 +3,40 @@ import sys
 
 from telebot import apihelper, TeleBot
 
+import config
 from config import TG_TOKEN
-from BotController import BotController
+from BotController import BotController, UserData
+from dispatcher import ChatDispatcher
 from MessageHandler import MessageHandler
-from utils import configure_telebot_logger, configure_app_logger
+from metrics import ACTIVE_SESSIONS, QUEUE_SIZE, MetricsServer
+from outbound import OutboundBot, OutboundScheduler
+from photo_cache import PhotoCache
+from photo_checker import PhotoUrlChecker
+from polling import PollingConsumer
+from profiler import profiler
+from session_storage import MemorySessionStorage, SqliteSessionStorage
+from slo import slo
+from snapshot import BotSnapshot
+from tracing import tracer
+from utils import LogPipeline, configure_telebot_logger, configure_app_logger, configure_trace_logger
+from webhook import WebhookServer, get_webhook_url
 
 
 if not os.path.exists('logs'):
     os.mkdir('logs')
-logger_telebot = configure_telebot_logger()
-logger = configure_app_logger('main')
+#  логи пишутся в файлы в фоновом потоке (обработчики обновлений только ставят записи в очередь)
+log_pipeline = LogPipeline(config.LOG_QUEUE_SIZE, config.LOG_FORMAT)
+logger_telebot = configure_telebot_logger(log_pipeline, config.LOG_TELEBOT_DEBUG_SAMPLE)
+logger = configure_app_logger('main', log_pipeline)
+if config.TRACE_SAMPLE_RATE > 0:
+    tracer.configure(config.TRACE_SAMPLE_RATE, configure_trace_logger(config.TRACE_PATH, log_pipeline))
+log_pipeline.start()
 
 apihelper.ENABLE_MIDDLEWARE = True
-tg_bot = TeleBot(TG_TOKEN)
+if config.TG_API_URL:
+    apihelper.API_URL = config.TG_API_URL
+#  обработчики выполняются в потоках диспетчера (ChatDispatcher), а не во внутреннем пуле telebot
+tg_bot = TeleBot(TG_TOKEN, threaded=False)
 
 
 if __name__ == '__main__':
@@ -23,10 +44,90 @@ if __name__ == '__main__':
     debug_mode = False
     if '--debug' in args:
         debug_mode = True
+    webhook_mode = '--webhook' in args
+    profile_mode = '--profile' in args
+    if webhook_mode:
+        try:
+            webhook_url = get_webhook_url(config.WEBHOOK_URL, config.WEBHOOK_PATH)
+        except ValueError as exc:
+            logger.error(str(exc))
+            log_pipeline.stop()
+            sys.exit(str(exc))
 
-    logger.info(f'Bot start. Debug modes is {debug_mode}')
-    bot_controller = BotController(tg_bot, debug_mode)
-    message_handler = MessageHandler(tg_bot, bot_controller, debug_mode)
+    if config.SESSION_STORAGE == 'sqlite':
+        storage = SqliteSessionStorage(config.SESSION_DB_PATH, UserData)
+    else:
+        storage = MemorySessionStorage()
+
+    logger.info(f'Bot start. Debug modes is {debug_mode}. Session storage is {config.SESSION_STORAGE}')
+    if config.TG_API_URL:
+        logger.info(f'Telegram api url: {config.TG_API_URL}')
+    photo_cache = PhotoCache(config.PHOTO_CACHE_PATH, max_size=config.PHOTO_CACHE_SIZE)
+    photo_checker = None
+    if config.PHOTO_CHECK_WORKERS > 0:
+        photo_checker = PhotoUrlChecker(config.PHOTO_CHECK_WORKERS, config.PHOTO_CHECK_TIMEOUT, config.PHOTO_CHECK_TTL,
+                                        error_ttl=config.PHOTO_CHECK_ERROR_TTL)
+    #  незавершенные диалоги и кэши предыдущего запуска (сессии разбираются при первом обращении)
+    snapshot = BotSnapshot(config.SNAPSHOT_PATH, UserData) if config.SNAPSHOT_PATH else None
+    if snapshot is not None:
+        snapshot.restore(storage, photo_checker)
+    #  отправка и изменение сообщений выполняются через планировщик с учетом лимитов телеграма
+    scheduler = OutboundScheduler(config.OUTBOUND_GLOBAL_RATE, config.OUTBOUND_CHAT_RATE, config.OUTBOUND_CHAT_BURST,
+                                  num_senders=config.OUTBOUND_SENDERS)
+    scheduler.start()
+    outbound_bot = OutboundBot(tg_bot, scheduler)
+    bot_controller = BotController(outbound_bot, debug_mode, storage, photo_cache, photo_checker)
+    message_handler = MessageHandler(outbound_bot, bot_controller, debug_mode)
     message_handler.start()
 
-    tg_bot.infinity_polling()
+    dispatcher = ChatDispatcher(num_workers=config.NUM_WORKERS)
+    metrics_server = None
+    if config.METRICS_PORT:
+        ACTIVE_SESSIONS.set_function(lambda: len(storage))
+        QUEUE_SIZE.set_function(dispatcher.pending, 'updates')
+        QUEUE_SIZE.set_function(lambda: scheduler.stats()['queued_interactive'], 'outbound_interactive')
+        QUEUE_SIZE.set_function(lambda: scheduler.stats()['queued_bulk'], 'outbound_bulk')
+        metrics_server = MetricsServer(config.METRICS_HOST, config.METRICS_PORT)
+        metrics_server.start()
+        logger.info(f'Metrics server started on port {metrics_server.port}')
+    slo.configure(config.SLO_STEP_SECONDS, config.SLO_EXEC_SECONDS, config.SLO_WINDOW)
+    profiler.interval = config.PROFILE_INTERVAL
+    if profile_mode:
+        profiler.start(config.PROFILE_DURATION)
+        logger.info(f'Profiling started for {config.PROFILE_DURATION:g} s')
+    try:
+        if webhook_mode:
+            dispatcher.attach(tg_bot)
+            server = WebhookServer(tg_bot, dispatcher, config.WEBHOOK_HOST, config.WEBHOOK_PORT, config.WEBHOOK_PATH,
+                                   max_pending=config.WEBHOOK_MAX_PENDING)
+            tg_bot.set_webhook(url=webhook_url, max_connections=config.NUM_WORKERS)
+            logger.info(f'Webhook server started on port {server.port}')
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+                logger.info(f'Статистика webhook: {server.stats()}')
+        else:
+            tg_bot.remove_webhook()
+            consumer = PollingConsumer(tg_bot, dispatcher, max_pending=config.POLLING_MAX_PENDING)
+            try:
+                consumer.run()
+            except KeyboardInterrupt:
+                consumer.stop()
+    finally:
+        if profiler.running:
+            profiler.stop()
+        if metrics_server is not None:
+            metrics_server.stop()
+        dispatcher.shutdown()
+        bot_controller.typing.shutdown()
+        scheduler.shutdown()
+        logger.info(f'Статистика исходящих запросов: {scheduler.stats()}')
+        if snapshot is not None:
+            snapshot.save(storage, photo_checker)
+        if photo_checker is not None:
+            photo_checker.shutdown()
+        photo_cache.save()
+        if log_pipeline.dropped:
+            logger.warning(f'Отброшено записей лога при переполнении очереди: {log_pipeline.dropped}')
+        log_pipeline.stop()
@@ -0,0 +1,276 @@
+"""
+Метрики бота в текстовом формате Prometheus.
+
+Счетчики (Counter), гистограммы (Histogram) и значения, вычисляемые при запросе метрик (Gauge), регистрируются
+в реестре (по умолчанию REGISTRY). Запись значения - одна операция со словарем под блокировкой, текст метрик
+формируется только при запросе /metrics (MetricsServer).
+"""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List
+
+
+logger = logging.getLogger('main.metrics')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+#  границы гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """ Набор метрик для вывода в текстовом формате. """
+
+    def __init__(self):
+        self._metrics: Dict[str, 'Metric'] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: 'Metric') -> None:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f'Метрика {metric.name!r} уже зарегистрирована')
+            self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class Metric(ABC):
+    """
+    Базовый класс метрики.
+
+    :param name: имя метрики.
+    :param description: описание метрики (строка HELP).
+    :param labels: имена меток; значения меток передаются при записи значения (в том же порядке).
+    :param registry: реестр метрик (None - метрика не регистрируется).
+    """
+
+    type = ''
+
+    def __init__(self, name: str, description: str, labels: tuple = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        if registry is not None:
+            registry.register(self)
+
+    @abstractmethod
+    def collect(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """ Монотонно возрастающий счетчик. """
+
+    type = 'counter'
+
+    def __init__(self, name: str, description: str, labels: tuple = (), registry: Registry = REGISTRY):
+        super().__init__(name, description, labels, registry)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}' for key, value in values]
+
+
+class Gauge(Metric):
+    """
+    Текущее значение, вычисляемое функцией при запросе метрик (например, кол-во активных сессий).
+    Функции задаются для значений меток методом set_function.
+    """
+
+    type = 'gauge'
+
+    def __init__(self, name: str, description: str, labels: tuple = (), registry: Registry = REGISTRY):
+        super().__init__(name, description, labels, registry)
+        self._functions: Dict[tuple, Callable[[], float]] = {}
+
+    def set_function(self, func: Callable[[], float], *label_values) -> None:
+        with self._lock:
+            self._functions[label_values] = func
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            functions = list(self._functions.items())
+        lines = []
+        for key, func in functions:
+            try:
+                value = func()
+            except Exception:
+                logger.exception(f'Ошибка получения значения метрики {self.name}')
+                continue
+            lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram(Metric):
+    """
+    Гистограмма значений (кол-во значений по интервалам, сумма и кол-во значений).
+
+    :param buckets: верхние границы интервалов (по возрастанию, без +Inf).
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name: str, description: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS,
+                 registry: Registry = REGISTRY):
+        super().__init__(name, description, labels, registry)
+        self.buckets = tuple(buckets)
+        #  значения меток -> [кол-во значений по интервалам (последний - +Inf), сумма]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        ind = bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(label_values)
+            if data is None:
+                data = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            data[0][ind] += 1
+            data[1] += value
+
+    @contextmanager
+    def time(self, *label_values) -> Iterator[None]:
+        """ Запись времени выполнения блока (в секундах). """
+
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - time_start, *label_values)
+
+    def count(self, *label_values) -> int:
+        data = self._values.get(label_values)
+        return sum(data[0]) if data else 0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        lines = []
+        label_names = self.labels + ('le',)
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                labels = _format_labels(label_names, key + (_format_value(bound),))
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labels, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+#  метрики бота
+API_REQUEST_SECONDS = Histogram('bot_api_request_seconds',
+                                'Время api запроса к hotels4 по этапам: network, decode (json), extract',
+                                labels=('query', 'stage'))
+API_ERRORS = Counter('bot_api_errors_total', 'Неуспешные api запросы к hotels4', labels=('query', 'reason'))
+CMD_PAGES = Histogram('bot_cmd_pages', 'Кол-во запрошенных страниц списка отелей на одну команду',
+                      labels=('command',), buckets=(1, 2, 3, 5, 8, 13, 21))
+CMD_SECONDS = Histogram('bot_exec_cmd_seconds', 'Время выполнения команды: от запуска до отправки всех отелей',
+                        labels=('command',))
+PHOTO_SEND_SECONDS = Histogram('bot_photo_send_seconds',
+                               'Время запроса отправки фото отелей (album - на одно фото альбома)', labels=('kind',))
+PHOTO_SEND_FAILURES = Counter('bot_photo_send_failures_total', 'Неудачные отправки фото отелей', labels=('kind',))
+HANDLER_SECONDS = Histogram('bot_handler_seconds', 'Время обработки шага команды (обработчика обновления)',
+                            labels=('handler',))
+USER_LATENCY_SECONDS = Histogram('bot_user_latency_seconds',
+                                 'Задержка ответа пользователю: step - от нажатия кнопки/ввода до следующего вопроса, '
+                                 'exec - от подтверждения данных до отправки последнего отеля',
+                                 labels=('kind', 'command', 'state'))
+SLO_BREACHES = Counter('bot_slo_breaches_total', 'Ответы пользователю дольше целевого времени (SLO)',
+                       labels=('kind', 'command'))
+ACTIVE_SESSIONS = Gauge('bot_active_sessions', 'Кол-во пользователей с незавершенной командой')
+QUEUE_SIZE = Gauge('bot_queue_size', 'Размер очередей бота', labels=('queue',))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    server: 'MetricsServer'
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """
+    Http сервер метрик (GET /metrics).
+
+    :param host: адрес сервера (по умолчанию только локальный).
+    :param port: порт сервера (0 - любой свободный).
+    :param registry: реестр метрик.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 9100, registry: Registry = REGISTRY):
+        super().__init__((host, port), MetricsHandler)
+        self.registry = registry
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> threading.Thread:
+        """ Запуск сервера в отдельном потоке. """
+
+        thread = threading.Thread(target=self.serve_forever, name='MetricsServer', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
@@ -0,0 +1,348 @@
+"""
+Планировщик исходящих запросов к api телеграма.
+
+Все запросы на отправку и изменение сообщений проходят через общую очередь, разбор которой ограничен
+глобальным лимитом и лимитами по чатам (token bucket). Чаты обслуживаются по кругу (round-robin),
+поэтому отправка большого результата одному пользователю не задерживает ответы другим.
+Интерактивные ответы (вопросы, формы, календарь) имеют приоритет над отправкой результатов поиска.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+
+from tracing import tracer
+
+
+logger = logging.getLogger('main.outbound')
+
+INTERACTIVE = 0
+BULK = 1
+
+_local = threading.local()
+
+
+@contextmanager
+def bulk_delivery():
+    """ Запросы, выполняемые в текущем потоке внутри контекста, получают низкий приоритет (отправка результатов). """
+
+    prev_priority = getattr(_local, 'priority', INTERACTIVE)
+    _local.priority = BULK
+    try:
+        yield
+    finally:
+        _local.priority = prev_priority
+
+
+def get_priority() -> int:
+    return getattr(_local, 'priority', INTERACTIVE)
+
+
+class TokenBucket:
+    """
+    Ограничение частоты запросов: rate токенов в секунду, не более capacity токенов в запасе (размер всплеска).
+    """
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """ Время ожидания (в секундах) до появления токена, 0 - токен есть. """
+
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self.tokens -= 1
+
+    def is_full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class _Job:
+    __slots__ = ('chat_id', 'func', 'args', 'kwargs', 'priority', 'future', 'enqueued', 'attempts')
+
+    def __init__(self, chat_id, func: Callable, args: tuple, kwargs: dict, priority: int):
+        self.chat_id = chat_id
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = Future()
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+
+class OutboundScheduler:
+    """
+    Очереди исходящих запросов по приоритетам и чатам. Для каждого чата одновременно выполняется
+    не более одного запроса, запросы одного чата выполняются в порядке поступления.
+    При ответе телеграма 429 (Too Many Requests) запрос повторяется после паузы retry_after.
+
+    :param global_rate: лимит запросов в секунду для всего бота.
+    :param chat_rate: лимит запросов в секунду для одного чата.
+    :param chat_burst: кол-во запросов в чат, которые можно выполнить подряд без ожидания.
+    :param group_rate: лимит запросов в секунду для группового чата.
+    :param num_senders: кол-во потоков, выполняющих запросы.
+    :param max_retries: максимальное кол-во повторов запроса после ответа 429.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 5,
+                 group_rate: float = 20 / 60, num_senders: int = 8, max_retries: int = 3):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[Optional[int], TokenBucket] = {}
+        self._queues = (OrderedDict(), OrderedDict())  # INTERACTIVE, BULK: id чата -> очередь запросов
+        self._in_flight = set()
+        self._blocked_until: Dict[Optional[int], float] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._executor = ThreadPoolExecutor(max_workers=num_senders, thread_name_prefix='OutboundSender')
+        self._thread = threading.Thread(target=self._loop, name='OutboundScheduler', daemon=True)
+        self._last_prune = time.monotonic()
+        self._sent = 0
+        self._failed = 0
+        self._retried = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def submit(self, chat_id: Optional[int], func: Callable, *args, **kwargs) -> Future:
+        """
+        Постановка запроса в очередь чата с приоритетом текущего потока (см. bulk_delivery).
+
+        :param chat_id: id чата, в который отправляется запрос.
+        :param func: метод api бота.
+        :return: Future с результатом запроса.
+        """
+
+        job = _Job(chat_id, func, args, kwargs, get_priority())
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Планировщик исходящих запросов остановлен')
+            queue = self._queues[job.priority]
+            lane = queue.get(chat_id)
+            if lane is None:
+                queue[chat_id] = deque([job])
+            else:
+                lane.append(job)
+            self._cond.notify()
+        return job.future
+
+    def call(self, chat_id: Optional[int], func: Callable, *args, **kwargs):
+        """
+        Выполнение запроса через очередь с ожиданием результата (исключения запроса пробрасываются).
+        В трассе команды запрос - участок с именем метода бота (время ожидания в очереди и выполнения запроса).
+        """
+
+        with tracer.span(getattr(func, '__name__', 'request'), priority=get_priority()):
+            return self.submit(chat_id, func, *args, **kwargs).result()
+
+    def _get_chat_bucket(self, chat_id: Optional[int]) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if chat_id is not None and chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.chat_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chat_buckets[chat_id] = bucket
+        return bucket
+
+    def _pick(self, now: float):
+        """
+        Выбор следующего запроса: сначала интерактивные, затем остальные; внутри приоритета - первый по кругу чат,
+        у которого нет выполняемого запроса и не исчерпан лимит.
+
+        :return: (запрос или None, время ожидания до следующей проверки или None - ждать новых запросов).
+        """
+
+        if not self._queues[INTERACTIVE] and not self._queues[BULK]:
+            return None, None
+        wait = self._global.delay(now)
+        if wait:
+            return None, wait
+        for queue in self._queues:
+            for chat_id, lane in queue.items():
+                if chat_id in self._in_flight:
+                    continue
+                delay = max(self._blocked_until.get(chat_id, 0) - now, self._get_chat_bucket(chat_id).delay(now))
+                if delay > 0:
+                    wait = delay if not wait else min(wait, delay)
+                    continue
+                job = lane.popleft()
+                if lane:
+                    queue.move_to_end(chat_id)
+                else:
+                    del queue[chat_id]
+                self._global.consume()
+                self._chat_buckets[chat_id].consume()
+                self._blocked_until.pop(chat_id, None)
+                self._in_flight.add(chat_id)
+                return job, 0
+        return None, wait or None
+
+    def _prune(self, now: float) -> None:
+        """ Удаление лимитов чатов, которые полностью восстановились и не используются. """
+
+        self._last_prune = now
+        for chat_id in [chat_id for chat_id, bucket in self._chat_buckets.items()
+                        if bucket.is_full(now) and chat_id not in self._in_flight
+                        and chat_id not in self._queues[INTERACTIVE] and chat_id not in self._queues[BULK]]:
+            del self._chat_buckets[chat_id]
+
+    def _loop(self) -> None:
+        with self._cond:
+            while not self._closed:
+                now = time.monotonic()
+                job, wait = self._pick(now)
+                if job is not None:
+                    wait_time = now - job.enqueued
+                    self._wait_total += wait_time
+                    self._wait_max = max(self._wait_max, wait_time)
+                    self._executor.submit(self._run, job)
+                    continue
+                if now - self._last_prune > 60:
+                    self._prune(now)
+                self._cond.wait(wait)
+
+    def _run(self, job: _Job) -> None:
+        job.attempts += 1
+        try:
+            result = job.func(*job.args, **job.kwargs)
+        except ApiTelegramException as e:
+            if e.error_code == 429 and job.attempts <= self.max_retries:
+                self._retry(job, e)
+                return
+            self._finish(job, exc=e)
+        except Exception as e:
+            self._finish(job, exc=e)
+        else:
+            self._finish(job, result=result)
+
+    def _retry(self, job: _Job, e: ApiTelegramException) -> None:
+        """ Возврат запроса в начало очереди чата, чат не обслуживается retry_after секунд. """
+
+        retry_after = ((e.result_json or {}).get('parameters') or {}).get('retry_after', 1)
+        logger.warning(f'Превышен лимит запросов для чата {job.chat_id}, повтор через {retry_after} с')
+        with self._cond:
+            self._retried += 1
+            self._blocked_until[job.chat_id] = time.monotonic() + retry_after
+            queue = self._queues[job.priority]
+            lane = queue.get(job.chat_id)
+            if lane is None:
+                queue[job.chat_id] = deque([job])
+                queue.move_to_end(job.chat_id, last=False)
+            else:
+                lane.appendleft(job)
+            self._in_flight.discard(job.chat_id)
+            self._cond.notify()
+
+    def _finish(self, job: _Job, result=None, exc: Exception = None) -> None:
+        with self._cond:
+            self._in_flight.discard(job.chat_id)
+            if exc is None:
+                self._sent += 1
+            else:
+                self._failed += 1
+            self._cond.notify()
+        if exc is None:
+            job.future.set_result(result)
+        else:
+            job.future.set_exception(exc)
+
+    def stats(self) -> dict:
+        """ Метрики очередей: размеры очередей, выполняемые запросы, счетчики и время ожидания в очереди. """
+
+        with self._cond:
+            count_picked = self._sent + self._failed + len(self._in_flight)
+            return {
+                'queued_interactive': sum(len(lane) for lane in self._queues[INTERACTIVE].values()),
+                'queued_bulk': sum(len(lane) for lane in self._queues[BULK].values()),
+                'waiting_chats': len(self._queues[INTERACTIVE].keys() | self._queues[BULK].keys()),
+                'in_flight': len(self._in_flight),
+                'sent': self._sent,
+                'failed': self._failed,
+                'retried_429': self._retried,
+                'wait_avg': self._wait_total / count_picked if count_picked else 0.0,
+                'wait_max': self._wait_max,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """ Остановка планировщика: запросы, оставшиеся в очередях, завершаются исключением. """
+
+        with self._cond:
+            self._closed = True
+            jobs = [job for queue in self._queues for lane in queue.values() for job in lane]
+            for queue in self._queues:
+                queue.clear()
+            self._cond.notify_all()
+        for job in jobs:
+            job.future.set_exception(RuntimeError('Планировщик исходящих запросов остановлен'))
+        if self._thread.is_alive():
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+
+class OutboundBot:
+    """
+    Обертка бота: методы отправки и изменения сообщений выполняются через планировщик исходящих запросов,
+    остальные атрибуты (регистрация обработчиков, answer_callback_query и т.д.) берутся у бота напрямую.
+
+    :param bot: объект бота.
+    :param scheduler: планировщик исходящих запросов.
+    """
+
+    def __init__(self, bot: TeleBot, scheduler: OutboundScheduler):
+        self.bot = bot
+        self.scheduler = scheduler
+
+    def __getattr__(self, name: str):
+        return getattr(self.bot, name)
+
+    def send_message(self, chat_id, text, **kwargs):
+        return self.scheduler.call(chat_id, self.bot.send_message, chat_id, text, **kwargs)
+
+    def reply_to(self, message, text, **kwargs):
+        #  TeleBot.reply_to вызывает send_message бота напрямую, минуя планировщик
+        return self.send_message(message.chat.id, text, reply_to_message_id=message.message_id, **kwargs)
+
+    def send_document(self, chat_id, data, **kwargs):
+        return self.scheduler.call(chat_id, self.bot.send_document, chat_id, data, **kwargs)
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        return self.scheduler.call(chat_id, self.bot.send_photo, chat_id, photo, **kwargs)
+
+    def send_media_group(self, chat_id, media, **kwargs):
+        return self.scheduler.call(chat_id, self.bot.send_media_group, chat_id, media, **kwargs)
+
+    def send_chat_action(self, chat_id, action, **kwargs):
+        return self.scheduler.call(chat_id, self.bot.send_chat_action, chat_id, action, **kwargs)
+
+    def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        return self.scheduler.call(chat_id, self.bot.edit_message_text, text, chat_id, message_id, **kwargs)
+
+    def edit_message_reply_markup(self, chat_id=None, message_id=None, **kwargs):
+        return self.scheduler.call(chat_id, self.bot.edit_message_reply_markup, chat_id, message_id, **kwargs)
+
+    def delete_message(self, chat_id, message_id, **kwargs):
+        return self.scheduler.call(chat_id, self.bot.delete_message, chat_id, message_id, **kwargs)
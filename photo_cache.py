@@ -0,0 +1,121 @@
+"""
+Кэш идентификаторов фото (file_id) на серверах телеграма.
+
+После первой успешной отправки фото (загрузка файла или отправка по url) телеграм возвращает file_id,
+по которому это же фото можно отправить повторно без загрузки файла и без скачивания по url.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from telebot.types import Message
+
+
+logger = logging.getLogger('main.photo_cache')
+
+
+def get_file_id(message: Message) -> Optional[str]:
+    """ file_id фото (наибольшего размера) из отправленного сообщения. """
+
+    if message is not None and message.photo:
+        return message.photo[-1].file_id
+    return None
+
+
+class PhotoCache:
+    """
+    Ограниченный по размеру LRU кэш: ключ фото (url или путь к файлу) -> file_id.
+    Содержимое кэша сохраняется в json файл не чаще, чем раз в save_interval секунд, и при вызове save().
+
+    :param path: (optional) путь к файлу для сохранения кэша между перезапусками, None - без сохранения.
+    :param max_size: максимальное кол-во записей.
+    :param save_interval: минимальный интервал между сохранениями кэша в файл методом maybe_save(), в секундах.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_size: int = 10000, save_interval: float = 60):
+        self.path = path
+        self.max_size = max_size
+        self.save_interval = save_interval
+        self._items: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self.load()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            file_id = self._items.get(key)
+            if file_id is not None:
+                self._items.move_to_end(key)
+            return file_id
+
+    def put(self, key: str, file_id: Optional[str]) -> None:
+        if not file_id:
+            return
+        with self._lock:
+            if self._items.get(key) == file_id:
+                self._items.move_to_end(key)
+                return
+            self._items[key] = file_id
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+            self._dirty = True
+
+    def put_from_messages(self, keys: List[str], messages: List[Message]) -> None:
+        """ Сохранение file_id из отправленных сообщений (альбома) в порядке ключей. """
+
+        for key, message in zip(keys, messages):
+            self.put(key, get_file_id(message))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if self._items.pop(key, None) is not None:
+                self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf8') as f_json:
+                items = json.load(f_json)
+        except (OSError, ValueError):
+            logger.exception(f'Не удалось загрузить кэш фото из файла {self.path}')
+            return
+        with self._lock:
+            self._items = OrderedDict(items[-self.max_size:])
+            self._dirty = False
+        logger.debug(f'Загружен кэш фото: {len(self._items)} записей')
+
+    def save(self) -> None:
+        """ Сохранение кэша в файл (через временный файл, чтобы не повредить кэш при сбое записи). """
+
+        if not self.path:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            items = list(self._items.items())
+            self._dirty = False
+            self._last_save = time.monotonic()
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf8') as f_json:
+                json.dump(items, f_json, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logger.exception(f'Не удалось сохранить кэш фото в файл {self.path}')
+            with self._lock:
+                self._dirty = True
+
+    def maybe_save(self) -> None:
+        if self._dirty and time.monotonic() - self._last_save >= self.save_interval:
+            self.save()
@@ -0,0 +1,162 @@
+"""
+Предварительная проверка доступности фото отелей по url перед отправкой результата пользователю.
+
+Недоступное фото обнаруживается проверкой с коротким таймаутом, и вместо него сразу отправляется фото-заглушка,
+без неудачного запроса к api телеграма.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Tuple
+
+import requests
+
+
+logger = logging.getLogger('main.photo_checker')
+
+
+class PhotoUrlChecker:
+    """
+    Параллельная проверка url фото в ограниченном пуле потоков с кэшированием результата проверки.
+
+    :param max_workers: кол-во одновременных проверок.
+    :param timeout: таймаут запроса одного url, в секундах.
+    :param ttl: время хранения результата проверки url в кэше, в секундах.
+    :param max_size: максимальное кол-во url в кэше.
+    :param error_ttl: время хранения результата неудачной проверки из-за ошибки сети (таймаут, разрыв соединения),
+                      в секундах: ошибка может быть временной, поэтому url проверяется повторно раньше.
+    """
+
+    def __init__(self, max_workers: int = 8, timeout: float = 2.0, ttl: float = 3600, max_size: int = 10000,
+                 error_ttl: float = 60):
+        self.timeout = timeout
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.max_size = max_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='PhotoCheck')
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._health: 'OrderedDict[str, Tuple[bool, float]]' = OrderedDict()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self._local.session = session
+        return session
+
+    def is_alive(self, url: str) -> bool:
+        """
+        Проверка доступности фото по url (без учета кэша). Сначала выполняется HEAD запрос,
+        если сервер его не поддерживает - GET запрос без загрузки тела ответа.
+        """
+
+        return self._probe(url)[0]
+
+    def _probe(self, url: str) -> Tuple[bool, float]:
+        """
+        :return: доступность фото и время хранения результата в кэше (ответ сервера - ttl, ошибка сети - error_ttl).
+        """
+
+        session = self._session()
+        try:
+            res = session.head(url, timeout=self.timeout, allow_redirects=True)
+            if res.status_code in (403, 405, 501):
+                res = session.get(url, timeout=self.timeout, stream=True)
+                res.close()
+        except requests.exceptions.RequestException as e:
+            logger.debug(f'Фото {url} недоступно: {e}')
+            return False, self.error_ttl
+        content_type = res.headers.get('Content-Type', '')
+        return res.status_code == 200 and content_type.startswith('image/'), self.ttl
+
+    def _get_cached(self, url: str, now: float):
+        with self._lock:
+            item = self._health.get(url)
+            if item is None:
+                return None
+            is_alive, expires = item
+            if expires < now:
+                del self._health[url]
+                return None
+            return is_alive
+
+    def _save(self, url: str, is_alive: bool, now: float, ttl: float = None) -> None:
+        with self._lock:
+            self._health[url] = (is_alive, now + (self.ttl if ttl is None else ttl))
+            self._health.move_to_end(url)
+            while len(self._health) > self.max_size:
+                self._health.popitem(last=False)
+
+    def check(self, urls: Iterable[str]) -> Dict[str, bool]:
+        """
+        Проверка списка url: результаты из кэша берутся сразу, остальные url проверяются параллельно.
+        Если проверка не успела завершиться, url считается доступным (решение остается за телеграмом).
+
+        :param urls: url фото.
+        :return: url -> доступность фото.
+        """
+
+        now = time.monotonic()
+        result = {}
+        futures = {}
+        for url in set(urls):
+            is_alive = self._get_cached(url, now)
+            if is_alive is None:
+                futures[self._executor.submit(self._probe, url)] = url
+            else:
+                result[url] = is_alive
+        if not futures:
+            return result
+
+        done, not_done = wait(futures, timeout=self.timeout * 2)
+        now = time.monotonic()
+        for future in done:
+            url = futures[future]
+            result[url], ttl = future.result()
+            self._save(url, result[url], now, ttl)
+        for future in not_done:
+            result[futures[future]] = True
+        return result
+
+    def replace_dead_photos(self, hotels: List[dict], skip=lambda url: False) -> List[dict]:
+        """
+        Замена url недоступных фото отелей пустой строкой (будет отправлено фото-заглушка).
+
+        :param hotels: список отелей.
+        :param skip: функция, определяющая url, которые проверять не нужно (например, уже есть file_id фото).
+        :return: список отелей (отели с недоступными фото - копии с пустым url фото).
+        """
+
+        urls = [hotel['url_photo'] for hotel in hotels if hotel['url_photo'] and not skip(hotel['url_photo'])]
+        if not urls:
+            return hotels
+        health = self.check(urls)
+        dead = [url for url, is_alive in health.items() if not is_alive]
+        if dead:
+            logger.info(f'Недоступные фото отелей заменены фото-заглушкой: {dead}')
+        return [dict(hotel, url_photo='') if not health.get(hotel['url_photo'], True) else hotel
+                for hotel in hotels]
+
+    def export_health(self) -> List[list]:
+        """ Непросроченные результаты проверки url для снимка: [url, доступность, время окончания (unix)]. """
+
+        now, wall_now = time.monotonic(), time.time()
+        with self._lock:
+            return [[url, is_alive, round(wall_now + expires - now, 1)]
+                    for url, (is_alive, expires) in self._health.items() if expires > now]
+
+    def restore_health(self, items: List[list]) -> None:
+        """ Восстановление результатов проверки url из снимка (просроченные результаты отбрасываются). """
+
+        now, wall_now = time.monotonic(), time.time()
+        with self._lock:
+            for url, is_alive, expires in items[-self.max_size:]:
+                if expires > wall_now:
+                    self._health[url] = (is_alive, now + expires - wall_now)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
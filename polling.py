@@ -0,0 +1,147 @@
+"""
+Получение обновлений телеграма опросом getUpdates (long polling).
+
+Обновления запрашиваются пачками (до 100 за запрос) и раскладываются по очередям чатов диспетчера:
+обновления одного чата обрабатываются по порядку, разных чатов - параллельно. Следующий запрос getUpdates
+выполняется сразу, не дожидаясь обработки пачки. Собирается статистика: размер очереди обработки,
+размеры пачек и задержка обработки обновлений.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+import requests
+from telebot import TeleBot, apihelper
+from telebot.types import Update
+
+from dispatcher import ChatDispatcher, get_chat_id
+from slo import RollingPercentiles
+
+
+logger = logging.getLogger('main.polling')
+
+
+def get_update_date(update: Update) -> Optional[int]:
+    """
+    Время отправки сообщения пользователем (unix time). Для остальных обновлений (нажатие inline кнопки и т.д.)
+    время действия пользователя в обновлении не передается.
+    """
+
+    return update.message.date if update.message else None
+
+
+class PollingConsumer:
+    """
+    Цикл опроса getUpdates с обработкой обновлений в очередях чатов.
+    Если в очередях больше max_pending обновлений, опрос приостанавливается до разбора очереди.
+
+    :param bot: объект бота с зарегистрированными обработчиками (process_new_updates не должен быть заменен
+                диспетчером, т.е. ChatDispatcher.attach для бота не вызывается).
+    :param dispatcher: диспетчер обработки обновлений.
+    :param limit: максимальное кол-во обновлений в одном ответе getUpdates (1-100).
+    :param long_polling_timeout: время ожидания новых обновлений сервером телеграма, в секундах.
+    :param max_pending: максимальное кол-во обновлений в очередях обработки.
+    :param window: кол-во последних пачек и обновлений, по которым считается статистика.
+    :param stats_interval: интервал вывода статистики в лог, в секундах.
+    """
+
+    def __init__(self, bot: TeleBot, dispatcher: ChatDispatcher, limit: int = 100, long_polling_timeout: int = 20,
+                 max_pending: int = 1000, window: int = 1000, stats_interval: float = 60):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.limit = limit
+        self.long_polling_timeout = long_polling_timeout
+        self.max_pending = max_pending
+        self.stats_interval = stats_interval
+        self._process_updates = bot.process_new_updates
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._batch_sizes = deque(maxlen=window)
+        self._lags = deque(maxlen=window)
+        self._queue_lags = deque(maxlen=window)
+        self._received = 0
+        self._processed = 0
+
+    def poll_once(self) -> int:
+        """
+        Один запрос getUpdates и постановка полученных обновлений в очереди чатов.
+
+        :return: кол-во полученных обновлений.
+        """
+
+        updates = self.bot.get_updates(offset=self.bot.last_update_id + 1, limit=self.limit,
+                                       timeout=self.long_polling_timeout + 5,
+                                       long_polling_timeout=self.long_polling_timeout)
+        with self._lock:
+            self._batch_sizes.append(len(updates))
+            self._received += len(updates)
+        time_received = time.monotonic()
+        for update in updates:
+            if update.update_id > self.bot.last_update_id:
+                self.bot.last_update_id = update.update_id
+            self.dispatcher.submit(get_chat_id(update), self._process, update, time_received)
+        return len(updates)
+
+    def _process(self, update: Update, time_received: float) -> None:
+        try:
+            self._process_updates([update])
+        finally:
+            date = get_update_date(update)
+            with self._lock:
+                self._processed += 1
+                self._queue_lags.append(time.monotonic() - time_received)
+                if date is not None:
+                    self._lags.append(time.time() - date)
+
+    def run(self) -> None:
+        """ Цикл опроса до вызова stop(). При ошибках запроса пауза увеличивается (до 60 секунд). """
+
+        logger.info('Started polling consumer')
+        error_interval = 0.25
+        last_stats = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() - last_stats >= self.stats_interval:
+                last_stats = time.monotonic()
+                logger.info(f'Polling stats: {self.stats()}')
+            if self.dispatcher.pending() >= self.max_pending:
+                self._stop.wait(0.05)
+                continue
+            try:
+                self.poll_once()
+                error_interval = 0.25
+            except (apihelper.ApiException, requests.exceptions.RequestException) as e:
+                logger.error(f'Ошибка запроса обновлений: {e}. Повтор через {error_interval} с')
+                self._stop.wait(error_interval)
+                error_interval = min(error_interval * 2, 60)
+        logger.info(f'Stopped polling consumer. Stats: {self.stats()}')
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> dict:
+        """
+        Статистика опроса: backlog - обновлений в очередях обработки, batch_* - размеры пачек getUpdates,
+        lag_* - время от отправки сообщения пользователем до окончания обработки обновления (с точностью до секунды),
+        queue_lag_* - время от получения обновления ботом до окончания его обработки.
+        """
+
+        with self._lock:
+            batch_sizes = list(self._batch_sizes)
+            lags = sorted(self._lags)
+            queue_lags = sorted(self._queue_lags)
+            received, processed = self._received, self._processed
+        return {
+            'backlog': self.dispatcher.pending(),
+            'received': received,
+            'processed': processed,
+            'batch_last': batch_sizes[-1] if batch_sizes else 0,
+            'batch_avg': sum(batch_sizes) / len(batch_sizes) if batch_sizes else 0.0,
+            'batch_max': max(batch_sizes, default=0),
+            'lag_p50': RollingPercentiles.percentile(lags, 50),
+            'lag_p99': RollingPercentiles.percentile(lags, 99),
+            'queue_lag_p50': RollingPercentiles.percentile(queue_lags, 50),
+            'queue_lag_p99': RollingPercentiles.percentile(queue_lags, 99),
+        }
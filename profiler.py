@@ -0,0 +1,221 @@
+"""
+Встроенный семплирующий профилировщик работающего бота.
+
+Фоновый поток с заданным интервалом снимает стеки всех потоков процесса (sys._current_frames) и накапливает
+их в формате collapsed stacks (строка "поток;функция (файл);...;функция (файл) кол-во" - вход для flamegraph.pl,
+speedscope и т.п.). Дополнительно маршрутизатор обновлений передает профилировщику время выполнения каждого
+обработчика (wall и cpu время потока).
+
+По окончании окна профилирования в папку логов записываются:
+- profile-<время>.collapsed - стеки для построения flame graph;
+- profile-<время>.txt - доли семплов по категориям (сеть, json, календарь, логи, очередь отправки, ожидание)
+  для групп потоков, таблица времени обработчиков и самые частые функции на вершине стека.
+"""
+
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+
+logger = logging.getLogger('main.profiler')
+
+#  категории семплов по файлам функций стека (проверяются от вершины стека к основанию, первое совпадение)
+CATEGORIES = (
+    ('network', ('socket.py', 'ssl.py', os.sep + 'http' + os.sep + 'client.py', os.sep + 'urllib3' + os.sep,
+                 os.sep + 'requests' + os.sep, 'selectors.py')),
+    ('json', (os.sep + 'json' + os.sep,)),
+    ('calendar', ('bot_calendar.py', 'callback_codec.py')),
+    ('logging', (os.sep + 'logging' + os.sep,)),
+    ('outbound', ('outbound.py',)),
+)
+#  функции ожидания на вершине стека (поток простаивает)
+WAIT_FUNCTIONS = {'wait', 'acquire', 'get', 'sleep', 'select', 'poll', 'join', 'result'}
+
+
+def get_thread_group(name: str) -> str:
+    """ Группа потока: имя без номера (ChatWorker_3 -> ChatWorker). """
+
+    return re.sub(r'[_-]?\d+$', '', name) or name
+
+
+def get_category(frames: List[Tuple[str, str]]) -> str:
+    """
+    Категория семпла по стеку.
+
+    :param frames: (имя файла, имя функции) от вершины стека к основанию.
+    """
+
+    for filename, _ in frames:
+        for category, patterns in CATEGORIES:
+            if any(pattern in filename for pattern in patterns):
+                return category
+    if frames and frames[0][1] in WAIT_FUNCTIONS:
+        return 'wait'
+    return 'other'
+
+
+class SamplingProfiler:
+    """
+    Семплирующий профилировщик потоков процесса.
+
+    :param interval: интервал снятия стеков (с).
+    :param output_dir: папка для записи результатов.
+    """
+
+    def __init__(self, interval: float = 0.01, output_dir: str = 'logs'):
+        self.interval = interval
+        self.output_dir = output_dir
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Counter = Counter()
+        self._categories: Dict[str, Counter] = defaultdict(Counter)
+        self._leaves: Counter = Counter()
+        #  имя обработчика -> [кол-во вызовов, wall время, cpu время]
+        self._handlers: Dict[str, list] = {}
+        self.samples = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, on_finish: Callable[[str], None] = None) -> bool:
+        """
+        Запуск профилирования на duration секунд.
+
+        :param on_finish: вызывается (в потоке профилировщика) с путем к файлу отчета.
+        :return: False - профилирование уже запущено.
+        """
+
+        with self._lock:
+            if self.running:
+                return False
+            self._stacks = Counter()
+            self._categories = defaultdict(Counter)
+            self._leaves = Counter()
+            self._handlers = {}
+            self.samples = 0
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, args=(duration, on_finish), name='Profiler',
+                                             daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self) -> None:
+        """ Досрочное окончание профилирования (с записью результатов). """
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @contextmanager
+    def handler(self, name: str) -> Iterator[None]:
+        """ Учет wall и cpu времени обработчика обновления (только во время профилирования). """
+
+        if not self.running:
+            yield
+            return
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+            with self._lock:
+                stats = self._handlers.setdefault(name, [0, 0.0, 0.0])
+                stats[0] += 1
+                stats[1] += wall
+                stats[2] += cpu
+
+    def _run(self, duration: float, on_finish: Optional[Callable[[str], None]]) -> None:
+        own_ident = threading.get_ident()
+        time_start = time.perf_counter()
+        deadline = time_start + duration
+        while not self._stop.is_set() and time.perf_counter() < deadline:
+            self.sample(exclude=own_ident)
+            self._stop.wait(self.interval)
+        try:
+            path = self.write_report(time.perf_counter() - time_start)
+        except OSError:
+            logger.exception('Ошибка записи результатов профилирования')
+            return
+        logger.info(f'Профилирование завершено, семплов: {self.samples}, отчет: {path}')
+        if on_finish is not None:
+            try:
+                on_finish(path)
+            except Exception:
+                logger.exception('Ошибка обработки результатов профилирования')
+
+    def sample(self, exclude: int = None) -> None:
+        """ Снятие стеков всех потоков (кроме exclude). """
+
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        samples = []
+        for ident, frame in frames.items():
+            if ident == exclude:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name))
+                frame = frame.f_back
+            group = get_thread_group(names.get(ident, str(ident)))
+            collapsed = ';'.join([group] + [f'{func} ({os.path.basename(filename)})'
+                                            for filename, func in reversed(stack)])
+            leaf = f'{stack[0][1]} ({os.path.basename(stack[0][0])})' if stack else '-'
+            samples.append((group, collapsed, get_category(stack), leaf))
+        with self._lock:
+            for group, collapsed, category, leaf in samples:
+                self._stacks[collapsed] += 1
+                self._categories[group][category] += 1
+                self._leaves[f'{group}: {leaf}'] += 1
+            self.samples += 1
+
+    def write_report(self, elapsed: float) -> str:
+        """
+        Запись стеков и сводного отчета в папку логов.
+
+        :return: путь к файлу отчета.
+        """
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        base = os.path.join(self.output_dir, time.strftime('profile-%Y%m%d-%H%M%S'))
+        with self._lock:
+            stacks = self._stacks.most_common()
+            categories = {group: Counter(counts) for group, counts in self._categories.items()}
+            leaves = self._leaves.most_common(20)
+            handlers = sorted(self._handlers.items(), key=lambda item: item[1][1], reverse=True)
+            samples = self.samples
+        with open(base + '.collapsed', 'w', encoding='utf8') as f_stacks:
+            for stack, count in stacks:
+                f_stacks.write(f'{stack} {count}\n')
+
+        names = [name for name, _ in CATEGORIES] + ['wait', 'other']
+        lines = [f'Профилирование: {elapsed:.1f} с, семплов: {samples}, интервал: {self.interval * 1000:.0f} мс',
+                 f'Стеки (flame graph): {base}.collapsed', '',
+                 'Доли семплов по категориям, %:',
+                 f'{"потоки":<24}' + ''.join(f'{name:>10}' for name in names)]
+        for group, counts in sorted(categories.items()):
+            total = sum(counts.values())
+            lines.append(f'{group:<24}' + ''.join(f'{counts[name] * 100 / total:>10.1f}' for name in names))
+        lines += ['', 'Обработчики обновлений:',
+                  f'{"обработчик":<32}{"вызовов":>10}{"wall, с":>10}{"wall ср, мс":>13}{"cpu, с":>10}'
+                  f'{"cpu ср, мс":>12}']
+        for name, (count, wall, cpu) in handlers:
+            lines.append(f'{name:<32}{count:>10}{wall:>10.3f}{wall / count * 1000:>13.2f}{cpu:>10.3f}'
+                         f'{cpu / count * 1000:>12.2f}')
+        lines += ['', 'Функции на вершине стека (семплов):']
+        lines += [f'{count:>8}  {leaf}' for leaf, count in leaves]
+        with open(base + '.txt', 'w', encoding='utf8') as f_report:
+            f_report.write('\n'.join(lines) + '\n')
+        return base + '.txt'
+
+
+#  профилировщик бота (запускается параметром --profile или командой администратора /profile)
+profiler = SamplingProfiler()
@@ -2,11 +2,13 @@ import json
 import logging
 import os
 import re
+import time
 from typing import NamedTuple
 
 import requests
 
 import config
+from metrics import API_ERRORS, API_REQUEST_SECONDS
 
 
 logger = logging.getLogger('main.resources')
@@ -56,6 +58,7 @@ def query_locations_info(name_city: str, debug_mode: bool) -> LocationInfo:
     query_dict = {"query": name_city, "locale": config.LOCALE}
 
     res_data = {}
+    time_start = time.perf_counter()
     if debug_mode and name_city.strip().lower() == config.DEBUG_NAME_CITY:
         mock_file = 'debug_data/locations.json'
         if os.path.exists(mock_file):
@@ -69,17 +72,25 @@ def query_locations_info(name_city: str, debug_mode: bool) -> LocationInfo:
             res = requests.get(LOCATION_URL, headers=config.HEADERS_RAPID_API, params=query_dict, timeout=15)
         except requests.exceptions.ReadTimeout:
             logger.exception('Превышен таймаут ответа при запросе локаций!')
+            API_ERRORS.inc('locations', 'timeout')
             return LocationInfo(err_msg=ERR_MSG.format(desc=' (превышен таймаут ответа)'))
+        time_network = time.perf_counter()
+        API_REQUEST_SECONDS.observe(time_network - time_start, 'locations', 'network')
+        time_start = time_network
 
         if res.status_code != 200:
             logger.error(f'При запросе локаций сервер вернул status_code [{res.status_code}].'
                          f' Текст ответа: "{res.text}"')
+            API_ERRORS.inc('locations', 'status')
             return LocationInfo(err_msg=ERR_MSG.format(desc=''))
         res_data = res.json()
+    time_decode = time.perf_counter()
+    API_REQUEST_SECONDS.observe(time_decode - time_start, 'locations', 'decode')
 
     suggestions = res_data.get('suggestions', [])
     ct_group = [group for group in suggestions if group.get('group') == 'CITY_GROUP']
     if not ct_group:
+        API_REQUEST_SECONDS.observe(time.perf_counter() - time_decode, 'locations', 'extract')
         return LocationInfo(locations={})
 
     ct_group = ct_group[0]
@@ -93,6 +104,7 @@ def query_locations_info(name_city: str, debug_mode: bool) -> LocationInfo:
         caption = caption.replace("</span>", '')
         city_ids[caption] = id_city
 
+    API_REQUEST_SECONDS.observe(time.perf_counter() - time_decode, 'locations', 'extract')
     return LocationInfo(locations=city_ids)
 
 
@@ -114,6 +126,7 @@ def query_hotels_by_param(data_query: dict, debug_mode: bool,
     data_query.update({'pageNumber': page_number, 'pageSize': page_size,
                        'locale': config.LOCALE, 'currency': config.CURRENCY})
 
+    time_start = time.perf_counter()
     if debug_mode:
         test_files = {'PRICE': 'hotels_low_price.json', 'PRICE_HIGHEST_FIRST': 'hotels_high_price.json',
                       'DISTANCE_FROM_LANDMARK': 'hotels_by_range_price_{}.json'}
@@ -132,28 +145,38 @@ def query_hotels_by_param(data_query: dict, debug_mode: bool,
                 res_data = json.load(f_json)
         else:
             logger.error(f'Файл с отелями {mock_file} не найден!')
+        time_decode = time.perf_counter()
     else:
         try:
             res = requests.get(LIST_HOTEL_URL, headers=config.HEADERS_RAPID_API, params=data_query, timeout=15)
         except requests.exceptions.ReadTimeout:
             logger.exception('Превышен таймаут ответа при запросе списка отелей!')
+            API_ERRORS.inc('hotels', 'timeout')
             return HotelsInfo(err_msg=ERR_MSG.format(desc=' (превышен таймаут ответа)'))
+        time_network = time.perf_counter()
+        API_REQUEST_SECONDS.observe(time_network - time_start, 'hotels', 'network')
+        time_start = time_network
 
         if res.status_code != 200:
             logger.error(f'При запросе списка отелей сервер вернул status_code [{res.status_code}].'
                          f' Текст ответа: "{res.text}"')
+            API_ERRORS.inc('hotels', 'status')
             return HotelsInfo(err_msg=ERR_MSG.format(desc=''))
 
         res_data = res.json()
+        time_decode = time.perf_counter()
 
         # для отладки, просмотр api ответа, если вдруг какие ошибки
         with open('debug_data/hotels_load.json', 'w', encoding='utf8') as f_json:
             json.dump(res_data, f_json, indent=2, ensure_ascii=False)
+    API_REQUEST_SECONDS.observe(time_decode - time_start, 'hotels', 'decode')
+    time_decode = time.perf_counter()
 
     if res_data.get('result') != 'OK':
         err_msg = res_data.get('error_message')
         logger.error(f'При запросе списка отелей в возвращенном json - result none OK.'
                      f' Текст ошибки: {err_msg}. Подробности в debug_data/hotels_load.json.')
+        API_ERRORS.inc('hotels', 'result')
         return HotelsInfo(err_msg=ERR_MSG.format(desc=' (Result none OK)'))
 
     try:
@@ -162,6 +185,7 @@ def query_hotels_by_param(data_query: dict, debug_mode: bool,
     except KeyError as e:
         logger.error(f'При запросе списка отелей в возвращенном json неожиданно отсутствует ключ: {e}.'
                      f' Параметры запроса: {data_query}')
+        API_ERRORS.inc('hotels', 'structure')
         return HotelsInfo(hotels=[])
     next_page_number = search_results.get('pagination', {}).get('nextPageNumber', 0)
 
@@ -205,4 +229,5 @@ def query_hotels_by_param(data_query: dict, debug_mode: bool,
                            'url_photo': photo_hotel}
                           )
 
+    API_REQUEST_SECONDS.observe(time.perf_counter() - time_decode, 'hotels', 'extract')
     return HotelsInfo(hotels=hotels_lst, next_page_number=next_page_number)
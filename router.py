@@ -0,0 +1,135 @@
+"""
+Маршрутизатор входящих обновлений.
+
+Вместо последовательной проверки предикатов каждого обработчика (telebot проверяет их по порядку регистрации),
+обработчик определяется одним поиском по индексу:
+- текстовые команды - по имени команды;
+- текстовые сообщения - по тексту кнопки (например "Назад") при активной команде или по текущему состоянию FSM
+  пользователя (одно обращение к сессии);
+- inline callback запросы - по префиксу callback данных.
+Время выполнения обработчиков (шагов команд) записывается в метрику bot_handler_seconds, при включенной
+трассировке - участком в трассу команды пользователя, а во время профилирования - в таблицу обработчиков профилировщика.
+Задержка ответа пользователю (от получения обновления) записывается в замеры SLO по команде и состоянию FSM.
+"""
+
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from telebot import TeleBot
+from telebot.types import CallbackQuery, Message
+from telebot.util import extract_command
+
+import fsm
+from BotController import BotController
+from dispatcher import get_received_time
+from metrics import HANDLER_SECONDS
+from profiler import profiler
+from slo import slo
+from tracing import tracer
+
+
+COMMAND = 'command'
+MESSAGE = 'message'
+TEXT = 'text'
+CALLBACK = 'callback'
+
+
+class UpdateRouter:
+    """
+    Индекс обработчиков по ключу (тип обновления, имя команды | состояние FSM | префикс callback данных).
+
+    :param bot_controller: контроллер бота, из которого берется текущее состояние команды пользователя.
+    :param callback_sep: разделитель префикса в callback данных.
+    """
+
+    def __init__(self, bot_controller: BotController, callback_sep: str = ':'):
+        self.bot_controller = bot_controller
+        self.callback_sep = callback_sep
+        self._index: Dict[Tuple[str, Hashable], Callable] = {}
+        self._default_message_handler: Optional[Callable] = None
+
+    def _register(self, update_type: str, keys: tuple) -> Callable:
+        def decorator(handler: Callable) -> Callable:
+            for key in keys:
+                if (update_type, key) in self._index:
+                    raise ValueError(f'Обработчик для {update_type} {key!r} уже зарегистрирован')
+                self._index[(update_type, key)] = handler
+            return handler
+        return decorator
+
+    def command_handler(self, *commands: str) -> Callable:
+        """ Регистрация обработчика команд (имена без "/"). """
+
+        return self._register(COMMAND, commands)
+
+    def message_handler(self, *states: int) -> Callable:
+        """ Регистрация обработчика текстовых сообщений для указанных состояний FSM. """
+
+        return self._register(MESSAGE, states)
+
+    def text_handler(self, *texts: str) -> Callable:
+        """ Регистрация обработчика текстовых сообщений с указанным текстом (кнопки) в любом состоянии команды. """
+
+        return self._register(TEXT, texts)
+
+    def callback_handler(self, *prefixes: str) -> Callable:
+        """ Регистрация обработчика inline callback запросов с указанными префиксами данных. """
+
+        return self._register(CALLBACK, prefixes)
+
+    def default_message_handler(self, handler: Callable) -> Callable:
+        """ Регистрация обработчика текстовых сообщений, для которых не найден другой обработчик. """
+
+        self._default_message_handler = handler
+        return handler
+
+    def resolve_message(self, msg: Message) -> Tuple[Optional[Callable], tuple]:
+        """
+        Выбор обработчика текстового сообщения.
+
+        :return: обработчик и прочитанные при выборе данные сессии пользователя (команда, состояние, трасса).
+        """
+
+        if msg.text.startswith('/'):
+            handler = self._index.get((COMMAND, extract_command(msg.text)))
+            if handler:
+                #  команды выбираются без чтения сессии (трасса нужна только при включенной трассировке)
+                trace = self.bot_controller.get_trace(msg.from_user.id) if tracer.enabled else None
+                return handler, (None, None, trace)
+        session = self.bot_controller.get_session_info(msg.from_user.id)
+        state = session[1]
+        if state is not None:
+            handler = self._index.get((TEXT, msg.text)) or self._index.get((MESSAGE, state))
+            if handler:
+                return handler, session
+        return self._default_message_handler, session
+
+    def resolve_callback(self, call: CallbackQuery) -> Optional[Callable]:
+        prefix = call.data.split(self.callback_sep, 1)[0]
+        return self._index.get((CALLBACK, prefix))
+
+    def _run_handler(self, handler: Callable, update, user_id: int, session: tuple) -> None:
+        command, state, trace = session
+        with slo.measure(command, fsm.state_names.get(state, str(state)), get_received_time()), \
+                HANDLER_SECONDS.time(handler.__name__), profiler.handler(handler.__name__), \
+                tracer.span(handler.__name__, trace=trace, user=user_id):
+            handler(update)
+
+    def dispatch_message(self, msg: Message) -> None:
+        handler, session = self.resolve_message(msg)
+        if handler:
+            self._run_handler(handler, msg, msg.from_user.id, session)
+
+    def dispatch_callback(self, call: CallbackQuery) -> None:
+        handler = self.resolve_callback(call)
+        if handler:
+            user_id = call.message.chat.id
+            self._run_handler(handler, call, user_id, self.bot_controller.get_session_info(user_id))
+
+    def attach(self, bot: TeleBot) -> None:
+        """
+        Регистрация маршрутизатора в боте: единственный обработчик текстовых сообщений
+        и единственный обработчик inline callback запросов.
+        """
+
+        bot.register_message_handler(self.dispatch_message, content_types=['text'])
+        bot.register_callback_query_handler(self.dispatch_callback, func=None)
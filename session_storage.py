@@ -0,0 +1,196 @@
+"""
+Хранилища сессий пользователей (атрибутов активных команд и состояния FSM).
+
+MemorySessionStorage - хранение в памяти процесса (поведение по умолчанию), сессии сохраняются между
+перезапусками бота снимком (snapshot.py) и восстанавливаются лениво - при первом обращении к сессии.
+SqliteSessionStorage - хранение в файле sqlite, позволяет нескольким процессам бота
+работать с общим состоянием и не терять диалоги при перезапуске.
+"""
+
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+logger = logging.getLogger('main.session_storage')
+
+
+class SessionStorage(ABC):
+    """
+    Базовый класс хранилища сессий. Ключ - id пользователя, значение - объект с атрибутами команды
+    пользователя (UserData).
+    """
+
+    @abstractmethod
+    def get(self, user_id: int) -> Optional[Any]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save(self, user_id: int, user_data: Any) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, user_id: int) -> None:
+        raise NotImplementedError
+
+    def update(self, user_id: int, func: Callable[[Any], None]) -> Optional[Any]:
+        """
+        Изменение сессии: func получает объект сессии и изменяет его, измененная сессия сохраняется.
+        Если сессии нет, func не вызывается.
+
+        :return: измененный объект сессии или None.
+        """
+
+        user_data = self.get(user_id)
+        if user_data is not None:
+            func(user_data)
+            self.save(user_id, user_data)
+        return user_data
+
+    @abstractmethod
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.get(user_id) is not None
+
+
+class MemorySessionStorage(SessionStorage):
+    """
+    Хранилище сессий в памяти процесса. Объекты хранятся как есть, без сериализации.
+    Сессии, восстановленные из снимка (restore), хранятся строками и преобразуются в объекты при первом обращении.
+    """
+
+    def __init__(self):
+        self._sessions: Dict[int, Any] = {}
+        #  восстановленные, но еще не запрошенные сессии: id пользователя -> строка снимка
+        self._pending: Dict[int, str] = {}
+        self._loader: Optional[Callable[[str], Any]] = None
+
+    def get(self, user_id: int) -> Optional[Any]:
+        user_data = self._sessions.get(user_id)
+        if user_data is None and self._pending:
+            raw = self._pending.pop(user_id, None)
+            if raw is not None:
+                try:
+                    user_data = self._sessions[user_id] = self._loader(raw)
+                except (ValueError, TypeError, IndexError):
+                    logger.exception(f'Не удалось восстановить сессию пользователя user_id={user_id}, сессия удалена')
+        return user_data
+
+    def save(self, user_id: int, user_data: Any) -> None:
+        self._pending.pop(user_id, None)
+        self._sessions[user_id] = user_data
+
+    def delete(self, user_id: int) -> None:
+        self._pending.pop(user_id, None)
+        self._sessions.pop(user_id, None)
+
+    def __len__(self) -> int:
+        return len(self._sessions) + len(self._pending)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._sessions or user_id in self._pending
+
+    def export(self) -> Tuple[Dict[int, Any], Dict[int, str]]:
+        """ Копии сессий для снимка: объекты сессий и еще не запрошенные после восстановления строки снимка. """
+
+        return dict(self._sessions), dict(self._pending)
+
+    def restore(self, pending: Dict[int, str], loader: Callable[[str], Any]) -> None:
+        """
+        Восстановление сессий из снимка без разбора: строка сессии преобразуется в объект при первом обращении.
+
+        :param pending: id пользователя -> строка сессии из снимка.
+        :param loader: функция преобразования строки сессии в объект.
+        """
+
+        self._loader = loader
+        self._pending.update((user_id, raw) for user_id, raw in pending.items() if user_id not in self._sessions)
+
+
+class SqliteSessionStorage(SessionStorage):
+    """
+    Хранилище сессий в файле sqlite, общее для нескольких процессов бота.
+    Объекты сессий сериализуются методом dumps() и восстанавливаются методом data_cls.loads().
+    Каждый поток работает через собственное соединение, база открывается в режиме WAL,
+    что позволяет читать параллельно с записью. Изменение сессии (update) выполняется в одной транзакции
+    BEGIN IMMEDIATE, поэтому изменения одной сессии разными процессами не перезаписывают друг друга.
+
+    :param db_path: путь к файлу базы.
+    :param data_cls: класс объекта сессии (должен иметь методы dumps() и loads()).
+    :param timeout: время ожидания снятия блокировки базы другим процессом, в секундах.
+    """
+
+    def __init__(self, db_path: str, data_cls, timeout: float = 5.0):
+        self.db_path = db_path
+        self.data_cls = data_cls
+        self.timeout = timeout
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS sessions (user_id INTEGER PRIMARY KEY, data TEXT NOT NULL)')
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, user_id: int) -> Optional[Any]:
+        row = self._connection().execute('SELECT data FROM sessions WHERE user_id = ?', (user_id,)).fetchone()
+        if row is None:
+            return None
+        try:
+            return self.data_cls.loads(row[0])
+        except (ValueError, TypeError, IndexError):
+            logger.exception(f'Не удалось восстановить сессию пользователя user_id={user_id}, сессия удалена')
+            self.delete(user_id)
+            return None
+
+    def save(self, user_id: int, user_data: Any) -> None:
+        self._connection().execute('INSERT OR REPLACE INTO sessions (user_id, data) VALUES (?, ?)',
+                                   (user_id, user_data.dumps()))
+
+    def delete(self, user_id: int) -> None:
+        self._connection().execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+
+    def update(self, user_id: int, func: Callable[[Any], None]) -> Optional[Any]:
+        conn = self._connection()
+        #  блокировка записи берется до чтения: другой процесс не изменит сессию между чтением и записью
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT data FROM sessions WHERE user_id = ?', (user_id,)).fetchone()
+            user_data = None
+            if row is not None:
+                try:
+                    user_data = self.data_cls.loads(row[0])
+                except (ValueError, TypeError, IndexError):
+                    logger.exception(f'Не удалось восстановить сессию пользователя user_id={user_id}, сессия удалена')
+                    conn.execute('DELETE FROM sessions WHERE user_id = ?', (user_id,))
+            if user_data is not None:
+                func(user_data)
+                conn.execute('UPDATE sessions SET data = ? WHERE user_id = ?', (user_data.dumps(), user_id))
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return user_data
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def __contains__(self, user_id: int) -> bool:
+        row = self._connection().execute('SELECT 1 FROM sessions WHERE user_id = ?', (user_id,)).fetchone()
+        return row is not None
+
+    def close(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
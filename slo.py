@@ -0,0 +1,161 @@
+"""
+Отслеживание задержек ответа пользователю (SLO).
+
+Замеряются две задержки (по командам и состояниям FSM):
+- step - от нажатия кнопки/ввода сообщения до отправки следующего вопроса (шаг команды);
+- exec - от подтверждения введенных данных ("Да, все верно") до отправки последнего отеля (выполнение команды).
+Задержка считается от постановки обновления в очередь диспетчера (с учетом ожидания в очереди) до окончания
+обработчика. По каждой паре (команда, состояние) в памяти хранятся замеры за последние window секунд, по которым
+считаются перцентили p50/p95/p99 (команда /slo). Замеры также пишутся в метрику bot_user_latency_seconds, а ответы
+дольше целевого времени - в лог (WARNING) и метрику bot_slo_breaches_total.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from metrics import SLO_BREACHES, USER_LATENCY_SECONDS
+
+
+logger = logging.getLogger('main.slo')
+
+STEP = 'step'
+EXEC = 'exec'
+
+#  замер текущего обработчика: вид, команда, состояние (обработчик подтверждения данных меняет вид на EXEC)
+_sample: ContextVar[Optional[dict]] = ContextVar('slo_sample', default=None)
+
+
+class RollingPercentiles:
+    """
+    Замеры за последние window секунд (не более max_samples) и их перцентили.
+
+    :param window: длительность окна (с).
+    :param max_samples: максимальное кол-во хранимых замеров.
+    """
+
+    def __init__(self, window: float = 3600, max_samples: int = 10000):
+        self.window = window
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+
+    def add(self, value: float, now: float = None) -> None:
+        self._samples.append((time.monotonic() if now is None else now, value))
+
+    def values(self, now: float = None) -> List[float]:
+        """ Отсортированные значения замеров окна (устаревшие замеры удаляются). """
+
+        border = (time.monotonic() if now is None else now) - self.window
+        while self._samples and self._samples[0][0] < border:
+            self._samples.popleft()
+        return sorted(value for _, value in self._samples)
+
+    @staticmethod
+    def percentile(values: List[float], percent: float) -> float:
+        """ Перцентиль (nearest-rank) отсортированного списка значений. """
+
+        if not values:
+            return 0.0
+        rank = max(1, -(-len(values) * percent // 100))
+        return values[int(rank) - 1]
+
+
+class SloTracker:
+    """
+    Замеры задержек ответа пользователю и проверка целевого времени.
+
+    :param step_target: целевое время шага команды (с).
+    :param exec_target: целевое время выполнения команды (с).
+    :param window: длительность окна перцентилей (с).
+    """
+
+    def __init__(self, step_target: float = 2.0, exec_target: float = 30.0, window: float = 3600):
+        self.targets = {STEP: step_target, EXEC: exec_target}
+        self.window = window
+        self._lock = threading.Lock()
+        self._windows: Dict[Tuple[str, str, str], RollingPercentiles] = {}
+
+    def configure(self, step_target: float, exec_target: float, window: float) -> None:
+        self.targets = {STEP: step_target, EXEC: exec_target}
+        self.window = window
+        with self._lock:
+            self._windows.clear()
+
+    def observe(self, kind: str, command: str, state: str, seconds: float) -> None:
+        """ Запись замера задержки (state - имя состояния FSM, для EXEC - "-"). """
+
+        USER_LATENCY_SECONDS.observe(seconds, kind, command, state)
+        with self._lock:
+            window = self._windows.get((kind, command, state))
+            if window is None:
+                window = self._windows[(kind, command, state)] = RollingPercentiles(self.window)
+            window.add(seconds)
+        target = self.targets[kind]
+        if seconds > target:
+            SLO_BREACHES.inc(kind, command)
+            logger.warning(f'Нарушение SLO ({kind}): {command} {state} - {seconds:.2f} с (цель {target:g} с)')
+
+    @contextmanager
+    def measure(self, command: Optional[str], state: str, started: float = None) -> Iterator[dict]:
+        """
+        Замер задержки обработчика обновления (по умолчанию - шаг команды).
+
+        :param command: команда пользователя (None - замер не записывается).
+        :param state: имя состояния FSM, на вопрос которого ответил пользователь.
+        :param started: время получения обновления (time.perf_counter), по умолчанию - начало блока.
+        :return: словарь замера (команду и вид замера уточняют start_command и mark_exec).
+        """
+
+        sample = {'kind': STEP, 'command': command, 'state': state}
+        token = _sample.set(sample)
+        started = time.perf_counter() if started is None else started
+        try:
+            yield sample
+        finally:
+            _sample.reset(token)
+            if sample['command']:
+                self.observe(sample['kind'], sample['command'], '-' if sample['kind'] == EXEC else sample['state'],
+                             time.perf_counter() - started)
+
+    @staticmethod
+    def start_command(command: str, state: str) -> None:
+        """ Отметка, что текущий обработчик запустил команду (замер относится к первому шагу новой команды). """
+
+        sample = _sample.get()
+        if sample is not None:
+            sample['command'], sample['state'] = command, state
+
+    @staticmethod
+    def mark_exec() -> None:
+        """ Отметка, что текущий обработчик выполняет команду (замер относится к выполнению, а не к шагу). """
+
+        sample = _sample.get()
+        if sample is not None:
+            sample['kind'] = EXEC
+
+    def report(self) -> str:
+        """ Текущее распределение задержек (перцентили за окно) в виде таблицы. """
+
+        with self._lock:
+            rows = [(key, window.values()) for key, window in sorted(self._windows.items())]
+        lines = [f'SLO: шаг <= {self.targets[STEP]:g} с, выполнение <= {self.targets[EXEC]:g} с, '
+                 f'окно {self.window:g} с',
+                 f'{"":<5}{"команда":<11}{"состояние":<18}{"n":>6}{"p50":>7}{"p95":>7}{"p99":>7}{">SLO":>6}']
+        for (kind, command, state), values in rows:
+            if not values:
+                continue
+            breaches = sum(1 for value in values if value > self.targets[kind])
+            lines.append(f'{kind:<5}{command:<11}{state:<18}{len(values):>6}'
+                         + ''.join(f'{RollingPercentiles.percentile(values, percent):>7.2f}'
+                                   for percent in (50, 95, 99))
+                         + f'{breaches:>6}')
+        if len(lines) == 2:
+            lines.append('Нет замеров')
+        return '\n'.join(lines)
+
+
+#  замеры задержек бота (целевые значения задаются в main.py)
+slo = SloTracker()
@@ -0,0 +1,137 @@
+"""
+Снимок сессий пользователей и кэшей бота для быстрого перезапуска.
+
+При остановке бота незавершенные диалоги (сессии в памяти процесса) и непросроченные результаты проверки фото
+отелей записываются в файл снимка, при запуске - восстанавливаются, и пользователи продолжают команду с того же
+шага. Кэш file_id фото хранится в собственном файле (photo_cache.py), сессии в sqlite сохраняются в базе.
+
+Формат файла: первая строка - json заголовок (версия, время создания, общие строки, результаты проверки фото),
+далее по строке на сессию: "id пользователя<TAB>ссылки<TAB>json список атрибутов сессии (UserData.to_list)".
+Длинные строки атрибутов (клавиатуры календаря, одинаковые у многих пользователей) записываются один раз в таблицу
+общих строк заголовка, а в сессии вместо них - ссылка "позиция=номер строки".
+Сессии при восстановлении не разбираются: строка сессии преобразуется в объект при первом обращении
+к сессии (MemorySessionStorage.restore), поэтому запуск не зависит от кол-ва сохраненных сессий.
+"""
+
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from photo_checker import PhotoUrlChecker
+from session_storage import MemorySessionStorage, SessionStorage
+
+
+logger = logging.getLogger('main.snapshot')
+
+SNAPSHOT_VERSION = 1
+#  минимальная длина строки атрибута сессии, записываемой в таблицу общих строк
+MIN_SHARED_LEN = 256
+
+_encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), check_circular=False)
+
+
+class BotSnapshot:
+    """
+    Запись и восстановление снимка сессий и кэшей бота.
+    Сессии, восстановленные объектом и еще не запрошенные, ссылаются на его таблицу общих строк,
+    поэтому следующий снимок записывается тем же объектом.
+
+    :param path: путь к файлу снимка.
+    :param data_cls: класс объекта сессии (методы to_list() и from_list()).
+    """
+
+    def __init__(self, path: str, data_cls):
+        self.path = path
+        self.data_cls = data_cls
+        #  общие строки восстановленного снимка (для сессий, к которым еще не было обращений)
+        self._shared: List[str] = []
+
+    def _encode(self, values: list, shared: Dict[str, int]) -> str:
+        refs = ''
+        for pos, value in enumerate(values):
+            if type(value) is str and len(value) >= MIN_SHARED_LEN:
+                refs += f'{"," if refs else ""}{pos}={shared.setdefault(value, len(shared))}'
+                values[pos] = None
+        return refs + '\t' + _encoder.encode(values)
+
+    def _reencode(self, raw: str, shared: Dict[str, int]) -> str:
+        """ Перенос строки сессии восстановленного снимка в новый снимок (без разбора json). """
+
+        refs, values = raw.split('\t', 1)
+        if refs:
+            refs = ','.join(f'{pos}={shared.setdefault(self._shared[int(ind)], len(shared))}'
+                            for pos, ind in (ref.split('=') for ref in refs.split(',')))
+        return refs + '\t' + values
+
+    def load_session(self, raw: str) -> Any:
+        """ Преобразование строки сессии снимка в объект сессии. """
+
+        refs, values = raw.split('\t', 1)
+        values = json.loads(values)
+        if refs:
+            for ref in refs.split(','):
+                pos, ind = ref.split('=')
+                values[int(pos)] = self._shared[int(ind)]
+        return self.data_cls.from_list(values)
+
+    def save(self, storage: SessionStorage, photo_checker: Optional[PhotoUrlChecker] = None) -> None:
+        """ Запись снимка (через временный файл, чтобы не повредить предыдущий снимок при сбое записи). """
+
+        time_start = time.perf_counter()
+        sessions, pending = storage.export() if isinstance(storage, MemorySessionStorage) else ({}, {})
+        shared: Dict[str, int] = {}
+        lines = [f'{user_id}\t{self._encode(user_data.to_list(), shared)}' for user_id, user_data in sessions.items()]
+        lines += [f'{user_id}\t{self._reencode(raw, shared)}' for user_id, raw in pending.items()]
+        health = photo_checker.export_health() if photo_checker is not None else []
+        header = {'version': SNAPSHOT_VERSION, 'created': int(time.time()), 'shared': list(shared),
+                  'photo_health': health}
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf8') as f_snapshot:
+                f_snapshot.write(json.dumps(header, ensure_ascii=False, separators=(',', ':')) + '\n')
+                f_snapshot.write('\n'.join(lines))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logger.exception(f'Не удалось записать снимок в файл {self.path}')
+            return
+        logger.info(f'Снимок записан: сессий {len(lines)}, общих строк {len(shared)}, проверок фото {len(health)}, '
+                    f'{time.perf_counter() - time_start:.3f} с')
+
+    def restore(self, storage: SessionStorage, photo_checker: Optional[PhotoUrlChecker] = None) -> None:
+        """
+        Восстановление снимка. Файл снимка после чтения удаляется, чтобы после аварийной остановки бота
+        не восстановить сессии повторно (в том числе уже завершенные команды).
+        """
+
+        if not os.path.exists(self.path):
+            return
+        time_start = time.perf_counter()
+        try:
+            with open(self.path, 'r', encoding='utf8') as f_snapshot:
+                header = json.loads(f_snapshot.readline())
+                if header.get('version') != SNAPSHOT_VERSION:
+                    raise ValueError(f'неизвестная версия снимка {header.get("version")}')
+                shared, photo_health = list(header['shared']), list(header['photo_health'])
+                created = time.ctime(header['created'])
+                pending = {}
+                for line in f_snapshot.read().split('\n'):
+                    if line:
+                        user_id, raw = line.split('\t', 1)
+                        pending[int(user_id)] = raw
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            logger.exception(f'Не удалось прочитать снимок из файла {self.path}')
+            return
+        finally:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+        self._shared = shared
+        if isinstance(storage, MemorySessionStorage):
+            storage.restore(pending, self.load_session)
+        if photo_checker is not None:
+            photo_checker.restore_health(photo_health)
+        logger.info(f'Снимок восстановлен: сессий {len(pending)}, проверок фото {len(photo_health)}, '
+                    f'{time.perf_counter() - time_start:.3f} с (создан {created})')
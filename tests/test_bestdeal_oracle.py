@@ -0,0 +1,39 @@
+import unittest
+
+from bestdeal_oracle import HotelsPages, ReferenceCmdSortByPriceAndDist, run_differential, run_engine
+from executor_commands import CmdSortByPriceAndDist, HotelsParsed
+
+
+class CmdWithoutBackFill(CmdSortByPriceAndDist):
+    """ Вариант алгоритма с ошибкой: при выходе за правую границу результат не дополняется отелями пред. страницы. """
+
+    def _sort_and_parsed_hotels(self, lst_hotels: list, keys_sort: tuple, warning: str) -> HotelsParsed:
+        if 'Максимальное расстояние' in warning:
+            lst_hotels = [hotel for hotel in lst_hotels if hotel['name'].startswith(f'hotel {self.page_number}-')]
+        return super()._sort_and_parsed_hotels(lst_hotels, keys_sort, warning)
+
+
+class TestBestDealOracle(unittest.TestCase):
+    """ Разностная проверка исполнителя команды "bestdeal" с эталоном на случайных наборах страниц. """
+
+    def test_current_engine_matches_reference(self):
+        report = run_differential(CmdSortByPriceAndDist, cases=3000, seed=1)
+        self.assertEqual(report.mismatches, [])
+        self.assertEqual(report.calls_saved, 0)
+        #  наборы данных покрывают все ветки алгоритма
+        for kind in ('in_range', 'left', 'right', 'back_fill', 'no_distance', 'api_error', 'error', 'empty'):
+            self.assertGreater(report.kinds[kind], 0, kind)
+
+    def test_mismatch_detected(self):
+        report = run_differential(CmdWithoutBackFill, cases=3000, seed=1)
+        self.assertEqual(len(report.mismatches), report.kinds['back_fill'])
+
+    def test_no_distance_fallback(self):
+        pages = HotelsPages([[{'name': 'hotel 1-0', 'price_exact': 5000.0, 'to_center_exact': None},
+                              {'name': 'hotel 1-1', 'price_exact': 3000.0, 'to_center_exact': None}]])
+        (hotels, err_msg, warning), calls = run_engine(ReferenceCmdSortByPriceAndDist, pages,
+                                                       {'size_result': 3, 'range_dist': (1, 2)})
+        self.assertEqual([hotel['name'] for hotel in hotels], ['hotel 1-1', 'hotel 1-0'])
+        self.assertIn('Показаны отели по росту цены', warning)
+        self.assertIn('Количество найденных предложений: 2', warning)
+        self.assertEqual(calls, 2)
@@ -0,0 +1,138 @@
+import datetime
+import json
+import unittest
+from types import SimpleNamespace
+
+import bot_calendar
+from bot_calendar import Calendar, RUSSIAN_LANGUAGE, calendar_codec
+
+
+def get_buttons_data(keyboard) -> list:
+    """ Декодированные данные всех кнопок клавиатуры. """
+
+    rows = json.loads(keyboard.to_json())['inline_keyboard']
+    codec = calendar_codec('calendar')
+    return [codec.decode(btn['callback_data']) for row in rows for btn in row]
+
+
+def get_day_buttons(keyboard) -> dict:
+    """ Текст кнопок дней месяца: (год, месяц, день) из данных кнопки -> текст. """
+
+    rows = json.loads(keyboard.to_json())['inline_keyboard']
+    codec = calendar_codec('calendar')
+    return {tuple(codec.decode(btn['callback_data'])[1:4]): btn['text']
+            for row in rows[2:-1] for btn in row if btn['text'].strip()}
+
+
+class TestCalendarKeyboard(unittest.TestCase):
+    """ Клавиатура месяца из кэшированного шаблона с подстановкой меняющихся дней. """
+
+    def setUp(self):
+        self.calendar = Calendar(language=RUSSIAN_LANGUAGE)
+
+    def test_overlays(self):
+        days = get_day_buttons(self.calendar.create_calendar('calendar', 2030, 5, selection=datetime.date(2030, 5, 12),
+                                                             check_in=datetime.date(2030, 5, 10)))
+        self.assertEqual(len(days), 31)
+        self.assertEqual(days[(2030, 5, 10)], '⤴')
+        self.assertEqual(days[(2030, 5, 12)], '⤵')
+        self.assertEqual(days[(2030, 5, 11)], '11')
+        #  шаблон месяца не изменяется подстановкой
+        days = get_day_buttons(Calendar(language=RUSSIAN_LANGUAGE).create_calendar('calendar', 2030, 5))
+        self.assertEqual(days[(2030, 5, 10)], '10')
+
+    def test_today(self):
+        today = datetime.datetime.utcnow()
+        days = get_day_buttons(self.calendar.create_calendar('calendar', today.year, today.month))
+        self.assertEqual(days[(today.year, today.month, today.day)], f'<{today.day}>')
+
+    def test_template_reused(self):
+        bot_calendar._get_month_template.cache_clear()
+        self.calendar.create_calendar('calendar', 2031, 1)
+        self.calendar.create_calendar('calendar', 2031, 1, selection=datetime.date(2031, 1, 15))
+        info = bot_calendar._get_month_template.cache_info()
+        self.assertEqual((info.misses, info.hits), (1, 1))
+
+    def test_state_in_buttons_data(self):
+        selection, check_in = datetime.date(2030, 6, 2), datetime.date(2030, 5, 30)
+        for keyboard in (self.calendar.create_calendar('calendar', 2030, 6, selection, check_in),
+                         self.calendar.create_months_calendar('calendar', 2030, selection, check_in)):
+            buttons = get_buttons_data(keyboard)
+            self.assertTrue(buttons)
+            self.assertEqual({(data.selection, data.check_in) for data in buttons}, {(selection, check_in)})
+        #  без состояния данные кнопок те же, что в шаблоне
+        buttons = get_buttons_data(self.calendar.create_calendar('calendar', 2030, 6))
+        self.assertEqual({(data.selection, data.check_in) for data in buttons}, {(None, None)})
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    def answer_callback_query(self, callback_query_id, text=None):
+        self.calls.append(('answer', text))
+
+    def edit_message_text(self, text, chat_id, message_id, reply_markup=None, parse_mode=None):
+        self.calls.append(('edit', text, reply_markup))
+
+    def edit_message_reply_markup(self, chat_id=None, message_id=None, reply_markup=None):
+        self.calls.append(('edit_markup', reply_markup))
+
+
+def make_call(data: str, text: str = 'Дата въезда'):
+    chat = SimpleNamespace(id=1)
+    return SimpleNamespace(id=7, data=data, message=SimpleNamespace(chat=chat, message_id=5, text=text))
+
+
+class TestCalendarQueryHandler(unittest.TestCase):
+    """ Следующий вид календаря строится только по данным нажатой кнопки. """
+
+    def setUp(self):
+        self.calendar = Calendar(language=RUSSIAN_LANGUAGE)
+        self.codec = calendar_codec('calendar')
+        self.bot = FakeBot()
+
+    def handle(self, *values, text='Дата въезда'):
+        data = self.codec.encode(*values)
+        return self.calendar.calendar_query_handler(self.bot, make_call(data, text), 'calendar',
+                                                    *self.codec.decode(data))
+
+    def test_day_then_ok(self):
+        day = datetime.date.today() + datetime.timedelta(days=40)
+        self.assertIsNone(self.handle('DAY', day.year, day.month, day.day, None, None))
+        _, text, keyboard = self.bot.calls[-1]
+        self.assertIn(f'{day:%d.%m.%Y}', text)
+        buttons = get_buttons_data(keyboard)
+        self.assertEqual({data.selection for data in buttons}, {day})
+        ok = next(data for data in buttons if data.action == 'OK')
+        self.assertEqual(self.handle(*ok), day)
+
+    def test_navigation_keeps_state(self):
+        selection, check_in = datetime.date(2030, 6, 2), datetime.date(2030, 5, 30)
+        for action in ('NEXT-MONTH', 'MONTHS', 'MONTH'):
+            self.handle(action, 2030, 7 if action == 'MONTH' else 6, None, selection, check_in)
+        #  при перелистывании изменяется только клавиатура
+        self.assertEqual([call[0] for call in self.bot.calls], ['edit_markup'] * 3)
+        _, keyboard = self.bot.calls[0]
+        buttons = get_buttons_data(keyboard)
+        self.assertEqual({(data.year, data.month) for data in buttons}, {(2030, 7)})
+        self.assertEqual({(data.selection, data.check_in) for data in buttons}, {(selection, check_in)})
+
+    def test_message_text(self):
+        today = datetime.date.today()
+        first, second = today + datetime.timedelta(days=3), today + datetime.timedelta(days=5)
+        self.handle('DAY', first.year, first.month, first.day, None, None, text='Дата въезда ⤴ ?')
+        self.assertEqual(self.bot.calls[-1][1], f'Дата въезда ⤴ ? <b>Выбранная дата: {first:%d.%m.%Y}</b>')
+        #  телеграм возвращает текст сообщения без разметки
+        self.handle('DAY', second.year, second.month, second.day, first, None,
+                    text=f'Дата въезда ⤴ ? Выбранная дата: {first:%d.%m.%Y}')
+        self.assertEqual(self.bot.calls[-1][1], f'Дата въезда ⤴ ? <b>Выбранная дата: {second:%d.%m.%Y}</b>')
+
+    def test_check_out_not_after_check_in(self):
+        check_in = datetime.date(2030, 5, 30)
+        self.assertIsNone(self.handle('DAY', 2030, 5, 30, None, check_in))
+        self.assertEqual(self.bot.calls, [('answer', 'Дата выезда должна быть позже даты въезда!')])
+
+    def test_ok_without_selection(self):
+        self.assertIsNone(self.handle('OK', 2030, 5, None, None, datetime.date(2030, 5, 30)))
+        self.assertEqual(self.bot.calls, [('answer', 'Сначала нужно указать дату!')])
@@ -0,0 +1,42 @@
+import datetime
+import unittest
+
+from callback_codec import CallbackCodec, to_base36
+
+
+class TestCallbackCodec(unittest.TestCase):
+    """ Кодирование и декодирование данных inline кнопок по схеме. """
+
+    def setUp(self):
+        self.codec = CallbackCodec('cal', action=('DAY', 'OK'), year=int, month=int, day=int, note=str)
+
+    def test_round_trip(self):
+        data = self.codec.encode('DAY', 2030, 12, 31, 'x')
+        self.assertEqual(data, 'cal:0:1ke:c:v:x')
+        self.assertEqual(self.codec.decode(data), ('DAY', 2030, 12, 31, 'x'))
+        self.assertEqual(self.codec.decode(data).year, 2030)
+        self.assertEqual(self.codec.decode(self.codec.encode('OK', 2030, 1, None, None)), ('OK', 2030, 1, None, None))
+
+    def test_date(self):
+        codec = CallbackCodec('d', check_in=datetime.date)
+        self.assertEqual(codec.encode(datetime.date(2020, 1, 2)), 'd:1')
+        for date in (datetime.date(2020, 1, 1), datetime.date(2031, 3, 1), datetime.date(2090, 12, 31), None):
+            self.assertEqual(codec.decode(codec.encode(date)).check_in, date)
+        with self.assertRaises(ValueError):
+            codec.encode(datetime.date(2019, 12, 31))
+
+    def test_base36(self):
+        self.assertEqual([to_base36(number) for number in (0, 35, 36, 2030)], ['0', 'z', '10', '1ke'])
+        for number in (0, 1, 35, 36, 1295, 1296, 10 ** 9):
+            self.assertEqual(int(to_base36(number), 36), number)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            self.codec.encode('MONTH', 2030, 1, 1, None)  # значения нет в наборе
+        with self.assertRaises(ValueError):
+            self.codec.encode('DAY', 2030, 1, 1, 'a:b')
+        with self.assertRaises(ValueError):
+            self.codec.encode('DAY', 2030, 1, 1, 'x' * 64)
+        for data in ('other:0:1ke:c:v:x', 'cal:0:1ke:c', 'cal:9:1ke:c:v:x', 'cal:0:!:c:v:x', None):
+            with self.assertRaises(ValueError):
+                self.codec.decode(data)
@@ -0,0 +1,45 @@
+import threading
+import time
+import unittest
+
+from chat_actions import TypingIndicator
+
+
+class FakeBot:
+    def __init__(self):
+        self.actions = []
+        self.lock = threading.Lock()
+
+    def send_chat_action(self, chat_id, action):
+        with self.lock:
+            self.actions.append((chat_id, action, time.monotonic()))
+
+
+class TestTypingIndicator(unittest.TestCase):
+    """ Проверка периодической отправки индикатора «набора текста» фоновым потоком. """
+
+    def setUp(self):
+        self.bot = FakeBot()
+        self.typing = TypingIndicator(self.bot, interval=0.1)
+
+    def tearDown(self):
+        self.typing.shutdown()
+
+    def test_heartbeat_while_active(self):
+        with self.typing.show(1):
+            with self.typing.show(1):  # вложенная операция не отправляет индикатор повторно
+                time.sleep(0.05)
+            time.sleep(0.2)
+        count_actions = len(self.bot.actions)
+        time.sleep(0.25)
+        self.assertIn(count_actions, (3, 4))
+        self.assertEqual(len(self.bot.actions), count_actions)  # после завершения операции отправка прекращается
+        times = [sent_time for _, _, sent_time in self.bot.actions]
+        self.assertTrue(all(t2 - t1 >= 0.09 for t1, t2 in zip(times, times[1:])))
+        self.assertEqual(self.typing.active_chats(), 0)
+
+    def test_several_chats(self):
+        with self.typing.show(1), self.typing.show(2):
+            time.sleep(0.05)
+        self.assertEqual(sorted(chat_id for chat_id, _, _ in self.bot.actions), [1, 2])
+        self.assertEqual({action for _, action, _ in self.bot.actions}, {'typing'})
@@ -0,0 +1,113 @@
+import datetime
+import unittest
+from unittest import mock
+
+from telebot import apihelper
+from telebot.types import Update
+
+import fsm
+from BotController import BotController, calendar_callback
+from fake_telebot import DIALOGS, FakeTeleBot, ScriptedUser
+from MessageHandler import MessageHandler
+
+
+class TestDialogs(unittest.TestCase):
+    """ Сценарии диалогов команд через обработчики бота (тестовый режим, бот без сети). """
+
+    def setUp(self):
+        #  флаг middleware бота включается только на время теста
+        middleware = mock.patch.object(apihelper, 'ENABLE_MIDDLEWARE', True)
+        middleware.start()
+        self.addCleanup(middleware.stop)
+        self.bot = FakeTeleBot(keep_calls=True)
+        self.controller = BotController(self.bot, True)
+        MessageHandler(self.bot, self.controller, True).start()
+
+    def tearDown(self):
+        self.controller.typing.shutdown()
+
+    def test_dialogs_interleaved(self):
+        users = [ScriptedUser(self.bot, user_id, script)
+                 for user_id, script in enumerate(list(DIALOGS.values()) * 2, start=1)]
+        while users:
+            for user in users:
+                self.bot.process_new_updates([user.next_update()])
+            users = [user for user in users if not user.finished]
+
+        self.assertEqual(len(self.controller.users), 0)
+        texts = [text or '' for _, _, text in self.bot.calls]
+        self.assertFalse([text for text in texts if 'Неизвестная команда' in text or 'Некорректный' in text])
+        results = [chat_id for method, chat_id, text in self.bot.calls
+                   if method == 'sendMessage' and (text or '').startswith('<b>Получен результат команды')]
+        self.assertEqual(sorted(results), list(range(1, 7)))
+
+        next_month = (datetime.date.today().replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+        forms = [text for method, chat_id, text in self.bot.calls
+                 if method == 'sendMessage' and chat_id in (1, 4) and text.startswith('<u>Проверьте')]
+        for form in forms:
+            self.assertIn(f'<b>Дата въезда:</b> {next_month.replace(day=5)}', form)
+            self.assertIn(f'<b>Дата выезда:</b> {next_month.replace(day=9)}', form)
+        self.assertEqual(len(forms), 2)
+
+    def test_back_steps(self):
+        script = (('text', '/bestdeal'), ('text', 'москва'), ('text', 'Москва, Россия'), ('text', '1000-3000'),
+                  ('text', 'Назад'), ('text', '1000-3000'), ('text', '0.9-2.5'), ('text', '5'),
+                  ('press', 'Назад'), ('text', '3'), ('press', 'Оставить по умолчанию'), ('press', 'Да, все верно'))
+        user = ScriptedUser(self.bot, 1, script)
+        states = []
+        while not user.finished:
+            self.bot.process_new_updates([user.next_update()])
+            states.append(self.controller.get_state_cmd(1))
+        self.assertEqual(states[3:6], [fsm.GET_RANGE_DIST, fsm.GET_RANGE_PRICE, fsm.GET_RANGE_DIST])
+        self.assertEqual(states[7:10], [fsm.IS_SET_DEF_VALUE, fsm.GET_SIZE_OUT, fsm.IS_SET_DEF_VALUE])
+        self.assertEqual(len(self.controller.users), 0)
+        texts = [text or '' for _, _, text in self.bot.calls]
+        self.assertFalse([text for text in texts if 'Неизвестная команда' in text or 'Некорректный' in text])
+        forms = [text for text in texts if text.startswith('<u>Проверьте')]
+        self.assertEqual(len(forms), 1)
+        self.assertIn('<b>Количество отелей в выводе:</b> 3', forms[0])
+        self.assertTrue(any(text.startswith('<b>Получен результат команды') for text in texts))
+
+        #  с первого шага команды возврат не выполняется
+        user = ScriptedUser(self.bot, 2, (('text', '/lowprice'), ('text', 'Назад')))
+        self.bot.process_new_updates([user.next_update(), user.next_update()])
+        self.assertEqual(self.controller.get_state_cmd(2), fsm.GET_LOCATION)
+        self.assertEqual(self.bot.calls[-1], ('sendMessage', 2, 'Это первый шаг команды'))
+
+    def test_stale_calendar_presses(self):
+        script = DIALOGS['/lowprice'][:7]
+        user = ScriptedUser(self.bot, 1, script + (('press', '5'), ('press', 'OK'), ('press', '>'), ('press', '20'),
+                                                   ('press', 'OK')))
+        for _ in range(len(script) + 1):
+            self.bot.process_new_updates([user.next_update()])
+        #  клавиатура календаря въезда с выбранным 5-м числом (до листания на другой месяц и выбора 20-го)
+        stale_ok = user.press_data('OK')
+        self.bot.process_new_updates([user.next_update()])
+        self.assertEqual(self.controller.get_state_cmd(1), fsm.GET_CHECKOUT_DATE)
+        check_in = self.controller.users.get(1).api_params.checkIn
+
+        #  повторное нажатие "OK" на календаре въезда и нажатие на устаревшей клавиатуре въезда
+        self.bot.process_new_updates([Update.de_json(dict(stale_ok, update_id=10 ** 6))])
+        self.bot.process_new_updates([Update.de_json(dict(stale_ok, update_id=10 ** 6 + 1))])
+        user_data = self.controller.users.get(1)
+        self.assertEqual(user_data.state_cmd, fsm.GET_CHECKOUT_DATE)
+        self.assertFalse(hasattr(user_data.api_params, 'checkOut'))
+        self.assertEqual(user_data.api_params.checkIn, check_in)
+
+        #  данные кнопки текущего календаря выезда без даты въезда или с датой выезда не позже въезда
+        day = datetime.date.fromisoformat(check_in)
+        for data in (calendar_callback.encode('OK', day.year, day.month, None, day + datetime.timedelta(days=1), None),
+                     calendar_callback.encode('OK', day.year, day.month, None, day, day)):
+            update = user.press_data('OK')
+            update['callback_query']['data'] = data
+            self.bot.process_new_updates([Update.de_json(update)])
+        self.assertEqual(self.controller.get_state_cmd(1), fsm.GET_CHECKOUT_DATE)
+        self.assertFalse(hasattr(self.controller.users.get(1).api_params, 'checkOut'))
+
+        #  выбор даты выезда на текущем календаре принимается
+        while not user.finished:
+            self.bot.process_new_updates([user.next_update()])
+        user_data = self.controller.users.get(1)
+        self.assertEqual(user_data.state_cmd, fsm.END)
+        self.assertGreater(user_data.api_params.checkOut, user_data.api_params.checkIn)
+
@@ -0,0 +1,111 @@
+import threading
+import time
+import unittest
+from unittest import mock
+from collections import defaultdict
+
+from telebot import TeleBot, apihelper
+from telebot.types import Update
+
+from dispatcher import ChatDispatcher
+from fake_telebot import message_update_data
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> Update:
+    return Update.de_json(message_update_data(update_id, chat_id, text))
+
+
+class TestChatDispatcher(unittest.TestCase):
+    """ Стресс-тест диспетчера: порядок и последовательность обработки задач одного чата. """
+
+    def setUp(self):
+        self.dispatcher = ChatDispatcher(num_workers=32, max_batch=4)
+
+    def tearDown(self):
+        self.dispatcher.shutdown()
+
+    def wait_empty(self, timeout: float = 30):
+        deadline = time.monotonic() + timeout
+        while self.dispatcher.pending() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.dispatcher.pending(), 0, 'Задачи не обработаны за отведенное время')
+
+    def test_same_chat_in_order_and_one_at_a_time(self):
+        """ Несколько потоков одновременно отправляют задачи для небольшого числа чатов. """
+
+        count_producers = 16
+        count_tasks = 300
+        chats = (1, 2, 3)
+        lock = threading.Lock()
+        active = defaultdict(int)
+        overlaps = []
+        processed = defaultdict(list)
+
+        def task(chat_id: int, producer: int, number: int):
+            with lock:
+                active[chat_id] += 1
+                if active[chat_id] > 1:
+                    overlaps.append(chat_id)
+            time.sleep(0)  # переключение потоков внутри задачи
+            processed[(chat_id, producer)].append(number)
+            with lock:
+                active[chat_id] -= 1
+
+        def producer(producer_id: int):
+            for number in range(count_tasks):
+                chat_id = chats[(producer_id + number) % len(chats)]
+                self.dispatcher.submit(chat_id, task, chat_id, producer_id, number)
+
+        threads = [threading.Thread(target=producer, args=(i,)) for i in range(count_producers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.wait_empty()
+
+        self.assertEqual(overlaps, [], 'Задачи одного чата выполнялись одновременно')
+        self.assertEqual(sum(map(len, processed.values())), count_producers * count_tasks)
+        for numbers in processed.values():
+            self.assertEqual(numbers, sorted(numbers), 'Нарушен порядок обработки задач чата')
+
+    def test_different_chats_in_parallel(self):
+        """ Задачи двух чатов ожидают друг друга - тест пройдет, только если они выполняются параллельно. """
+
+        barrier = threading.Barrier(2, timeout=5)
+        results = []
+
+        def task(chat_id: int):
+            barrier.wait()
+            results.append(chat_id)
+
+        self.dispatcher.submit(1, task, 1)
+        self.dispatcher.submit(2, task, 2)
+        self.wait_empty()
+        self.assertEqual(sorted(results), [1, 2])
+
+    @mock.patch.object(apihelper, 'ENABLE_MIDDLEWARE', True)
+    def test_attach_to_bot(self):
+        """ Обновления бота обрабатываются обработчиками telebot в потоках диспетчера. """
+
+        bot = TeleBot('123:TOKEN', threaded=False)
+        received = defaultdict(list)
+
+        @bot.middleware_handler(update_types=['message'])
+        def middleware(bot_instance, msg):
+            received[msg.chat.id].append(('middleware', msg.text))
+
+        @bot.message_handler(content_types=['text'])
+        def handler(msg):
+            received[msg.chat.id].append(('handler', msg.text))
+
+        self.dispatcher.attach(bot)
+        updates = [make_update(update_id, chat_id=update_id % 5, text=str(update_id)) for update_id in range(1, 501)]
+        bot.process_new_updates(updates)
+        self.assertEqual(bot.last_update_id, 500)
+        self.wait_empty()
+
+        for chat_id, events in received.items():
+            texts = [int(text) for kind, text in events if kind == 'handler']
+            self.assertEqual(texts, sorted(texts))
+            self.assertEqual(events[::2], [('middleware', str(text)) for text in texts])
+        self.assertEqual(sum(map(len, received.values())), 1000)
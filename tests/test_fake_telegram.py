@@ -0,0 +1,91 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from telebot import TeleBot, apihelper
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+
+from BotController import BotController
+from dispatcher import ChatDispatcher
+from fake_telebot import DIALOGS, ScriptedUser
+from fake_telegram import FakeTelegramServer, ScriptedTraffic
+from MessageHandler import MessageHandler
+from polling import PollingConsumer
+
+
+PHOTO_URL = 'https://example.com/photo.jpg'
+
+
+class TestFakeTelegramServer(unittest.TestCase):
+    """ Локальный сервер api телеграма: ответы на запросы бота, getUpdates, ответы 429, сценарии пользователей. """
+
+    def setUp(self):
+        self.server = FakeTelegramServer(port=0, seed=1)
+        self.server.start()
+        self.api_url = apihelper.API_URL
+        apihelper.API_URL = self.server.api_url
+        self.bot = TeleBot('1:TOKEN', threaded=False)
+
+    def tearDown(self):
+        apihelper.API_URL = self.api_url
+        self.server.stop()
+
+    def test_messages_and_updates(self):
+        markup = InlineKeyboardMarkup()
+        markup.add(InlineKeyboardButton('OK', callback_data='ok'))
+        message = self.bot.send_message(7, '<b>Вопрос</b>', reply_markup=markup, parse_mode='HTML')
+        self.assertEqual(message.chat.id, 7)
+        self.assertEqual(self.server.screens[7][:2], (message.message_id, '<b>Вопрос</b>'))
+        self.assertTrue(self.bot.edit_message_reply_markup(7, message.message_id))
+        self.assertNotIn(7, self.server.screens)
+        self.bot.edit_message_text('Вопрос', 7, message.message_id, reply_markup=markup)
+        self.assertNotIn(7, self.server.screens)  # клавиатура сообщения уже удалена, экран не восстанавливается
+        messages = self.bot.send_media_group(7, [InputMediaPhoto(PHOTO_URL, caption='a'),
+                                              InputMediaPhoto(PHOTO_URL, caption='b')])
+        self.assertEqual([msg.caption for msg in messages], ['a', 'b'])
+        self.assertTrue(messages[0].photo)
+
+        user = ScriptedUser(self.server, 7, (('text', '/start'),))
+        update_id = self.server.push_update(user.next_update_data())
+        updates = self.bot.get_updates(offset=0, timeout=5, long_polling_timeout=1)
+        self.assertEqual([(update.update_id, update.message.text) for update in updates], [(update_id, '/start')])
+        self.assertEqual(self.bot.get_updates(offset=update_id + 1, timeout=5, long_polling_timeout=1), [])
+        self.assertEqual(self.server.pending(), 0)
+        self.assertTrue(self.bot.send_chat_action(7, 'typing'))
+        self.assertEqual(self.server.stats()['requests']['sendMediaGroup'], 1)
+
+    def test_throttling(self):
+        self.server.error_rate = 1.0
+        self.server.retry_after = 3
+        with self.assertRaises(apihelper.ApiTelegramException) as context:
+            self.bot.send_message(7, 'text')
+        self.assertEqual(context.exception.error_code, 429)
+        self.assertEqual(context.exception.result_json['parameters']['retry_after'], 3)
+        self.assertTrue(self.bot.send_chat_action(7, 'typing'))
+        self.assertEqual(self.server.throttled, 1)
+
+    @mock.patch.object(apihelper, 'ENABLE_MIDDLEWARE', True)
+    def test_scripted_dialogs(self):
+        bot = TeleBot('1:TOKEN', threaded=False)
+        controller = BotController(bot, True)
+        MessageHandler(bot, controller, True).start()
+        dispatcher = ChatDispatcher(num_workers=4)
+        consumer = PollingConsumer(bot, dispatcher, long_polling_timeout=1)
+        polling = threading.Thread(target=consumer.run, daemon=True)
+        polling.start()
+        traffic = ScriptedTraffic(self.server, len(DIALOGS), think=0)
+        traffic.start()
+        try:
+            deadline = time.monotonic() + 20
+            while traffic.dialogs < len(DIALOGS) and time.monotonic() < deadline:
+                time.sleep(0.05)
+        finally:
+            traffic.stop()
+            consumer.stop()
+            polling.join()
+            dispatcher.shutdown()
+            controller.typing.shutdown()
+        self.assertGreaterEqual(traffic.dialogs, len(DIALOGS))
+        self.assertEqual(traffic.timeouts, 0)
+        self.assertGreater(self.server.stats()['requests']['getUpdates'], 0)
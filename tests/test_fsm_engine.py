@@ -0,0 +1,45 @@
+import unittest
+
+import fsm
+from fsm_engine import CommandFlow, StateInfo, StateMachine
+
+
+class TestStateMachine(unittest.TestCase):
+    """ Проверка таблиц переходов и валидации описаний команд. """
+
+    def test_transitions_follow_steps(self):
+        for command in fsm.machine.commands:
+            steps = command.steps
+            for cur_state, next_state in zip(steps, steps[1:]):
+                self.assertEqual(fsm.machine.next_state(command.name, cur_state), next_state)
+                self.assertEqual(fsm.machine.prev_state(command.name, next_state), cur_state)
+            self.assertIsNone(fsm.machine.next_state(command.name, fsm.END))
+            self.assertIsNone(fsm.machine.prev_state(command.name, fsm.START))
+
+    def test_commands_metadata(self):
+        self.assertEqual([command.name for command in fsm.machine.commands], ['/lowprice', '/highprice', '/bestdeal'])
+        self.assertEqual(fsm.machine.command('/bestdeal').api_params, {'sortOrder': 'DISTANCE_FROM_LANDMARK'})
+        self.assertEqual(fsm.machine.title_form_confirm(fsm.GET_SIZE_OUT), 'Количество отелей в выводе')
+        self.assertIsNone(fsm.machine.title_form_confirm(fsm.GET_LOCATION))
+
+    def test_unreachable_state(self):
+        states_info = {1: StateInfo(question='1'), 2: StateInfo(question='2')}
+        with self.assertRaisesRegex(ValueError, 'недостижимы'):
+            StateMachine([CommandFlow('/cmd', '', (0, 1, 100))], states_info, start_state=0, end_state=100)
+
+    def test_invalid_steps(self):
+        states_info = {1: StateInfo(question='1')}
+        invalid_steps = ((1, 100),  # нет начального состояния
+                         (0, 1),  # нет конечного состояния
+                         (0, 1, 1, 100),  # повтор состояния
+                         (0, 1, 2, 100),  # неописанное состояние
+                         )
+        for steps in invalid_steps:
+            with self.subTest(steps=steps), self.assertRaises(ValueError):
+                StateMachine([CommandFlow('/cmd', '', steps)], states_info, start_state=0, end_state=100)
+
+    def test_duplicate_command(self):
+        states_info = {1: StateInfo(question='1')}
+        flows = [CommandFlow('/cmd', '', (0, 1, 100)), CommandFlow('/cmd', '', (0, 1, 100))]
+        with self.assertRaises(ValueError):
+            StateMachine(flows, states_info, start_state=0, end_state=100)
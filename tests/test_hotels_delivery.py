@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import patch
+
+from telebot.apihelper import ApiTelegramException
+from telebot.types import Message
+
+from BotController import PLACEHOLDER_PHOTO_PATH, BotController
+
+
+BAD_URL = 'https://exp.cdn-hotels.com/hotels/bad.jpg'
+#  file_id, которые телеграм не принимает (например, получены другим ботом)
+STALE_FILE_ID = 'id:stale'
+
+
+def make_api_error(method: str) -> ApiTelegramException:
+    return ApiTelegramException(method, None, {'error_code': 400,
+                                               'description': 'Bad Request: wrong file identifier/HTTP URL specified'})
+
+
+def make_photo_message(chat_id: int, photo) -> Message:
+    """ Сообщение с фото, file_id которого строится по url фото (или 'placeholder' для файла). """
+
+    file_id = photo if isinstance(photo, str) and photo.startswith('id:') else f'id:{get_photo_name(photo)}'
+    return Message.de_json({'message_id': 1, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'},
+                            'photo': [{'file_id': file_id, 'file_unique_id': file_id, 'width': 1, 'height': 1}]})
+
+
+def get_photo_name(photo) -> str:
+    return photo if isinstance(photo, str) else 'placeholder'
+
+
+class FakeBot:
+    """ Заглушка бота, записывающая вызовы api. Фото по BAD_URL телеграм "отклоняет". """
+
+    def __init__(self):
+        self.calls = []
+        self.chat_actions = []
+
+    def send_chat_action(self, chat_id, action):
+        self.chat_actions.append((chat_id, action))  # отправляется из фонового потока индикатора
+
+    def send_photo(self, chat_id, photo, caption=None, parse_mode=None):
+        self.calls.append(('send_photo', get_photo_name(photo)))
+        if photo == BAD_URL or str(photo).startswith(STALE_FILE_ID):
+            raise make_api_error('sendPhoto')
+        return make_photo_message(chat_id, photo)
+
+    def send_media_group(self, chat_id, media):
+        self.calls.append(('send_media_group', [get_photo_name(item.media) for item in media]))
+        if any(item.media == BAD_URL for item in media):
+            raise make_api_error('sendMediaGroup')
+        return [make_photo_message(chat_id, item.media) for item in media]
+
+
+def make_hotels(count: int, bad_indexes: tuple = ()) -> list:
+    return [{'name': f'Отель {ind}', 'address': 'Москва', 'to_center': '1 км', 'price': '1000 RUB',
+             'price_info': 'за ночь', 'url_photo': BAD_URL if ind in bad_indexes else f'https://photo/{ind}.jpg'}
+            for ind in range(count)]
+
+
+class TestHotelsDelivery(unittest.TestCase):
+    """ Проверка отправки результатов альбомами и по одному отелю. """
+
+    def setUp(self):
+        self.bot = FakeBot()
+        self.controller = BotController(self.bot, True)
+
+    @patch('config.HOTELS_DELIVERY_MODE', 'album')
+    def test_albums(self):
+        self.controller.send_lst_hotels(1, make_hotels(25))
+        self.assertEqual([(name, len(photos)) for name, photos in self.bot.calls],
+                         [('send_media_group', 10), ('send_media_group', 10), ('send_media_group', 5)])
+
+    @patch('config.HOTELS_DELIVERY_MODE', 'album')
+    def test_album_fallback_per_item(self):
+        self.controller.send_lst_hotels(1, make_hotels(11, bad_indexes=(3,)))
+        expected = [('send_media_group', [BAD_URL if ind == 3 else f'https://photo/{ind}.jpg' for ind in range(10)])]
+        for ind in range(10):
+            expected.append(('send_photo', BAD_URL if ind == 3 else f'https://photo/{ind}.jpg'))
+            if ind == 3:
+                expected.append(('send_photo', 'placeholder'))
+        expected.append(('send_photo', 'https://photo/10.jpg'))  # последний альбом из одного отеля
+        self.assertEqual(self.bot.calls, expected)
+
+    @patch('config.HOTELS_DELIVERY_MODE', 'single')
+    def test_single(self):
+        self.controller.send_lst_hotels(1, make_hotels(2, bad_indexes=(1,)))
+        self.assertEqual(self.bot.calls, [('send_photo', 'https://photo/0.jpg'), ('send_photo', BAD_URL),
+                                          ('send_photo', 'placeholder')])
+
+    @patch('config.HOTELS_DELIVERY_MODE', 'album')
+    def test_repeated_photos_sent_by_file_id(self):
+        hotels = make_hotels(3, bad_indexes=(1,))
+        hotels[2]['url_photo'] = ''
+        self.controller.send_lst_hotels(1, hotels)
+        self.bot.calls.clear()
+        self.controller.send_lst_hotels(1, hotels)
+        #  альбом отклонен из-за BAD_URL, при отправке по одному фото берутся из кэша
+        self.assertEqual(self.bot.calls, [('send_media_group', ['id:https://photo/0.jpg', BAD_URL, 'id:placeholder']),
+                                          ('send_photo', 'id:https://photo/0.jpg'),
+                                          ('send_photo', BAD_URL),
+                                          ('send_photo', 'id:placeholder'),
+                                          ('send_photo', 'id:placeholder')])
+
+    @patch('config.HOTELS_DELIVERY_MODE', 'single')
+    def test_stale_file_ids(self):
+        hotels = make_hotels(3, bad_indexes=(1,))
+        hotels[2]['url_photo'] = ''
+        self.controller.photo_cache.put('https://photo/0.jpg', STALE_FILE_ID)
+        self.controller.photo_cache.put(PLACEHOLDER_PHOTO_PATH, STALE_FILE_ID + '-placeholder')
+        self.controller.send_lst_hotels(1, hotels)
+        #  отклоненный file_id удаляется из кэша, фото отправляется по url, заглушка - из файла
+        self.assertEqual(self.bot.calls, [('send_photo', STALE_FILE_ID), ('send_photo', 'https://photo/0.jpg'),
+                                          ('send_photo', BAD_URL), ('send_photo', STALE_FILE_ID + '-placeholder'),
+                                          ('send_photo', 'placeholder'),
+                                          ('send_photo', 'id:placeholder')])
+        self.assertEqual(self.controller.photo_cache.get('https://photo/0.jpg'), 'id:https://photo/0.jpg')
+        self.assertEqual(self.controller.photo_cache.get(PLACEHOLDER_PHOTO_PATH), 'id:placeholder')
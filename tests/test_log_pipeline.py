@@ -0,0 +1,72 @@
+import json
+import logging
+import os
+import queue
+import tempfile
+import unittest
+
+from utils import DebugSampleFilter, DroppingQueueHandler, JsonFormatter, LogPipeline
+
+
+class TestLogPipeline(unittest.TestCase):
+    """ Запись логов через ограниченную очередь и фоновый поток. """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.logger = logging.getLogger('test_pipeline')
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.propagate = False
+
+    def tearDown(self):
+        for handler in self.logger.handlers[:]:
+            self.logger.removeHandler(handler)
+        self.tmp_dir.cleanup()
+
+    def test_json_lines(self):
+        path = os.path.join(self.tmp_dir.name, 'app.log')
+        pipeline = LogPipeline(log_format='json')
+        handler = logging.FileHandler(path, encoding='utf8')
+        handler.setFormatter(pipeline.file_formatter('%(message)s'))
+        pipeline.attach(self.logger, [handler])
+        other = logging.getLogger('test_pipeline_other')
+        other.addHandler(self.logger.handlers[0])
+        pipeline.start()
+        args = {'id': 1}
+        self.logger.debug('Запрос %s', args)
+        args['id'] = 2  # аргументы подставляются в момент записи в лог
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            self.logger.exception('Ошибка')
+        other.info('Запись другого логера не попадает в файл логера')
+        other.removeHandler(self.logger.handlers[0])
+        pipeline.stop()
+
+        with open(path, encoding='utf8') as f_log:
+            records = [json.loads(line) for line in f_log]
+        self.assertEqual([record['message'] for record in records], ["Запрос {'id': 1}", 'Ошибка'])
+        self.assertEqual(records[0]['level'], 'DEBUG')
+        self.assertEqual(records[0]['logger'], 'test_pipeline')
+        self.assertIn('ZeroDivisionError', records[1]['exc'])
+
+    def test_full_queue_drops_records(self):
+        handler = DroppingQueueHandler(queue.Queue(2))
+        self.logger.addHandler(handler)
+        for ind in range(5):
+            self.logger.info('Запись %d', ind)
+        self.assertEqual(handler.queue.qsize(), 2)
+        self.assertEqual(handler.dropped, 3)
+
+    def test_debug_sample(self):
+        sample = DebugSampleFilter(3)
+        records = [logging.LogRecord('x', level, '', 0, 'msg', None, None)
+                   for level in [logging.DEBUG] * 6 + [logging.INFO]]
+        self.assertEqual([sample.filter(record) for record in records],
+                         [True, False, False, True, False, False, True])
+        self.assertFalse(DebugSampleFilter(0).filter(records[0]))
+        self.assertTrue(DebugSampleFilter(0).filter(records[-1]))
+
+    def test_json_formatter_cyrillic(self):
+        record = logging.LogRecord('main', logging.INFO, 'main.py', 10, 'Бот запущен', None, None)
+        data = json.loads(JsonFormatter().format(record))
+        self.assertEqual((data['message'], data['line']), ('Бот запущен', 10))
@@ -0,0 +1,65 @@
+import unittest
+import urllib.error
+import urllib.request
+
+from executor_commands import CmdSortByPriceAndDist
+from metrics import API_REQUEST_SECONDS, Counter, Gauge, Histogram, MetricsServer, Registry
+
+
+class TestMetrics(unittest.TestCase):
+    """ Запись значений метрик и вывод в текстовом формате Prometheus. """
+
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_and_gauge(self):
+        counter = Counter('test_total', 'Счетчик', labels=('kind',), registry=self.registry)
+        counter.inc('a')
+        counter.inc('a', amount=2)
+        counter.inc('b"\n')
+        gauge = Gauge('test_size', 'Размер', registry=self.registry)
+        gauge.set_function(lambda: 7)
+        text = self.registry.render()
+        self.assertIn('# TYPE test_total counter\n', text)
+        self.assertIn('test_total{kind="a"} 3\n', text)
+        self.assertIn('test_total{kind="b\\"\\n"} 1\n', text)
+        self.assertIn('# TYPE test_size gauge\ntest_size 7\n', text)
+        with self.assertRaises(ValueError):
+            Counter('test_total', 'Повтор', registry=self.registry)
+
+    def test_histogram(self):
+        histogram = Histogram('test_seconds', 'Время', labels=('stage',), buckets=(0.1, 1.0),
+                              registry=self.registry)
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, 'network')
+        lines = self.registry.render().splitlines()
+        self.assertEqual(lines[2:], ['test_seconds_bucket{stage="network",le="0.1"} 2',
+                                     'test_seconds_bucket{stage="network",le="1.0"} 3',
+                                     'test_seconds_bucket{stage="network",le="+Inf"} 4',
+                                     'test_seconds_sum{stage="network"} 3.65',
+                                     'test_seconds_count{stage="network"} 4'])
+        with histogram.time('extract'):
+            pass
+        self.assertEqual(histogram.count('extract'), 1)
+
+    def test_server(self):
+        Counter('test_requests_total', 'Запросы', registry=self.registry).inc()
+        server = MetricsServer('127.0.0.1', 0, registry=self.registry)
+        server.start()
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{server.port}/metrics', timeout=5) as response:
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                self.assertIn('test_requests_total 1', response.read().decode())
+            with self.assertRaises(urllib.error.HTTPError) as cm:
+                urllib.request.urlopen(f'http://127.0.0.1:{server.port}/other', timeout=5)
+            self.assertEqual(cm.exception.code, 404)
+        finally:
+            server.stop()
+
+    def test_bestdeal_instrumentation(self):
+        count_before = API_REQUEST_SECONDS.count('hotels', 'extract')
+        implementer = CmdSortByPriceAndDist({'sortOrder': 'DISTANCE_FROM_LANDMARK'},
+                                            {'size_result': 3, 'range_dist': (1.8, 2.5)}, True)
+        implementer.start()
+        self.assertGreater(implementer.count_pages, 1)
+        self.assertEqual(API_REQUEST_SECONDS.count('hotels', 'extract') - count_before, implementer.count_pages)
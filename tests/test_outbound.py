@@ -0,0 +1,116 @@
+import threading
+import time
+import unittest
+
+from telebot.apihelper import ApiTelegramException
+from telebot.types import Message
+
+from outbound import OutboundBot, OutboundScheduler, bulk_delivery
+
+
+class FakeBot:
+    """ Заглушка бота, записывающая порядок отправленных сообщений. """
+
+    def __init__(self, count_429: int = 0):
+        self.sent = []
+        self.count_429 = count_429
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id, text, **kwargs):
+        with self.lock:
+            if self.count_429:
+                self.count_429 -= 1
+                raise ApiTelegramException('sendMessage', None, {'error_code': 429, 'parameters': {'retry_after': 0.05},
+                                                                 'description': 'Too Many Requests: retry after 0.05'})
+            self.sent.append((chat_id, text, time.monotonic()))
+            self.kwargs = kwargs
+        return text
+
+    def answer_callback_query(self, callback_query_id, text=None):
+        return 'answered'
+
+
+class TestOutboundScheduler(unittest.TestCase):
+    """ Проверка лимитов, приоритетов и справедливой очереди исходящих запросов. """
+
+    def setUp(self):
+        self.fake_bot = FakeBot()
+
+    def make_scheduler(self, **kwargs) -> OutboundScheduler:
+        params = dict(global_rate=1000, chat_rate=1000, chat_burst=1000, num_senders=2)
+        params.update(kwargs)
+        scheduler = OutboundScheduler(**params)
+        self.addCleanup(scheduler.shutdown)
+        return scheduler
+
+    def test_round_robin_between_chats(self):
+        scheduler = self.make_scheduler(num_senders=1)
+        futures = [scheduler.submit(1, self.fake_bot.send_message, 1, f'a{ind}') for ind in range(20)]
+        futures += [scheduler.submit(2, self.fake_bot.send_message, 2, f'b{ind}') for ind in range(2)]
+        scheduler.start()
+        for future in futures:
+            future.result(timeout=5)
+        texts = [text for _, text, _ in self.fake_bot.sent]
+        self.assertEqual(texts[:4], ['a0', 'b0', 'a1', 'b1'])
+        self.assertEqual([text for text in texts if text.startswith('a')], [f'a{ind}' for ind in range(20)])
+
+    def test_interactive_before_bulk(self):
+        scheduler = self.make_scheduler()
+        with bulk_delivery():
+            futures = [scheduler.submit(chat_id, self.fake_bot.send_message, chat_id, 'hotel') for chat_id in (1, 2)]
+        futures.append(scheduler.submit(3, self.fake_bot.send_message, 3, 'question'))
+        scheduler.start()
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(self.fake_bot.sent[0][1], 'question')
+
+    def test_chat_rate(self):
+        scheduler = self.make_scheduler(chat_rate=20, chat_burst=1)
+        scheduler.start()
+        for ind in range(5):
+            scheduler.call(1, self.fake_bot.send_message, 1, str(ind))
+        times = [sent_time for _, _, sent_time in self.fake_bot.sent]
+        self.assertGreaterEqual(times[-1] - times[0], 0.19)
+
+    def test_retry_after_429(self):
+        self.fake_bot.count_429 = 2
+        scheduler = self.make_scheduler()
+        scheduler.start()
+        self.assertEqual(scheduler.call(1, self.fake_bot.send_message, 1, 'text'), 'text')
+        stats = scheduler.stats()
+        self.assertEqual((stats['sent'], stats['retried_429'], stats['queued_interactive']), (1, 2, 0))
+
+    def test_error_is_raised_to_caller(self):
+        self.fake_bot.count_429 = 10
+        scheduler = self.make_scheduler(max_retries=1)
+        scheduler.start()
+        with self.assertRaises(ApiTelegramException):
+            scheduler.call(1, self.fake_bot.send_message, 1, 'text')
+        self.assertEqual(scheduler.stats()['failed'], 1)
+
+    def test_outbound_bot(self):
+        scheduler = self.make_scheduler()
+        scheduler.start()
+        bot = OutboundBot(self.fake_bot, scheduler)
+        self.assertEqual(bot.send_message(1, 'text', parse_mode='HTML'), 'text')
+        self.assertEqual(bot.answer_callback_query('1'), 'answered')  # без очереди
+        self.assertEqual(scheduler.stats()['sent'], 1)
+
+    def test_reply_to_is_queued(self):
+        scheduler = self.make_scheduler()
+        bot = OutboundBot(self.fake_bot, scheduler)
+        message = Message.de_json({'message_id': 7, 'date': 0, 'text': 'abc', 'chat': {'id': 5, 'type': 'private'}})
+        result = []
+        thread = threading.Thread(target=lambda: result.append(bot.reply_to(message, 'Некорректный ввод')))
+        thread.start()
+        deadline = time.monotonic() + 5
+        while scheduler.stats()['queued_interactive'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        #  планировщик не запущен: ответ ждет в очереди чата
+        self.assertEqual(self.fake_bot.sent, [])
+        self.assertEqual(scheduler.stats()['queued_interactive'], 1)
+        scheduler.start()
+        thread.join(5)
+        self.assertEqual(result, ['Некорректный ввод'])
+        self.assertEqual(self.fake_bot.sent[0][0], 5)
+        self.assertEqual(self.fake_bot.kwargs, {'reply_to_message_id': 7})
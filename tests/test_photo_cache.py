@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+from photo_cache import PhotoCache
+
+
+class TestPhotoCache(unittest.TestCase):
+    """ Проверка ограничения размера и сохранения кэша file_id между перезапусками. """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'photo_cache.json')
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_lru_eviction(self):
+        cache = PhotoCache(max_size=2)
+        cache.put('url_1', 'id_1')
+        cache.put('url_2', 'id_2')
+        cache.get('url_1')
+        cache.put('url_3', 'id_3')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('url_2'))
+        self.assertEqual(cache.get('url_1'), 'id_1')
+        self.assertEqual(cache.get('url_3'), 'id_3')
+
+    def test_persistence(self):
+        cache = PhotoCache(self.path, max_size=10)
+        cache.put('url_1', 'id_1')
+        cache.put('url_2', None)  # сообщение без фото - file_id не сохраняется
+        cache.put('url_3', 'id_3')
+        cache.delete('url_3')
+        cache.save()
+
+        restored = PhotoCache(self.path, max_size=10)
+        self.assertEqual(len(restored), 1)
+        self.assertEqual(restored.get('url_1'), 'id_1')
+
+    def test_maybe_save_interval(self):
+        cache = PhotoCache(self.path, save_interval=3600)
+        cache.put('url_1', 'id_1')
+        cache.maybe_save()
+        self.assertFalse(os.path.exists(self.path))
+        cache.save_interval = 0
+        cache.maybe_save()
+        self.assertTrue(os.path.exists(self.path))
@@ -0,0 +1,110 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from BotController import BotController
+from photo_checker import PhotoUrlChecker
+from tests.test_hotels_delivery import FakeBot, make_hotels
+
+
+class PhotoHandler(BaseHTTPRequestHandler):
+    """ Сервер фото: /ok* - фото, /head_not_allowed* - фото без поддержки HEAD, /slow* - долгий ответ, иначе 404. """
+
+    requests = []
+
+    def _reply(self, with_body: bool):
+        PhotoHandler.requests.append((self.command, self.path))
+        if self.path.startswith('/slow'):
+            time.sleep(1)
+        if self.path.startswith('/ok') or self.path.startswith('/slow') or \
+                (self.path.startswith('/head_not_allowed') and self.command == 'GET'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'image/jpeg')
+        elif self.path.startswith('/head_not_allowed'):
+            self.send_response(405)
+        else:
+            self.send_response(404)
+            self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', '1')
+        self.end_headers()
+        if with_body:
+            self.wfile.write(b'x')
+
+    def do_HEAD(self):
+        self._reply(with_body=False)
+
+    def do_GET(self):
+        self._reply(with_body=True)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestPhotoUrlChecker(unittest.TestCase):
+    """ Проверка доступности фото на локальном http сервере. """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), PhotoHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_address[1]}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        PhotoHandler.requests.clear()
+        self.checker = PhotoUrlChecker(max_workers=4, timeout=0.3, ttl=60)
+
+    def tearDown(self):
+        self.checker.shutdown()
+
+    def test_check_and_cache(self):
+        urls = [f'{self.base_url}/ok.jpg', f'{self.base_url}/dead.jpg', f'{self.base_url}/head_not_allowed.jpg',
+                'http://127.0.0.1:1/refused.jpg']
+        expected = {urls[0]: True, urls[1]: False, urls[2]: True, urls[3]: False}
+        self.assertEqual(self.checker.check(urls), expected)
+        count_requests = len(PhotoHandler.requests)
+        self.assertEqual(self.checker.check(urls), expected)
+        self.assertEqual(len(PhotoHandler.requests), count_requests)
+
+    def test_ttl(self):
+        url = f'{self.base_url}/dead.jpg'
+        self.checker.ttl = 0
+        self.checker.check([url])
+        time.sleep(0.01)
+        self.checker.check([url])
+        self.assertEqual(PhotoHandler.requests, [('HEAD', '/dead.jpg')] * 2)
+
+    def test_timeout(self):
+        #  ответ не получен за таймаут - фото недоступно; общее время проверки ограничено
+        time_start = time.monotonic()
+        self.assertEqual(self.checker.check([f'{self.base_url}/slow.jpg']), {f'{self.base_url}/slow.jpg': False})
+        self.assertLess(time.monotonic() - time_start, 0.9)
+
+    def test_network_errors_not_cached_for_ttl(self):
+        #  ответ сервера (404) хранится ttl секунд, таймаут - только error_ttl секунд
+        self.checker.error_ttl = 0
+        urls = [f'{self.base_url}/dead.jpg', f'{self.base_url}/slow.jpg']
+        self.checker.check(urls)
+        time.sleep(0.01)
+        self.assertEqual(self.checker.check(urls), {urls[0]: False, urls[1]: False})
+        self.assertEqual(sorted(PhotoHandler.requests),
+                         [('HEAD', '/dead.jpg'), ('HEAD', '/slow.jpg'), ('HEAD', '/slow.jpg')])
+
+    @patch('config.HOTELS_DELIVERY_MODE', 'album')
+    def test_placeholder_substituted_before_send(self):
+        bot = FakeBot()
+        controller = BotController(bot, True, photo_checker=self.checker)
+        hotels = make_hotels(3)
+        hotels[0]['url_photo'] = f'{self.base_url}/ok.jpg'
+        hotels[1]['url_photo'] = f'{self.base_url}/dead.jpg'
+        hotels[2]['url_photo'] = f'{self.base_url}/dead_cached.jpg'
+        controller.photo_cache.put(hotels[2]['url_photo'], 'id:cached')  # уже отправленное фото не проверяется
+        controller.send_lst_hotels(1, hotels)
+        self.assertEqual(bot.calls, [('send_media_group', [hotels[0]['url_photo'], 'placeholder', 'id:cached'])])
+        self.assertEqual(hotels[1]['url_photo'], f'{self.base_url}/dead.jpg')
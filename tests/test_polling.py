@@ -0,0 +1,65 @@
+import threading
+import unittest
+
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+from telebot.types import Update
+
+from dispatcher import ChatDispatcher
+from fake_telebot import message_update_data
+from polling import PollingConsumer
+
+
+def make_update(update_id: int, chat_id: int, text: str) -> Update:
+    return Update.de_json(message_update_data(update_id, chat_id, text))
+
+
+class FakeBot(TeleBot):
+    """ Бот, получающий заранее заданные пачки обновлений (или ошибку) вместо запроса getUpdates. """
+
+    def __init__(self, batches: list):
+        super().__init__('1:TOKEN', threaded=False)
+        self.batches = batches
+        self.offsets = []
+        self.consumer = None
+
+    def get_updates(self, offset=None, limit=None, timeout=20, allowed_updates=None, long_polling_timeout=20):
+        self.offsets.append(offset)
+        if not self.batches:
+            self.consumer.stop()
+            return []
+        batch = self.batches.pop(0)
+        if isinstance(batch, Exception):
+            raise batch
+        return batch
+
+
+class TestPollingConsumer(unittest.TestCase):
+    """ Опрос getUpdates: порядок обработки в чате, смещение, статистика. """
+
+    def test_batches(self):
+        error = ApiTelegramException('getUpdates', None, {'error_code': 502, 'description': 'Bad Gateway'})
+        bot = FakeBot([[make_update(ind, ind % 3, str(ind)) for ind in range(1, 101)],
+                       error,
+                       [make_update(ind, ind % 3, str(ind)) for ind in range(101, 131)]])
+        handled = {}
+        lock = threading.Lock()
+
+        @bot.message_handler(content_types=['text'])
+        def handler(msg):
+            with lock:
+                handled.setdefault(msg.chat.id, []).append(int(msg.text))
+
+        dispatcher = ChatDispatcher(num_workers=4)
+        consumer = PollingConsumer(bot, dispatcher)
+        bot.consumer = consumer
+        consumer.run()
+        dispatcher.shutdown()
+
+        self.assertEqual(bot.offsets, [1, 101, 101, 131])
+        for chat_id in range(3):
+            self.assertEqual(handled[chat_id], [ind for ind in range(1, 131) if ind % 3 == chat_id])
+        stats = consumer.stats()
+        self.assertEqual((stats['received'], stats['processed'], stats['backlog']), (130, 130, 0))
+        self.assertEqual((stats['batch_max'], stats['batch_last']), (100, 0))
+        self.assertGreater(stats['lag_p50'], 0)
@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from profiler import SamplingProfiler, get_category, get_thread_group
+
+
+def busy_json(stop: threading.Event) -> None:
+    data = json.dumps([{'id': ind, 'name': f'Отель {ind}', 'price': ind * 1.5} for ind in range(200)])
+    while not stop.is_set():
+        json.loads(data)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    """ Семплирование стеков потоков и отчет профилирования. """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_thread_group_and_category(self):
+        self.assertEqual(get_thread_group('ChatWorker_3'), 'ChatWorker')
+        self.assertEqual(get_thread_group('MainThread'), 'MainThread')
+        self.assertEqual(get_category([(os.path.join('lib', 'json', 'decoder.py'), 'raw_decode'),
+                                       ('resources.py', 'request_to_api')]), 'json')
+        self.assertEqual(get_category([('threading.py', 'wait'), ('queue.py', 'get')]), 'wait')
+        self.assertEqual(get_category([('executor_commands.py', 'sort_hotels')]), 'other')
+
+    def test_profile_report(self):
+        reports = []
+        profiler = SamplingProfiler(interval=0.005, output_dir=self.tmp_dir.name)
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_json, args=(stop,), name='ChatWorker_0')
+        worker.start()
+        try:
+            self.assertTrue(profiler.start(30, on_finish=reports.append))
+            self.assertFalse(profiler.start(30))
+            for _ in range(3):
+                with profiler.handler('get_location_step'):
+                    time.sleep(0.05)
+        finally:
+            stop.set()
+            worker.join()
+            profiler.stop()
+        #  вне профилирования обработчики не учитываются
+        with profiler.handler('get_city_step'):
+            pass
+
+        self.assertEqual(len(reports), 1)
+        self.assertGreater(profiler.samples, 0)
+        with open(reports[0], encoding='utf8') as f_report:
+            report = f_report.read()
+        self.assertIn('ChatWorker', report)
+        self.assertIn('get_location_step', report)
+        self.assertNotIn('get_city_step', report)
+        row = next(line for line in report.splitlines() if line.startswith('get_location_step'))
+        self.assertEqual(row.split()[1], '3')
+
+        with open(reports[0][:-len('.txt')] + '.collapsed', encoding='utf8') as f_stacks:
+            stacks = [line.rsplit(' ', 1) for line in f_stacks.read().splitlines()]
+        self.assertTrue(all(count.isdigit() for _, count in stacks))
+        self.assertTrue(any(stack.startswith('ChatWorker;') and 'decode (decoder.py)' in stack
+                            for stack, _ in stacks))
+        self.assertFalse(any(stack.startswith('Profiler;') for stack, _ in stacks))
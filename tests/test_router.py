@@ -0,0 +1,78 @@
+import unittest
+
+from telebot.types import CallbackQuery, Message
+
+from router import UpdateRouter
+
+
+class FakeController:
+    """ Заглушка контроллера с фиксированными состояниями пользователей. """
+
+    def __init__(self, states: dict):
+        self.states = states
+        self.calls = 0
+
+    def get_session_info(self, user_id: int):
+        self.calls += 1
+        return None, self.states.get(user_id), None
+
+
+def make_message(user_id: int, text: str) -> Message:
+    return Message.de_json({'message_id': 1, 'date': 0, 'text': text,
+                            'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+                            'chat': {'id': user_id, 'type': 'private'}})
+
+
+def make_callback(user_id: int, data: str) -> CallbackQuery:
+    return CallbackQuery.de_json({'id': '1', 'data': data, 'chat_instance': '1',
+                                  'from': {'id': user_id, 'is_bot': False, 'first_name': 'User'},
+                                  'message': {'message_id': 1, 'date': 0, 'text': 'form',
+                                              'chat': {'id': user_id, 'type': 'private'}}})
+
+
+class TestUpdateRouter(unittest.TestCase):
+    """ Проверка выбора обработчика по индексу маршрутизатора. """
+
+    def setUp(self):
+        self.controller = FakeController({1: 10, 2: 20, 3: 30})
+        self.router = UpdateRouter(self.controller)
+        self.handled = []
+
+        def make_handler(name):
+            def handler(update):
+                self.handled.append(name)
+            return handler
+
+        self.router.command_handler('help')(make_handler('help'))
+        self.router.message_handler(10)(make_handler('state_10'))
+        self.router.message_handler(20)(make_handler('state_20'))
+        self.router.callback_handler('set_default', 'change_default')(make_handler('default_value'))
+        self.router.callback_handler('calendar')(make_handler('calendar'))
+        self.router.default_message_handler(make_handler('unknown'))
+
+    def test_message_by_state_with_single_session_lookup(self):
+        self.router.dispatch_message(make_message(1, 'Москва'))
+        self.router.dispatch_message(make_message(2, '2'))
+        self.assertEqual(self.handled, ['state_10', 'state_20'])
+        self.assertEqual(self.controller.calls, 2)
+
+    def test_command_has_priority_over_state(self):
+        self.router.dispatch_message(make_message(1, '/help'))
+        self.assertEqual(self.handled, ['help'])
+        self.assertEqual(self.controller.calls, 0)
+
+    def test_default_handler(self):
+        self.router.dispatch_message(make_message(3, 'текст'))  # для состояния нет обработчика
+        self.router.dispatch_message(make_message(4, 'текст'))  # нет активной команды
+        self.router.dispatch_message(make_message(4, '/unknown'))
+        self.assertEqual(self.handled, ['unknown'] * 3)
+
+    def test_callback_by_prefix(self):
+        self.router.dispatch_callback(make_callback(1, 'change_default'))
+        self.router.dispatch_callback(make_callback(1, 'calendar:DAY:2021:10:19'))
+        self.router.dispatch_callback(make_callback(1, 'other'))
+        self.assertEqual(self.handled, ['default_value', 'calendar'])
+
+    def test_duplicate_registration(self):
+        with self.assertRaises(ValueError):
+            self.router.message_handler(10)(lambda msg: None)
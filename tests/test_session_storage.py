@@ -0,0 +1,123 @@
+import datetime
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from telebot.types import Message
+
+import fsm
+from BotController import BotController, UserData, calendar_callback
+from session_storage import MemorySessionStorage, SessionStorage, SqliteSessionStorage
+
+
+class FakeBot:
+    """ Заглушка бота, возвращающая отправленное сообщение в виде объекта Message. """
+
+    def __init__(self):
+        self.message_id = 0
+
+    def send_message(self, chat_id, text, reply_markup=None, parse_mode=None):
+        self.message_id += 1
+        return Message.de_json({'message_id': self.message_id, 'date': 0, 'text': text,
+                                'chat': {'id': chat_id, 'type': 'private'}})
+
+
+class TestSessionStorage(unittest.TestCase):
+    """ Проверка работы BotController с хранилищами сессий в памяти и в файле sqlite. """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'sessions.sqlite3')
+        self.storages = []
+
+    def tearDown(self):
+        for storage in self.storages:
+            storage.close()
+        self.tmp_dir.cleanup()
+
+    def make_sqlite_storage(self):
+        storage = SqliteSessionStorage(self.db_path, UserData)
+        self.storages.append(storage)
+        return storage
+
+    def run_dialog(self, controller: BotController, user_id: int):
+        controller.set_command(user_id, '/bestdeal')
+        controller.set_new_state(user_id, fsm.START)
+        controller.save_locations_info(user_id, {'Москва, Россия': 1153093})
+        controller.go_next_state(user_id)
+        controller.add_api_params(user_id, destinationId=1153093)
+        controller.add_data_to_form_confirm(user_id, 'Москва, Россия')
+        controller.go_next_state(user_id)
+        controller.add_cmd_options(user_id, range_dist=(0.9, 2.5))
+
+    def test_dialog_in_memory(self):
+        controller = BotController(FakeBot(), True, MemorySessionStorage())
+        self.run_dialog(controller, 1)
+        self.assertEqual(controller.get_state_cmd(1), fsm.GET_RANGE_PRICE)
+        self.assertEqual(controller.get_locations_info(1), {'Москва, Россия': 1153093})
+        controller.go_prev_state(1)
+        self.assertEqual(controller.get_state_cmd(1), fsm.CHOICE_CITY)
+
+    def test_dialog_shared_between_processes(self):
+        """ Два контроллера с общим файлом sqlite имитируют два процесса бота. """
+
+        controller_1 = BotController(FakeBot(), True, self.make_sqlite_storage())
+        controller_2 = BotController(FakeBot(), True, self.make_sqlite_storage())
+        self.run_dialog(controller_1, 1)
+
+        self.assertEqual(controller_2.get_active_cmd(1), '/bestdeal')
+        self.assertEqual(controller_2.get_state_cmd(1), fsm.GET_RANGE_PRICE)
+        user_data = controller_2.users.get(1)
+        self.assertEqual(user_data.api_params.to_dict(),
+                         {'sortOrder': 'DISTANCE_FROM_LANDMARK', 'destinationId': 1153093})
+        self.assertEqual(user_data.cmd_options.to_dict(), {'range_dist': (0.9, 2.5)})
+        self.assertEqual(user_data.form_confirm, {fsm.machine.title_form_confirm(fsm.CHOICE_CITY): 'Москва, Россия'})
+        self.assertEqual(controller_2.get_msg_cur_state(1)[0], fsm.machine.question(fsm.GET_RANGE_PRICE))
+
+        controller_2.go_next_state(1)
+        self.assertEqual(controller_1.get_state_cmd(1), fsm.GET_RANGE_DIST)
+        controller_1.cancel_cmd(1)
+        self.assertIsNone(controller_2.get_active_cmd(1))
+        self.assertEqual(len(controller_2.users), 0)
+
+    def test_concurrent_updates_between_processes(self):
+        """ Изменения одной сессии двумя "процессами" не перезаписывают друг друга. """
+
+        storages = [self.make_sqlite_storage(), self.make_sqlite_storage()]
+        storages[0].save(1, UserData(active_cmd='/lowprice'))
+
+        def add_options(storage, prefix):
+            for ind in range(50):
+                storage.update(1, lambda user_data: user_data.form_confirm.update({f'{prefix}{ind}': ind}))
+            storage.close()
+
+        threads = [threading.Thread(target=add_options, args=(storage, prefix))
+                   for storage, prefix in zip(storages, 'ab')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(self.make_sqlite_storage().get(1).form_confirm), 100)
+        self.assertIsNone(storages[0].update(2, lambda user_data: self.fail('нет сессии')))
+
+    def test_incomplete_storage(self):
+        class GetOnlyStorage(SessionStorage):
+            def get(self, user_id: int):
+                return None
+
+        with self.assertRaises(TypeError):
+            GetOnlyStorage()
+
+    def test_check_out_calendar_carries_check_in(self):
+        controller = BotController(FakeBot(), True, self.make_sqlite_storage())
+        user_id = 3
+        controller.set_command(user_id, '/lowprice')
+        controller.add_api_params(user_id, checkIn='2030-01-05')
+        controller.set_new_state(user_id, fsm.GET_CHECKOUT_DATE)
+
+        markup = json.loads(controller.get_msg_cur_state(user_id)[1])
+        check_in = {calendar_callback.decode(btn['callback_data']).check_in
+                    for row in markup['inline_keyboard'] for btn in row}
+        self.assertEqual(check_in, {datetime.date(2030, 1, 5)})
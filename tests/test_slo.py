@@ -0,0 +1,100 @@
+import threading
+import time
+import unittest
+
+from telebot.types import Message
+
+import fsm
+from dispatcher import ChatDispatcher, get_received_time
+from metrics import SLO_BREACHES, USER_LATENCY_SECONDS
+from router import UpdateRouter
+from slo import EXEC, STEP, RollingPercentiles, SloTracker, slo
+
+
+class FakeController:
+    def __init__(self, session: tuple):
+        self.session = session
+
+    def get_session_info(self, user_id: int):
+        return self.session
+
+
+def make_message(text: str) -> Message:
+    return Message.de_json({'message_id': 1, 'date': 0, 'text': text,
+                            'from': {'id': 1, 'is_bot': False, 'first_name': 'User'},
+                            'chat': {'id': 1, 'type': 'private'}})
+
+
+class TestRollingPercentiles(unittest.TestCase):
+    def test_percentiles_and_window(self):
+        window = RollingPercentiles(window=60)
+        for ind in range(1, 101):
+            window.add(ind / 100, now=ind)
+        values = window.values(now=100)
+        self.assertEqual(len(values), 61)
+        self.assertEqual([RollingPercentiles.percentile(values, percent) for percent in (50, 95, 99)],
+                         [0.7, 0.97, 1.0])
+        self.assertEqual(RollingPercentiles.percentile([], 50), 0.0)
+
+
+class TestSloTracker(unittest.TestCase):
+    """ Замеры шагов и выполнения команд, нарушения SLO. """
+
+    def setUp(self):
+        self.tracker = SloTracker(step_target=0.05, exec_target=1.0, window=60)
+
+    def test_step_and_exec(self):
+        breaches = SLO_BREACHES.value(STEP, '/bestdeal')
+        with self.tracker.measure('/bestdeal', 'GET_RANGE_PRICE'):
+            pass
+        with self.assertLogs('main.slo', 'WARNING') as logs:
+            with self.tracker.measure('/bestdeal', 'GET_RANGE_PRICE', started=time.perf_counter() - 0.1):
+                pass
+        self.assertIn('/bestdeal GET_RANGE_PRICE', logs.output[0])
+        self.assertEqual(SLO_BREACHES.value(STEP, '/bestdeal'), breaches + 1)
+
+        with self.tracker.measure('/bestdeal', 'END'):
+            self.tracker.mark_exec()
+        #  вне замера отметки ни на что не влияют
+        self.tracker.mark_exec()
+        with self.tracker.measure(None, 'None'):
+            self.tracker.start_command('/lowprice', 'START')
+
+        report = self.tracker.report().splitlines()
+        self.assertEqual(len(report), 5)
+        rows = {tuple(line.split()[:3]): line.split()[3:] for line in report[2:]}
+        self.assertEqual(set(rows), {(STEP, '/bestdeal', 'GET_RANGE_PRICE'), (EXEC, '/bestdeal', '-'),
+                                     (STEP, '/lowprice', 'START')})
+        self.assertEqual(rows[(STEP, '/bestdeal', 'GET_RANGE_PRICE')][0], '2')
+        self.assertEqual(rows[(STEP, '/bestdeal', 'GET_RANGE_PRICE')][-1], '1')
+
+    def test_empty_report(self):
+        self.assertIn('Нет замеров', self.tracker.report())
+
+
+class TestUpdateLatency(unittest.TestCase):
+    """ Задержка ответа считается от постановки обновления в очередь диспетчера. """
+
+    def tearDown(self):
+        slo.configure(2.0, 30.0, 3600)
+
+    def test_received_time_includes_queue_wait(self):
+        dispatcher = ChatDispatcher(num_workers=1)
+        release = threading.Event()
+        waits = []
+        dispatcher.submit(1, release.wait)
+        dispatcher.submit(2, lambda: waits.append(time.perf_counter() - get_received_time()))
+        time.sleep(0.05)
+        release.set()
+        dispatcher.shutdown()
+        self.assertGreaterEqual(waits[0], 0.05)
+        self.assertIsNone(get_received_time())
+
+    def test_router_measures_step(self):
+        slo.configure(10.0, 10.0, 60)
+        router = UpdateRouter(FakeController(('/bestdeal', fsm.GET_RANGE_DIST, None)))
+        router.message_handler(fsm.GET_RANGE_DIST)(lambda msg: None)
+        count = USER_LATENCY_SECONDS.count(STEP, '/bestdeal', 'GET_RANGE_DIST')
+        router.dispatch_message(make_message('0.5-2'))
+        self.assertEqual(USER_LATENCY_SECONDS.count(STEP, '/bestdeal', 'GET_RANGE_DIST'), count + 1)
+        self.assertIn('GET_RANGE_DIST', slo.report())
@@ -0,0 +1,110 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+import fsm
+from BotController import UserData
+from photo_checker import PhotoUrlChecker
+from session_storage import MemorySessionStorage
+from snapshot import BotSnapshot
+
+
+def make_user_data(user_id: int) -> UserData:
+    user_data = UserData(active_cmd='/bestdeal')
+    user_data.state_cmd = fsm.GET_CHECKIN_DATE
+    user_data.api_params.update({'sortOrder': 'DISTANCE_FROM_LANDMARK', 'destinationId': 1153093, 'adults1': 2})
+    user_data.cmd_options.update({'size_result': 5, 'range_dist': (0.9, 2.5)})
+    user_data.form_confirm = {'Город для поиска': 'Москва, Россия'}
+    user_data.msg_id_cur_state = user_id
+    user_data.msg_text_cur_state = 'Дата въезда ⤴ ?'
+    #  клавиатура календаря - общая строка снимка
+    user_data.msg_markup_cur_state = '{"inline_keyboard": [' + '{"text": "\t", "callback_data": "cal"},' * 20 + ']}'
+    return user_data
+
+
+class TestBotSnapshot(unittest.TestCase):
+    """ Запись снимка сессий и кэшей и ленивое восстановление. """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'snapshot.txt')
+        self.checker = PhotoUrlChecker(max_workers=1, ttl=60)
+
+    def tearDown(self):
+        self.checker.shutdown()
+        self.tmp_dir.cleanup()
+
+    def test_save_and_lazy_restore(self):
+        storage = MemorySessionStorage()
+        for user_id in (1, 2, 3):
+            storage.save(user_id, make_user_data(user_id))
+        now = time.monotonic()
+        self.checker._save('https://photo/alive.jpg', True, now)
+        self.checker._save('https://photo/dead.jpg', False, now)
+        self.checker._save('https://photo/expired.jpg', True, now - 120)
+        BotSnapshot(self.path, UserData).save(storage, self.checker)
+        with open(self.path, encoding='utf8') as f_snapshot:
+            self.assertEqual(f_snapshot.read().count('inline_keyboard'), 1)
+
+        restored = MemorySessionStorage()
+        checker = PhotoUrlChecker(max_workers=1)
+        snapshot = BotSnapshot(self.path, UserData)
+        snapshot.restore(restored, checker)
+        checker.shutdown()
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(len(restored), 3)
+        self.assertEqual(restored.export()[1].keys(), {1, 2, 3})
+        self.assertEqual(restored.get(2).dumps(), storage.get(2).dumps())
+        self.assertEqual(restored.export()[1].keys(), {1, 3})
+        self.assertEqual(checker.check(['https://photo/alive.jpg', 'https://photo/dead.jpg']),
+                         {'https://photo/alive.jpg': True, 'https://photo/dead.jpg': False})
+        self.assertEqual(len(checker.export_health()), 2)
+
+        #  сессии, к которым не было обращений, переносятся в следующий снимок без разбора
+        restored.delete(3)
+        restored.save(4, make_user_data(4))
+        snapshot.save(restored)
+        final = MemorySessionStorage()
+        BotSnapshot(self.path, UserData).restore(final)
+        self.assertEqual(len(final), 3)
+        for user_id in (1, 2, 4):
+            self.assertEqual(final.get(user_id).dumps(), make_user_data(user_id).dumps())
+        self.assertIsNone(final.get(3))
+
+    def test_broken_session(self):
+        storage = MemorySessionStorage()
+        storage.save(1, make_user_data(1))
+        BotSnapshot(self.path, UserData).save(storage)
+        with open(self.path, encoding='utf8') as f_snapshot:
+            header = f_snapshot.readline()
+        with open(self.path, 'w', encoding='utf8') as f_snapshot:
+            f_snapshot.write(header + '1\t\t["/bestdeal"]')
+        restored = MemorySessionStorage()
+        BotSnapshot(self.path, UserData).restore(restored)
+        with self.assertLogs('main.session_storage', 'ERROR'):
+            self.assertIsNone(restored.get(1))
+        self.assertEqual(len(restored), 0)
+
+    def test_broken_header(self):
+        storage = MemorySessionStorage()
+        storage.save(1, make_user_data(1))
+        BotSnapshot(self.path, UserData).save(storage)
+        with open(self.path, encoding='utf8') as f_snapshot:
+            header, sessions = f_snapshot.readline(), f_snapshot.read()
+        for key in ('shared', 'photo_health', 'created'):
+            broken = json.loads(header)
+            del broken[key]
+            with open(self.path, 'w', encoding='utf8') as f_snapshot:
+                f_snapshot.write(json.dumps(broken) + '\n' + sessions)
+            restored = MemorySessionStorage()
+            with self.assertLogs('main.snapshot', 'ERROR'):
+                BotSnapshot(self.path, UserData).restore(restored)
+            self.assertEqual(len(restored), 0)
+            self.assertFalse(os.path.exists(self.path))
+
+    def test_missing_snapshot(self):
+        storage = MemorySessionStorage()
+        BotSnapshot(self.path, UserData).restore(storage)
+        self.assertEqual(len(storage), 0)
@@ -0,0 +1,104 @@
+import logging
+import unittest
+
+from BotController import BotController, UserData
+from executor_commands import CmdSortByPriceAndDist
+from tracing import Tracer, tracer
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.spans = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.spans.append(record.msg)
+
+
+def make_logger(name: str) -> ListHandler:
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.handlers.clear()
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return handler
+
+
+class FakeBot:
+    def send_message(self, *args, **kwargs):
+        raise AssertionError('Сообщения не отправляются')
+
+
+class TestTracer(unittest.TestCase):
+    """ Участки трассы, их вложенность и запись в формате Zipkin v2. """
+
+    def setUp(self):
+        self.handler = make_logger('test_trace')
+        self.tracer = Tracer(1.0, logging.getLogger('test_trace'))
+
+    def test_disabled(self):
+        disabled = Tracer(0.0, logging.getLogger('test_trace'))
+        self.assertIsNone(disabled.new_trace())
+        with disabled.span('step', trace='0' * 32 + ':1') as span:
+            self.assertIsNone(span)
+        self.assertEqual(self.handler.spans, [])
+
+    def test_nested_spans(self):
+        trace = self.tracer.new_trace()
+        with self.tracer.span('step', trace=trace, user=1):
+            with self.tracer.span('query_hotels', page=2) as span:
+                span['tags']['hotels'] = '25'
+            with self.assertRaises(ValueError):
+                with self.tracer.span('send'):
+                    raise ValueError('bad')
+        #  вне участка шага трассы нет
+        with self.tracer.span('other') as span:
+            self.assertIsNone(span)
+        self.tracer.finish_trace(trace, 'command /bestdeal')
+
+        query, send, step, root = self.handler.spans
+        trace_id = trace.split(':')[0]
+        self.assertEqual({span['traceId'] for span in self.handler.spans}, {trace_id})
+        self.assertEqual(step['parentId'], root['id'])
+        self.assertNotIn('parentId', root)
+        self.assertEqual((query['parentId'], send['parentId']), (step['id'], step['id']))
+        self.assertEqual(query['tags'], {'page': '2', 'hotels': '25'})
+        self.assertIn('bad', send['tags']['error'])
+        self.assertEqual(step['tags'], {'user': '1'})
+        self.assertGreaterEqual(root['duration'], step['duration'])
+        self.assertLessEqual(root['timestamp'], step['timestamp'])
+
+
+class TestCommandTrace(unittest.TestCase):
+    """ Трасса команды хранится в сессии и объединяет шаги команды. """
+
+    def setUp(self):
+        self.handler = make_logger('test_command_trace')
+        tracer.configure(1.0, logging.getLogger('test_command_trace'))
+
+    def tearDown(self):
+        tracer.configure(0.0, None)
+
+    def test_command_trace(self):
+        controller = BotController(FakeBot(), True)
+        controller.set_command(1, '/bestdeal')
+        trace = controller.get_trace(1)
+        self.assertIsNotNone(trace)
+        self.assertEqual(UserData.loads(controller.users.get(1).dumps()).trace, trace)
+
+        with tracer.span('callback_check_entered_data', trace=trace):
+            implementer = CmdSortByPriceAndDist({'sortOrder': 'DISTANCE_FROM_LANDMARK'},
+                                                {'size_result': 3, 'range_dist': (1.8, 2.5)}, True)
+            implementer.start()
+        controller.cancel_cmd(1)
+
+        names = [span['name'] for span in self.handler.spans]
+        self.assertEqual(names.count('query_hotels'), implementer.count_pages)
+        self.assertEqual(names[-2:], ['callback_check_entered_data', 'command /bestdeal'])
+        pages = [span['tags']['page'] for span in self.handler.spans if span['name'] == 'query_hotels']
+        self.assertEqual(pages, [str(page) for page in range(1, implementer.count_pages + 1)])
+        self.assertEqual(len({span['traceId'] for span in self.handler.spans}), 1)
+        filters = [span['tags'] for span in self.handler.spans if span['name'] == 'filter_hotels']
+        self.assertTrue(filters)
+        self.assertTrue(all(int(tags['kept']) <= int(tags['hotels']) for tags in filters))
@@ -0,0 +1,76 @@
+import http.client
+import json
+import threading
+import unittest
+
+from telebot import TeleBot
+
+from dispatcher import ChatDispatcher
+from fake_telebot import message_update_data
+from webhook import WebhookServer, get_webhook_url
+
+
+class TestWebhookServer(unittest.TestCase):
+    """ Прием обновлений http сервером: обработка, повторные доставки, некорректные запросы. """
+
+    def setUp(self):
+        self.handled = []
+        self.done = threading.Event()
+        self.bot = TeleBot('1:TOKEN', threaded=False)
+
+        @self.bot.message_handler(content_types=['text'])
+        def handler(msg):
+            self.handled.append((msg.chat.id, msg.text))
+            if len(self.handled) == 4:
+                self.done.set()
+
+        self.dispatcher = ChatDispatcher(num_workers=4)
+        self.dispatcher.attach(self.bot)
+        self.server = WebhookServer(self.bot, self.dispatcher, '127.0.0.1', 0, '/secret')
+        self.server.start()
+        self.conn = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+
+    def tearDown(self):
+        self.conn.close()
+        self.server.stop()
+        self.dispatcher.shutdown()
+
+    def post(self, body, path: str = '/secret') -> int:
+        self.conn.request('POST', path, body=body if isinstance(body, bytes) else json.dumps(body),
+                          headers={'Content-Type': 'application/json'})
+        res = self.conn.getresponse()
+        res.read()
+        return res.status
+
+    def test_updates_processed_once_in_chat_order(self):
+        updates = [message_update_data(update_id, chat_id, text)
+                   for update_id, chat_id, text in ((1, 1, 'a1'), (2, 2, 'b1'), (3, 1, 'a2'), (4, 1, 'a3'))]
+        statuses = [self.post(update) for update in updates]
+        statuses.append(self.post(updates[0]))  # повторная доставка
+        self.assertEqual(statuses, [200] * 5)
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual([text for chat_id, text in self.handled if chat_id == 1], ['a1', 'a2', 'a3'])
+        self.assertEqual(self.server.stats()['duplicates'], 1)
+        self.assertEqual(self.bot.last_update_id, 4)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.post(b'{not json'), 400)
+        self.assertEqual(self.post(b'null'), 400)
+        self.assertEqual(self.post(message_update_data(1, 1, 'text'), path='/other'), 404)
+        self.assertEqual(self.server.stats()['received'], 0)
+
+    def test_overload(self):
+        self.server.max_pending = 0
+        self.assertEqual(self.post(message_update_data(1, 1, 'text')), 503)
+        self.server.max_pending = 10
+        #  повторная доставка после 503 не отбрасывается
+        self.assertEqual(self.post(message_update_data(1, 1, 'text')), 200)
+
+
+class TestWebhookUrl(unittest.TestCase):
+    def test_get_webhook_url(self):
+        self.assertEqual(get_webhook_url('https://example.com/', '/secret'), 'https://example.com/secret')
+        for base_url in ('', 'http://example.com', 'example.com'):
+            with self.assertRaises(ValueError):
+                get_webhook_url(base_url, '/secret')
+
@@ -0,0 +1,141 @@
+"""
+Трассировка выполнения команд.
+
+Трасса создается при запуске команды (BotController.set_command) и хранится в сессии пользователя, поэтому шаги
+команды, выполняемые в разных обновлениях (и в разных потоках/процессах), попадают в одну трассу. Внутри шага
+участки (span) вкладываются друг в друга через contextvars: api запросы страниц отелей, обработка результата,
+запросы к api телеграма. Завершенные участки записываются в лог трасс в формате Zipkin v2 (одна строка json на
+участок), запись выполняется через очередь логов (utils.LogPipeline).
+
+Трассируется доля команд TRACE_SAMPLE_RATE; без трассы (или при выключенной трассировке) участки не создаются.
+"""
+
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, NamedTuple, Optional
+
+
+SERVICE_NAME = 'bestotelsbot'
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+
+
+#  текущий участок трассы в потоке обработки обновления
+_current: ContextVar[Optional[SpanContext]] = ContextVar('current_span', default=None)
+
+
+def _new_id(size: int = 8) -> str:
+    return os.urandom(size).hex()
+
+
+def parse_trace(trace: str) -> SpanContext:
+    """ Контекст корневого участка по строке трассы из сессии ("trace_id:время начала в мкс"). """
+
+    trace_id = trace.split(':', 1)[0]
+    return SpanContext(trace_id, trace_id[:16])
+
+
+class Tracer:
+    """
+    Создание трасс и запись участков.
+
+    :param sample_rate: доля трассируемых команд (0 - трассировка выключена).
+    :param logger: логер, в который пишутся участки (сообщение записи - словарь участка).
+    """
+
+    def __init__(self, sample_rate: float = 0.0, logger: logging.Logger = None):
+        self.sample_rate = 0.0
+        self.logger = None
+        self.configure(sample_rate, logger)
+
+    def configure(self, sample_rate: float, logger: Optional[logging.Logger]) -> None:
+        self.sample_rate = sample_rate if logger is not None else 0.0
+        self.logger = logger
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def new_trace(self) -> Optional[str]:
+        """
+        Новая трасса (с учетом доли трассируемых команд).
+
+        :return: строка трассы для хранения в сессии или None, если команда не трассируется.
+        """
+
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        return f'{_new_id(16)}:{int(time.time() * 1e6)}'
+
+    def activate(self, trace: Optional[str]) -> None:
+        """
+        Продолжение текущего шага в трассе (например, новой трассе команды, созданной в шаге).
+        Действует до выхода из внешнего участка (span).
+        """
+
+        if trace:
+            _current.set(parse_trace(trace))
+
+    @contextmanager
+    def span(self, name: str, trace: str = None, **tags) -> Iterator[Optional[dict]]:
+        """
+        Участок трассы. Родитель участка - текущий участок потока или корневой участок трассы trace.
+
+        :param trace: строка трассы из сессии (для участков шагов команды).
+        :param tags: теги участка; теги можно добавлять и в блоке (в словарь span['tags']).
+        :return: словарь участка или None, если трассы нет.
+        """
+
+        if not self.enabled:
+            yield None
+            return
+        parent = parse_trace(trace) if trace else _current.get()
+        if parent is None:
+            #  значение восстанавливается при выходе (если трасса будет создана внутри участка)
+            token = _current.set(None)
+            try:
+                yield None
+            finally:
+                _current.reset(token)
+            return
+        span_id = _new_id()
+        token = _current.set(SpanContext(parent.trace_id, span_id))
+        span = {'traceId': parent.trace_id, 'parentId': parent.span_id, 'id': span_id, 'name': name,
+                'timestamp': int(time.time() * 1e6), 'localEndpoint': {'serviceName': SERVICE_NAME},
+                'tags': {key: str(value) for key, value in tags.items()}}
+        time_start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span['tags']['error'] = repr(e)
+            raise
+        finally:
+            span['duration'] = int((time.perf_counter() - time_start) * 1e6)
+            _current.reset(token)
+            self._write(span)
+
+    def finish_trace(self, trace: Optional[str], name: str, **tags) -> None:
+        """ Запись корневого участка трассы (от создания трассы до завершения команды). """
+
+        if not trace or not self.enabled:
+            return
+        trace_id, time_start = trace.split(':', 1)
+        timestamp = int(time_start)
+        self._write({'traceId': trace_id, 'id': trace_id[:16], 'name': name, 'timestamp': timestamp,
+                     'duration': int(time.time() * 1e6) - timestamp, 'localEndpoint': {'serviceName': SERVICE_NAME},
+                     'tags': {key: str(value) for key, value in tags.items()}})
+
+    def _write(self, span: dict) -> None:
+        #  словарь форматируется в json при записи в файл (TraceFormatter), а не в потоке обработки
+        self.logger.info(span)
+
+
+#  трассировщик бота (включается в main.py)
+tracer = Tracer()
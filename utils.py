@@ -1,8 +1,14 @@
+import itertools
+import json
 import logging
-from logging.handlers import TimedRotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from typing import Optional
 
 import telebot
 
+from metrics import Counter
+
 
 def is_valid_number(value: str, min_val: int = 0, max_val: int = None) -> bool:
     if not value.isdigit():
@@ -20,9 +26,139 @@ def is_valid_float(value: str):
     return False
 
 
-def configure_app_logger(name: str):
-    formatter_file = logging.Formatter(fmt="%(asctime)s | (%(filename)s:%(lineno)d | funcName: %(funcName)s)"
-                                           " | %(levelname)s | %(message)s")
+#  кол-во записей лога, отброшенных при переполнении очереди
+LOG_DROPPED = Counter('bot_log_dropped_total', 'Записи лога, отброшенные при переполнении очереди лога')
+
+
+class JsonFormatter(logging.Formatter):
+    """ Запись лога одной строкой json (формат JSON lines). """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {'time': self.formatTime(record), 'level': record.levelname, 'logger': record.name,
+                'thread': record.threadName, 'file': record.filename, 'line': record.lineno,
+                'func': record.funcName, 'message': record.getMessage()}
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class TraceFormatter(logging.Formatter):
+    """ Участок трассы (сообщение записи - словарь участка) одной строкой json. """
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(record.msg, ensure_ascii=False, separators=(',', ':'))
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Постановка записей лога в ограниченную очередь без ожидания: при переполнении очереди запись
+    отбрасывается (с подсчетом отброшенных записей), а поток обработчика не блокируется.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        Подстановка аргументов в текст записи (аргументы могут измениться до записи в файл).
+        Запись не копируется и исключение не форматируется: очередь в памяти процесса, логер пишет только в очередь,
+        форматирование выполняет поток записи.
+        """
+
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            LOG_DROPPED.inc()
+
+
+class DebugSampleFilter(logging.Filter):
+    """
+    Выборка записей уровня DEBUG: пропускается каждая N-я запись (записи уровня INFO и выше - все).
+
+    :param every: N (1 - все записи, 0 - записи DEBUG не пропускаются).
+    """
+
+    def __init__(self, every: int = 1):
+        super().__init__()
+        self.every = every
+        self._counter = itertools.count()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.every == 1:
+            return True
+        return self.every > 0 and next(self._counter) % self.every == 0
+
+
+class LogPipeline:
+    """
+    Запись логов через очередь в памяти: логеры только ставят записи в очередь (DroppingQueueHandler),
+    форматирование и запись в файлы/консоль выполняет один фоновый поток (QueueListener).
+
+    :param queue_size: максимальное кол-во записей в очереди.
+    :param log_format: формат записи в файлы: "text" или "json" (JSON lines).
+    """
+
+    def __init__(self, queue_size: int = 10000, log_format: str = 'text'):
+        self.queue = queue.Queue(queue_size)
+        self.log_format = log_format
+        self.handlers = []
+        self._queue_handlers = []
+        self.listener: Optional[QueueListener] = None
+
+    def file_formatter(self, fmt: str) -> logging.Formatter:
+        if self.log_format == 'json':
+            return JsonFormatter()
+        return logging.Formatter(fmt=fmt)
+
+    def attach(self, logger: logging.Logger, handlers: list, log_filter: logging.Filter = None) -> None:
+        """
+        Перенаправление записей логера в очередь. Записи передаются в handlers только этого логера.
+        """
+
+        for handler in handlers:
+            handler.addFilter(logging.Filter(logger.name))
+            self.handlers.append(handler)
+        queue_handler = DroppingQueueHandler(self.queue)
+        if log_filter is not None:
+            queue_handler.addFilter(log_filter)
+        self._queue_handlers.append(queue_handler)
+        logger.addHandler(queue_handler)
+
+    @property
+    def dropped(self) -> int:
+        return sum(handler.dropped for handler in self._queue_handlers)
+
+    def start(self) -> None:
+        self.listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self) -> None:
+        """ Запись оставшихся в очереди записей и остановка потока. """
+
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        for handler in self.handlers:
+            handler.close()
+
+
+def configure_app_logger(name: str, pipeline: LogPipeline = None):
+    """
+    Логер бота: все записи в файл logs/app.log, записи INFO и выше - в консоль.
+
+    :param pipeline: (optional) очередь записи логов; без нее записи пишутся в потоке, вызвавшем логер.
+    """
+
+    fmt_file = "%(asctime)s | (%(filename)s:%(lineno)d | funcName: %(funcName)s) | %(levelname)s | %(message)s"
+    formatter_file = pipeline.file_formatter(fmt_file) if pipeline else logging.Formatter(fmt=fmt_file)
     formatter_cons = logging.Formatter(fmt="%(asctime)s | funcName: %(funcName)s | %(levelname)s | %(message)s")
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter_cons)
@@ -34,22 +170,59 @@ def configure_app_logger(name: str):
 
     logger = logging.getLogger(name)
     logger.setLevel('DEBUG')
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    if pipeline:
+        pipeline.attach(logger, [console_handler, file_handler])
+    else:
+        logger.addHandler(console_handler)
+        logger.addHandler(file_handler)
+
+    return logger
+
+
+def configure_trace_logger(path: str, pipeline: LogPipeline = None):
+    """
+    Логер участков трасс команд (tracing.Tracer): файл json строк с ротацией по размеру.
+
+    :param path: путь к файлу трасс.
+    :param pipeline: (optional) очередь записи логов; без нее записи пишутся в потоке, вызвавшем логер.
+    """
+
+    file_handler = RotatingFileHandler(path, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf8')
+    file_handler.setFormatter(TraceFormatter())
+
+    logger = logging.getLogger('trace')
+    logger.setLevel('INFO')
+    logger.propagate = False
+    if pipeline:
+        pipeline.attach(logger, [file_handler])
+    else:
+        logger.addHandler(file_handler)
 
     return logger
 
 
-def configure_telebot_logger():
-    formatter = logging.Formatter(
-        fmt='%(asctime)s (%(filename)s:%(lineno)d %(threadName)s) %(levelname)s - %(name)s: "%(message)s"')
+def configure_telebot_logger(pipeline: LogPipeline = None, debug_sample: int = 1):
+    """
+    Логер библиотеки pyTelegramBotAPI: все записи в файл logs/telebot.log.
+
+    :param pipeline: (optional) очередь записи логов; без нее записи пишутся в потоке, вызвавшем логер.
+    :param debug_sample: запись каждой N-й записи DEBUG (1 - всех записей, 0 - без записей DEBUG).
+    """
+
+    fmt = '%(asctime)s (%(filename)s:%(lineno)d %(threadName)s) %(levelname)s - %(name)s: "%(message)s"'
+    formatter = pipeline.file_formatter(fmt) if pipeline else logging.Formatter(fmt=fmt)
     file_handler = TimedRotatingFileHandler('logs/telebot.log', when='h', interval=24, backupCount=5)
     file_handler.setFormatter(formatter)
     file_handler.setLevel('DEBUG')
 
     logger = telebot.logger
-    telebot.logger.setLevel(logging.DEBUG)
+    #  без записи DEBUG (debug_sample=0) такие записи даже не создаются
+    telebot.logger.setLevel(logging.DEBUG if debug_sample else logging.INFO)
     logger.handlers.clear()
-    logger.addHandler(file_handler)
+    if pipeline:
+        pipeline.attach(logger, [file_handler], DebugSampleFilter(debug_sample) if debug_sample != 1 else None)
+    else:
+        file_handler.addFilter(DebugSampleFilter(debug_sample))
+        logger.addHandler(file_handler)
 
     return logger
@@ -0,0 +1,165 @@
+"""
+Прием обновлений телеграма через webhook.
+
+Встроенный http сервер принимает POST запросы телеграма, декодирует обновления, отбрасывает повторные доставки
+(по update_id) и передает обновления обработчикам бота через диспетчер. Ответ 200 отправляется сразу после
+постановки обновления в очередь, не дожидаясь его обработки.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import TeleBot
+from telebot.types import Update
+
+from dispatcher import ChatDispatcher
+
+
+logger = logging.getLogger('main.webhook')
+
+
+def get_webhook_url(base_url: str, path: str) -> str:
+    """
+    Адрес webhook для регистрации в телеграме.
+
+    :param base_url: публичный адрес бота (https://...).
+    :param path: путь для приема обновлений.
+    :raises ValueError: адрес не задан или не https (телеграм отправляет обновления только по https).
+    """
+
+    if not base_url.lower().startswith('https://'):
+        raise ValueError(f'Для режима webhook нужен публичный адрес бота https://... в WEBHOOK_URL, '
+                         f'задано: {base_url!r}')
+    return base_url.rstrip('/') + path
+
+
+class UpdateIdCache:
+    """
+    Ограниченный по размеру набор последних полученных update_id (для отбрасывания повторных доставок).
+
+    :param max_size: кол-во запоминаемых update_id.
+    """
+
+    def __init__(self, max_size: int = 10000):
+        self.max_size = max_size
+        self._ids: 'OrderedDict[int, None]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, update_id: int) -> bool:
+        """
+        :return: True - update_id получен впервые, False - повторная доставка.
+        """
+
+        with self._lock:
+            if update_id in self._ids:
+                return False
+            self._ids[update_id] = None
+            if len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+            return True
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # постоянные соединения телеграма (до max_connections)
+    server: 'WebhookServer'
+
+    def _reply(self, code: int) -> None:
+        self.send_response(code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length)
+        if self.path != self.server.path:
+            self._reply(404)
+            return
+        try:
+            update = Update.de_json(json.loads(body))
+            if update is None:
+                raise ValueError('empty update')
+        except (ValueError, TypeError, KeyError, AttributeError):
+            logger.warning(f'Некорректное обновление: {body[:200]!r}')
+            self._reply(400)
+            return
+        self._reply(self.server.accept(update))
+
+    def do_GET(self):
+        self._reply(404 if self.path != '/healthz' else 200)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    Http сервер для приема обновлений. Обновления обрабатываются в пуле потоков диспетчера (по очередям чатов),
+    при переполнении очередей (больше max_pending задач) сервер отвечает 503, и телеграм повторит доставку позже.
+
+    :param bot: объект бота с зарегистрированными обработчиками.
+    :param dispatcher: диспетчер обработки обновлений.
+    :param host: адрес сервера.
+    :param port: порт сервера (0 - любой свободный).
+    :param path: путь, по которому телеграм отправляет обновления (секретная строка: отправитель не проверяется).
+    :param max_pending: максимальное кол-во обновлений в очередях диспетчера.
+    :param dedupe_size: кол-во запоминаемых update_id для отбрасывания повторных доставок.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, bot: TeleBot, dispatcher: ChatDispatcher, host: str = '0.0.0.0', port: int = 8443,
+                 path: str = '/webhook', max_pending: int = 1000, dedupe_size: int = 10000):
+        super().__init__((host, port), WebhookHandler)
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.path = path
+        self.max_pending = max_pending
+        self.update_ids = UpdateIdCache(dedupe_size)
+        self._lock = threading.Lock()
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+
+    def accept(self, update: Update) -> int:
+        """
+        Постановка обновления в очередь обработки.
+
+        :return: http код ответа телеграму.
+        """
+
+        if self.dispatcher.pending() >= self.max_pending:
+            with self._lock:
+                self.rejected += 1
+            return 503
+        if not self.update_ids.add(update.update_id):
+            with self._lock:
+                self.duplicates += 1
+            return 200
+        with self._lock:
+            self.received += 1
+        #  process_new_updates бота заменен диспетчером (ChatDispatcher.attach) и только ставит задачу в очередь
+        self.bot.process_new_updates([update])
+        return 200
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'received': self.received, 'duplicates': self.duplicates, 'rejected': self.rejected,
+                    'pending': self.dispatcher.pending()}
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> threading.Thread:
+        """ Запуск сервера в отдельном потоке. """
+
+        thread = threading.Thread(target=self.serve_forever, name='WebhookServer', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()